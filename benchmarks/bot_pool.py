@@ -0,0 +1,101 @@
+"""Startup cost of the support bots' ``Bot`` objects with many configured bots.
+
+``eager`` is the previous ``main.py``: a ``make_bot`` for every enabled bot
+before the server starts. ``lazy`` builds a ``BotPool`` and then serves the
+first update of ``--active`` bots, which is what a process holds after a
+quiet period. Each mode runs in a fresh process (Linux only: reads
+``/proc/self/status``); no requests are sent.
+
+    uv run python -m benchmarks.bot_pool --bots 2000 --active 200
+"""
+
+from __future__ import annotations
+
+import argparse
+import multiprocessing
+import queue as queue_module
+import time
+import tracemalloc
+
+from benchmarks.settings_lookup import _register
+from bot.bot_pool import BotPool
+from bot.token_index import TokenIndex
+from config.bot_config import bot_config, make_bot
+
+
+def _rss_kib() -> int:
+    with open("/proc/self/status") as status:
+        for line in status:
+            if line.startswith("VmRSS:"):
+                return int(line.split()[1])
+    return 0
+
+
+def _run(mode: str, bots: int, active: int) -> dict[str, float]:
+    _register(bots)
+    settings = bot_config.get_bot_settings()
+    rss = _rss_kib()
+    tracemalloc.start()
+    started = time.perf_counter()
+    if mode == "eager":
+        held = {item.token: make_bot(item.token) for item in settings if item.can_work}
+        startup = time.perf_counter() - started
+    else:
+        pool = BotPool(TokenIndex(bot_config))
+        startup = time.perf_counter() - started
+        for item in settings[:active]:
+            pool.get(item.token)
+        held = pool
+    python_kib = tracemalloc.get_traced_memory()[0] / 1024
+    tracemalloc.stop()
+    return {
+        "bots": len(held),
+        "startup_ms": startup * 1000,
+        "rss_mib": (_rss_kib() - rss) / 1024,
+        "python_mib": python_kib / 1024,
+    }
+
+
+def _child(mode: str, bots: int, active: int, queue) -> None:
+    queue.put(_run(mode, bots, active))
+
+
+def _result(mode: str, child: multiprocessing.Process, queue) -> dict[str, float]:
+    """Wait for the child's result; fail instead of hanging if it died."""
+    while True:
+        try:
+            return queue.get(timeout=1.0)
+        except queue_module.Empty:
+            if child.is_alive():
+                continue
+        # The result may have arrived between the timeout and the check.
+        try:
+            return queue.get_nowait()
+        except queue_module.Empty:
+            raise SystemExit(f"{mode}: child exited with code {child.exitcode}")
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--bots", type=int, default=2000)
+    parser.add_argument("--active", type=int, default=200)
+    args = parser.parse_args()
+
+    print(f"{args.bots} configured bots, {args.active} active for lazy")
+    print(f"{'mode':<8}{'Bot objs':>10}{'start ms':>10}{'RSS MiB':>10}{'py MiB':>10}")
+    for mode in ("eager", "lazy"):
+        queue = multiprocessing.Queue()
+        child = multiprocessing.Process(
+            target=_child, args=(mode, args.bots, args.active, queue)
+        )
+        child.start()
+        result = _result(mode, child, queue)
+        child.join()
+        print(
+            f"{mode:<8}{result['bots']:>10.0f}{result['startup_ms']:>10.1f}"
+            f"{result['rss_mib']:>10.1f}{result['python_mib']:>10.1f}"
+        )
+
+
+if __name__ == "__main__":
+    main()
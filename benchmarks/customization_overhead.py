@@ -0,0 +1,65 @@
+"""Per-message customization overhead in ``cmd_resend``.
+
+For every user message ``cmd_resend`` resolves the bot's customization and
+asks it for extra text and a reply markup. Compares building a fresh
+instance per message (old ``get_customization``) with the long-lived
+per-bot instance.
+
+    uv run python -m benchmarks.customization_overhead --messages 20000
+"""
+
+from __future__ import annotations
+
+import argparse
+import asyncio
+import time
+from types import SimpleNamespace
+from typing import Any, Callable
+
+from bot.customizations import get_all_routers, get_customization
+from bot.customizations.default import DefaultBotCustomization
+from bot.customizations.interface import AbstractBotCustomization
+from bot.customizations.registry import _CUSTOMIZATION_REGISTRY
+
+HELPER_BOT_ID = 5173438724
+PLAIN_BOT_ID = 1
+
+
+def _fresh_instance(bot_id: int) -> AbstractBotCustomization:
+    return _CUSTOMIZATION_REGISTRY.get(bot_id, DefaultBotCustomization)()
+
+
+async def _per_message(
+    resolve: Callable[[int], AbstractBotCustomization],
+    bot_id: int,
+    messages: int,
+) -> float:
+    user: Any = SimpleNamespace(id=42, username="user")
+    message: Any = SimpleNamespace()
+    settings: Any = SimpleNamespace()
+    started = time.perf_counter()
+    for _ in range(messages):
+        customization = resolve(bot_id)
+        await customization.get_extra_text(user, message, settings)
+        await customization.get_reply_markup(user, message, settings)
+    return (time.perf_counter() - started) / messages * 1_000_000
+
+
+async def run(messages: int) -> None:
+    get_all_routers()  # imports and registers the known customizations
+    print(f"{'bot':10} {'new instance, us':>17} {'shared, us':>11}")
+    for name, bot_id in (("helper", HELPER_BOT_ID), ("default", PLAIN_BOT_ID)):
+        before = await _per_message(_fresh_instance, bot_id, messages)
+        after = await _per_message(get_customization, bot_id, messages)
+        print(f"{name:10} {before:17.2f} {after:11.2f}")
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--messages", type=int, default=20_000)
+    args = parser.parse_args()
+    asyncio.run(run(args.messages))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,126 @@
+"""Memory and file descriptors held by N bots after one request each.
+
+Compares aiogram's default per-bot ``AiohttpSession`` (one connector, SSL
+context and keep-alive socket per bot) with ``PooledAiohttpSession`` over the
+shared ``ConnectionPool`` from ``bot.http_pool``. Every bot sends ``getMe``
+to a local stub Bot API server running in a child process; each mode runs in
+a fresh process so RSS and FD counts do not leak between them (Linux only:
+reads ``/proc/self``).
+
+    uv run python -m benchmarks.http_pool --bots 1000
+"""
+
+from __future__ import annotations
+
+import argparse
+import asyncio
+import multiprocessing
+import os
+import socket
+import time
+import tracemalloc
+
+from aiogram import Bot
+from aiogram.client.session.aiohttp import AiohttpSession
+from aiogram.client.telegram import TelegramAPIServer
+from aiohttp import web
+
+from bot.http_pool import ConnectionPool, PooledAiohttpSession
+
+_ME = {
+    "ok": True,
+    "result": {"id": 1, "is_bot": True, "first_name": "Bench", "username": "b"},
+}
+
+
+def _serve(port: int) -> None:
+    async def handler(request: web.Request) -> web.Response:
+        return web.json_response(_ME)
+
+    app = web.Application()
+    app.router.add_route("*", "/{tail:.*}", handler)
+    web.run_app(app, host="127.0.0.1", port=port, print=None)
+
+
+def _free_port() -> int:
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+
+def _open_fds() -> int:
+    return len(os.listdir("/proc/self/fd"))
+
+
+def _rss_kib() -> int:
+    with open("/proc/self/status") as status:
+        for line in status:
+            if line.startswith("VmRSS:"):
+                return int(line.split()[1])
+    return 0
+
+
+async def _run(mode: str, bots: int, port: int, limit: int) -> dict[str, float]:
+    api = TelegramAPIServer.from_base(f"http://127.0.0.1:{port}")
+    pool = ConnectionPool(limit=limit)
+    fds, rss = _open_fds(), _rss_kib()
+    tracemalloc.start()
+    started = time.perf_counter()
+
+    def session() -> AiohttpSession:
+        if mode == "shared":
+            return PooledAiohttpSession(pool, api=api)
+        return AiohttpSession(api=api)
+
+    instances = [Bot(f"{index + 1}:token", session=session()) for index in range(bots)]
+    await asyncio.gather(*(bot.get_me() for bot in instances))
+    elapsed = time.perf_counter() - started
+    python_kib = tracemalloc.get_traced_memory()[0] / 1024
+    tracemalloc.stop()
+    result = {
+        "fds": _open_fds() - fds,
+        "rss_mib": (_rss_kib() - rss) / 1024,
+        "python_mib": python_kib / 1024,
+        "seconds": elapsed,
+    }
+    for bot in instances:
+        await bot.session.close()
+    await pool.close()
+    return result
+
+
+def _child(mode: str, bots: int, port: int, limit: int, queue) -> None:
+    queue.put(asyncio.run(_run(mode, bots, port, limit)))
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--bots", type=int, default=1000)
+    parser.add_argument("--limit", type=int, default=100, help="shared pool limit")
+    args = parser.parse_args()
+
+    port = _free_port()
+    server = multiprocessing.Process(target=_serve, args=(port,), daemon=True)
+    server.start()
+    time.sleep(1.0)
+    try:
+        print(f"{args.bots} bots, one getMe each, shared pool limit {args.limit}")
+        print(f"{'mode':<10}{'open FDs':>10}{'RSS MiB':>10}{'py MiB':>10}{'s':>8}")
+        for mode in ("per-bot", "shared"):
+            queue = multiprocessing.Queue()
+            child = multiprocessing.Process(
+                target=_child, args=(mode, args.bots, port, args.limit, queue)
+            )
+            child.start()
+            result = queue.get()
+            child.join()
+            print(
+                f"{mode:<10}{result['fds']:>10.0f}{result['rss_mib']:>10.1f}"
+                f"{result['python_mib']:>10.1f}{result['seconds']:>8.2f}"
+            )
+    finally:
+        server.terminate()
+
+
+if __name__ == "__main__":
+    main()
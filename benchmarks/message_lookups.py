@@ -0,0 +1,143 @@
+"""Lookup latency on ``t_messages`` before and after the covering indexes.
+
+Builds a synthetic ``t_messages`` table in a temporary SQLite file and times
+the three hot queries issued by ``Repo`` (copy-side lookup, original-side
+lookup, "has user got a reply") first on the bare table, then after the
+indexes declared on ``Messages`` are created.
+
+    uv run python -m benchmarks.message_lookups --rows 1000000 10000000
+"""
+
+from __future__ import annotations
+
+import argparse
+import os
+import random
+import sqlite3
+import statistics
+import tempfile
+import time
+
+from sqlalchemy.dialects import sqlite
+from sqlalchemy.schema import CreateIndex, CreateTable
+
+from database.models import Base, Messages
+
+TABLE = Base.metadata.tables[Messages.__tablename__]
+
+BOTS = 50
+INSERT = (
+    "INSERT INTO t_messages (record_add_date, bot_id, user_id, message_id, "
+    "resend_id, chat_from_id, chat_for_id) "
+    "VALUES (CURRENT_TIMESTAMP, ?, NULL, ?, ?, ?, ?)"
+)
+QUERIES = {
+    "by copy (reply/reaction)": (
+        "SELECT record_id, message_id, resend_id, chat_from_id, chat_for_id "
+        "FROM t_messages WHERE bot_id = ? AND resend_id = ? AND chat_for_id = ? "
+        "LIMIT 1"
+    ),
+    "by original (edit/reaction)": (
+        "SELECT record_id, message_id, resend_id, chat_from_id, chat_for_id "
+        "FROM t_messages WHERE bot_id = ? AND message_id = ? AND chat_from_id = ? "
+        "LIMIT 1"
+    ),
+    "has_user_received_reply": (
+        "SELECT record_id FROM t_messages WHERE bot_id = ? AND chat_for_id = ? LIMIT 1"
+    ),
+}
+
+
+def _ddl(statement) -> str:
+    return str(statement.compile(dialect=sqlite.dialect()))
+
+
+def _fill(conn: sqlite3.Connection, rows: int) -> list[tuple[int, ...]]:
+    rnd = random.Random(42)
+    samples: list[tuple[int, ...]] = []
+    batch: list[tuple[int, ...]] = []
+    for i in range(rows):
+        bot_id = 5_000_000_000 + i % BOTS
+        user_chat = 100_000 + rnd.randrange(rows // 20 + 1)
+        master_chat = -1_000_000_000_000 - i % BOTS
+        row = (bot_id, i, i + 7, user_chat, master_chat)
+        batch.append(row)
+        if i % max(rows // 1000, 1) == 0:
+            samples.append(row)
+        if len(batch) == 50_000:
+            conn.executemany(INSERT, batch)
+            batch.clear()
+    if batch:
+        conn.executemany(INSERT, batch)
+    conn.commit()
+    return samples
+
+
+def _params(name: str, row: tuple[int, ...]) -> tuple[int, ...]:
+    bot_id, message_id, resend_id, chat_from_id, chat_for_id = row
+    if name.startswith("by copy"):
+        return bot_id, resend_id, chat_for_id
+    if name.startswith("by original"):
+        return bot_id, message_id, chat_from_id
+    # A user that never got a reply is the worst case: the whole range is probed.
+    return bot_id, chat_from_id
+
+
+def _measure(
+    conn: sqlite3.Connection, samples: list[tuple[int, ...]], limit: int
+) -> dict[str, float]:
+    picked = random.Random(7).sample(samples, min(limit, len(samples)))
+    result = {}
+    for name, sql in QUERIES.items():
+        timings = []
+        for row in picked:
+            params = _params(name, row)
+            started = time.perf_counter()
+            conn.execute(sql, params).fetchall()
+            timings.append(time.perf_counter() - started)
+        result[name] = statistics.median(timings) * 1000
+    return result
+
+
+def run(rows: int, limit: int) -> None:
+    fd, path = tempfile.mkstemp(suffix=".db")
+    os.close(fd)
+    try:
+        conn = sqlite3.connect(path)
+        conn.execute("PRAGMA journal_mode=WAL")
+        conn.execute("PRAGMA synchronous=NORMAL")
+        conn.execute(_ddl(CreateTable(TABLE)))
+        started = time.perf_counter()
+        samples = _fill(conn, rows)
+        print(f"\n{rows:,} rows generated in {time.perf_counter() - started:.1f}s")
+
+        before = _measure(conn, samples, min(limit, 20))
+
+        started = time.perf_counter()
+        for index in TABLE.indexes:
+            conn.execute(_ddl(CreateIndex(index)))
+        conn.commit()
+        print(f"indexes built in {time.perf_counter() - started:.1f}s")
+
+        after = _measure(conn, samples, limit)
+        print(f"{'query':32} {'no index, ms':>14} {'indexed, ms':>12}")
+        for name in QUERIES:
+            print(f"{name:32} {before[name]:14.3f} {after[name]:12.4f}")
+        conn.close()
+    finally:
+        for suffix in ("", "-wal", "-shm"):
+            if os.path.exists(path + suffix):
+                os.remove(path + suffix)
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--rows", type=int, nargs="+", default=[1_000_000])
+    parser.add_argument("--queries", type=int, default=500)
+    args = parser.parse_args()
+    for rows in args.rows:
+        run(rows, args.queries)
+
+
+if __name__ == "__main__":
+    main()
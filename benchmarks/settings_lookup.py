@@ -0,0 +1,109 @@
+"""Per-update cost of ``ConfigMiddleware`` with many registered bots.
+
+Registers ``--bots`` synthetic bots in ``bot_config`` and times one pass of
+``ConfigMiddleware`` (settings lookup + handler call) per update for a random
+bot, comparing the old per-update ``SupportBotSettings(**dict)`` construction
+with the cached snapshots.
+
+    uv run python -m benchmarks.settings_lookup --bots 5000
+"""
+
+from __future__ import annotations
+
+import argparse
+import asyncio
+import random
+import time
+import tracemalloc
+from types import SimpleNamespace
+from typing import Any
+
+from bot.middlewares.config import ConfigMiddleware
+from config.bot_config import SupportBotSettings, bot_config
+
+
+class _PerUpdateValidation:
+    """The previous ``BotConfig.get_bot_setting``: validate on every call."""
+
+    def get_bot_setting(self, bot_id: int) -> SupportBotSettings | None:
+        result = bot_config.json_config.get(str(bot_id))
+        return SupportBotSettings(**result) if result else None
+
+
+def _register(bots: int) -> list[int]:
+    bot_config.json_config = {
+        str(bot_id): {
+            "id": bot_id,
+            "username": f"support_{bot_id}_bot",
+            "token": f"{bot_id}:AAAAAAAAAAAAAAAAAAAAAAAAAAAAAAAAAAA",
+            "start_message": "Здравствуйте! Чем могу помочь?" * 4,
+            "security_policy": "default",
+            "master_chat": -1_001_000_000_000 - bot_id,
+            "master_thread": None,
+            "no_start_message": False,
+            "special_commands": 0,
+            "mark_bad": True,
+            "owner": 84131737,
+            "can_work": True,
+            "ignore_commands": False,
+            "use_local_names": True,
+            "local_names": {str(i): f"agent{i}" for i in range(5)},
+            "use_auto_reply": False,
+            "block_links": True,
+            "spam_block_words": [f"word{i}" for i in range(20)],
+            "auto_reply": "Message automatically forwarded to support.",
+            "ignore_users": list(range(50)),
+        }
+        for bot_id in range(5_000_000_000, 5_000_000_000 + bots)
+    }
+    bot_config.reload_settings()
+    return [int(key) for key in bot_config.json_config]
+
+
+async def _measure(
+    middleware: ConfigMiddleware, bot_ids: list[int], updates: int
+) -> tuple[float, float]:
+    async def handler(event: Any, data: dict[str, Any]) -> None:
+        return None
+
+    picked: list[Any] = [
+        SimpleNamespace(id=random.Random(7).choice(bot_ids)) for _ in range(updates)
+    ]
+    event: Any = SimpleNamespace()
+    started = time.perf_counter()
+    for bot in picked:
+        await middleware(handler, event, {"bot": bot})
+    elapsed = time.perf_counter() - started
+    # Separate pass: tracemalloc slows the loop down several times.
+    tracemalloc.start()
+    for bot in picked[:1000]:
+        await middleware(handler, event, {"bot": bot})
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return elapsed / updates * 1_000_000, peak / 1024
+
+
+async def run(bots: int, updates: int) -> None:
+    bot_ids = _register(bots)
+    before = await _measure(
+        ConfigMiddleware(_PerUpdateValidation()),  # type: ignore[arg-type]
+        bot_ids,
+        updates,
+    )
+    after = await _measure(ConfigMiddleware(bot_config), bot_ids, updates)
+    print(f"\n{bots:,} bots, {updates:,} updates")
+    print(f"{'':22} {'us/update':>10} {'peak KiB':>10}")
+    print(f"{'validate per update':22} {before[0]:10.2f} {before[1]:10.1f}")
+    print(f"{'cached snapshot':22} {after[0]:10.2f} {after[1]:10.1f}")
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--bots", type=int, default=5_000)
+    parser.add_argument("--updates", type=int, default=50_000)
+    args = parser.parse_args()
+    asyncio.run(run(args.bots, args.updates))
+
+
+if __name__ == "__main__":
+    main()
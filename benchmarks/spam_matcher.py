@@ -0,0 +1,100 @@
+"""Stop-word check cost per inbound message.
+
+Compares the previous per-message check (strip + casefold every configured
+word, one substring search per word) with ``bot.spam_matcher`` forced into
+each of its modes (substring scan over folded words, Aho–Corasick automaton)
+on messages that contain none of the words (the common case: every word has
+to be ruled out). Words are Latin or Cyrillic, like real messages.
+
+    uv run python -m benchmarks.spam_matcher --words 1000 --text-size 4096
+"""
+
+from __future__ import annotations
+
+import argparse
+import random
+import statistics
+import string
+import time
+from collections.abc import Callable
+
+import bot.spam_matcher
+from bot.spam_matcher import SpamMatcher
+
+ALPHABETS = (string.ascii_lowercase, "абвгдеёжзийклмнопрстуфхцчшщъыьэюя")
+
+
+def _word(rnd: random.Random, low: int, high: int) -> str:
+    alphabet = rnd.choice(ALPHABETS)
+    return "".join(rnd.choice(alphabet) for _ in range(rnd.randint(low, high)))
+
+
+def _compile(words: list[str], scan: bool) -> SpamMatcher:
+    saved = bot.spam_matcher.SCAN_MAX_PATTERNS
+    bot.spam_matcher.SCAN_MAX_PATTERNS = len(words) * 2 if scan else 0
+    try:
+        return SpamMatcher(words)
+    finally:
+        bot.spam_matcher.SCAN_MAX_PATTERNS = saved
+
+
+def _plain_check(text: str, block_words: list[str]) -> bool:
+    # The check used by cmd_resend before the compiled matcher.
+    text = text.casefold()
+    return any(word.strip().casefold() in text for word in block_words if word.strip())
+
+
+def _median_ms(check: Callable[[str], object], texts: list[str]) -> float:
+    timings = []
+    for text in texts:
+        started = time.perf_counter()
+        check(text)
+        timings.append(time.perf_counter() - started)
+    return statistics.median(timings) * 1000
+
+
+def run(words: int, text_size: int, messages: int) -> None:
+    rnd = random.Random(42)
+    texts = []
+    for _ in range(messages):
+        parts: list[str] = []
+        while sum(len(part) + 1 for part in parts) < text_size:
+            parts.append(_word(rnd, 2, 9).capitalize())
+        texts.append(" ".join(parts)[:text_size])
+    block_words: list[str] = []
+    while len(block_words) < words:
+        word = _word(rnd, 5, 14)
+        if not any(word in text.casefold() for text in texts):
+            block_words.append(f" {word.upper()} ")
+
+    started = time.perf_counter()
+    automaton = _compile(block_words, scan=False)
+    compile_ms = (time.perf_counter() - started) * 1000
+    scan = _compile(block_words, scan=True)
+
+    before = _median_ms(lambda text: _plain_check(text, block_words), texts)
+    print(
+        f"\n{words:,} words x {text_size:,}-char messages "
+        f"(automaton compile once: {compile_ms:.1f} ms)"
+    )
+    print(f"{'per-word substring scan':26} {before:8.3f} ms/message")
+    print(
+        f"{'matcher, folded scan':26} {_median_ms(scan.search, texts):8.3f} ms/message"
+    )
+    print(
+        f"{'matcher, automaton':26} {_median_ms(automaton.search, texts):8.3f} ms/message"
+    )
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--words", type=int, nargs="+", default=[1000])
+    parser.add_argument("--text-size", type=int, default=4096)
+    parser.add_argument("--messages", type=int, default=200)
+    args = parser.parse_args()
+    for words in args.words:
+        run(words, args.text_size, args.messages)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,153 @@
+"""Per-bot circuit breaker for Bot API calls of support bots.
+
+A revoked token was only noticed by ``provision_bots`` at startup; until the
+next restart the bot kept receiving updates and every ``send_*`` failed with
+``TelegramUnauthorizedError``. :class:`BotHealth` is an aiogram request
+middleware installed by ``make_session`` in front of the send scheduler. It
+watches the outcome of every call a support bot makes:
+
+* ``THRESHOLD`` consecutive ``Unauthorized`` or ``Conflict`` answers trip the
+  breaker: later calls of the bot raise :class:`BotDisabledError` without a
+  request, ``can_work`` is saved as False (the token index then answers the
+  bot's webhook with 404) and the owner is told once through the notifier
+  ``main.py`` attaches;
+* any successful call resets the count;
+* ``Forbidden`` is only counted: it means a user blocked the bot or the bot
+  left a chat, not that the token is dead.
+
+Bots without settings (the admin bot) are never tripped. A tripped bot is
+let through again once its settings are saved with ``can_work`` on; the
+admin dialog calls :meth:`BotHealth.reset_force` first, because enabling the
+bot needs a test message through the open breaker.
+
+Tunables (env, read once on import): ``BOT_BREAKER_THRESHOLD`` (3).
+"""
+
+from __future__ import annotations
+
+from collections.abc import Awaitable, Callable
+from typing import TYPE_CHECKING, Final
+
+from aiogram.client.session.middlewares.base import (
+    BaseRequestMiddleware,
+    NextRequestMiddlewareType,
+)
+from aiogram.exceptions import (
+    TelegramConflictError,
+    TelegramForbiddenError,
+    TelegramUnauthorizedError,
+)
+from aiogram.methods.base import TelegramType
+from loguru import logger
+
+from config.bot_config import BotConfig, SupportBotSettings, bot_config, env
+
+if TYPE_CHECKING:
+    from aiogram import Bot
+    from aiogram.methods import Response, TelegramMethod
+
+THRESHOLD: Final[int] = env.int("BOT_BREAKER_THRESHOLD", 3)
+
+Notifier = Callable[[SupportBotSettings], Awaitable[None]]
+
+
+class BotDisabledError(TelegramUnauthorizedError):
+    """Raised instead of calling the API for a bot whose breaker is open."""
+
+
+class BotHealth(BaseRequestMiddleware):
+    def __init__(self, config: BotConfig = bot_config, *, threshold: int = THRESHOLD):
+        self._config = config
+        self._threshold = threshold
+        self._notify: Notifier | None = None
+        self._failures: dict[int, int] = {}
+        self._tripped: set[int] = set()
+        self.unauthorized = 0
+        self.conflict = 0
+        self.forbidden = 0
+        self.trips = 0
+        self.short_circuited = 0
+
+    def attach(self, notify: Notifier | None) -> None:
+        """Tell a bot's owner through ``notify`` when its breaker trips."""
+        self._notify = notify
+
+    async def __call__(
+        self,
+        make_request: NextRequestMiddlewareType[TelegramType],
+        bot: Bot,
+        method: TelegramMethod[TelegramType],
+    ) -> Response[TelegramType]:
+        if bot.id in self._tripped:
+            self.short_circuited += 1
+            raise BotDisabledError(method, "bot disabled: token revoked")
+        try:
+            response = await make_request(bot, method)
+        except TelegramForbiddenError:
+            self.forbidden += 1
+            raise
+        except (TelegramUnauthorizedError, TelegramConflictError) as ex:
+            if isinstance(ex, TelegramConflictError):
+                self.conflict += 1
+            else:
+                self.unauthorized += 1
+            await self._failed(bot.id, ex)
+            raise
+        self._failures.pop(bot.id, None)
+        return response
+
+    async def _failed(self, bot_id: int, ex: Exception) -> None:
+        settings = self._config.get_bot_setting(bot_id)
+        if settings is None or bot_id in self._tripped:
+            return
+        failures = self._failures[bot_id] = self._failures.get(bot_id, 0) + 1
+        if failures < self._threshold:
+            return
+        # Trip before awaiting, so concurrent sends stop at once.
+        self._tripped.add(bot_id)
+        self._failures.pop(bot_id, None)
+        self.trips += 1
+        logger.error(
+            f"{type(ex).__name__} {settings.username} {bot_id} "
+            f"x{failures} - disabling bot"
+        )
+        if settings.can_work:
+            await self._config.save_settings_to_db(
+                settings.model_copy(update={"can_work": False})
+            )
+        if self._notify is not None:
+            try:
+                await self._notify(settings)
+            except Exception as notify_ex:
+                logger.warning(f"owner of bot {bot_id} not notified: {notify_ex}")
+
+    def reset(self, bot_id: int | None) -> None:
+        """Settings listener: close the breaker of bots enabled again."""
+        for tripped in [bot_id] if bot_id is not None else list(self._tripped):
+            settings = self._config.get_bot_setting(tripped)
+            if settings is None or settings.can_work:
+                self._tripped.discard(tripped)
+                self._failures.pop(tripped, None)
+
+    def reset_force(self, bot_id: int) -> None:
+        """Close the breaker of a bot before an explicit admin action.
+
+        If the token is still dead the breaker trips again after
+        ``THRESHOLD`` failures.
+        """
+        self._tripped.discard(bot_id)
+        self._failures.pop(bot_id, None)
+
+    def stats(self) -> dict[str, int]:
+        return {
+            "tripped": len(self._tripped),
+            "failing": len(self._failures),
+            "unauthorized": self.unauthorized,
+            "conflict": self.conflict,
+            "forbidden": self.forbidden,
+            "trips": self.trips,
+            "short_circuited": self.short_circuited,
+        }
+
+
+bot_health = BotHealth()
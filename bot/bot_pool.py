@@ -0,0 +1,110 @@
+"""``Bot`` objects for support bots, built on demand and dropped when idle.
+
+``main.py`` used to build a ``Bot`` (with its session) for every enabled bot
+at startup and keep all of them for the life of the process; bots enabled
+later through the admin dialog were then built by aiogram's
+``TokenBasedRequestHandler`` as plain ``Bot(token)``, bypassing
+``make_bot`` (no shared pool, no send scheduler), and so was any token that
+appeared in a webhook URL.
+
+:class:`BotPool` builds a bot with ``make_bot`` on its first webhook hit,
+only for a token of an enabled bot (``bot/token_index.py``); anything else
+is refused before an object exists. Bots unused for ``IDLE_SECONDS``
+or beyond ``MAX_BOTS`` (least recently used first) are dropped, and a
+settings change drops the bot so the next hit picks up the new token or
+``can_work``. Dropping needs no close: sessions share ``http_pool``.
+
+Tunables (env, read once on import): ``BOT_POOL_SIZE`` (1000),
+``BOT_POOL_IDLE_SECONDS`` (1800).
+"""
+
+from __future__ import annotations
+
+import time
+from collections import OrderedDict
+from collections.abc import Callable
+from typing import Final
+
+from aiogram import Bot
+
+from bot.token_index import TokenIndex
+from config.bot_config import env, make_bot
+
+MAX_BOTS: Final[int] = env.int("BOT_POOL_SIZE", 1000)
+IDLE_SECONDS: Final[float] = env.float("BOT_POOL_IDLE_SECONDS", 1800.0)
+
+
+def token_bot_id(token: str) -> int | None:
+    """The bot id a Bot API token starts with."""
+    prefix, _, secret = token.partition(":")
+    return int(prefix) if prefix.isdigit() and secret else None
+
+
+class BotPool:
+    def __init__(
+        self,
+        tokens: TokenIndex,
+        *,
+        bot_factory: Callable[[str], Bot] = make_bot,
+        max_bots: int = MAX_BOTS,
+        idle: float = IDLE_SECONDS,
+        clock: Callable[[], float] = time.monotonic,
+    ):
+        self._tokens = tokens
+        self._bot_factory = bot_factory
+        self._max_bots = max_bots
+        self._idle = idle
+        self._clock = clock
+        # token -> (bot, last use); least recently used first.
+        self._bots: OrderedDict[str, tuple[Bot, float]] = OrderedDict()
+        self.created = 0
+        self.hits = 0
+        self.refused = 0
+        self.evicted = 0
+
+    def get(self, token: str) -> Bot | None:
+        """The bot for ``token``, or None if it is not an enabled bot's."""
+        now = self._clock()
+        entry = self._bots.get(token)
+        if entry is not None:
+            self.hits += 1
+            self._bots[token] = (entry[0], now)
+            self._bots.move_to_end(token)
+            self._evict(now)
+            return entry[0]
+        if token not in self._tokens:
+            self.refused += 1
+            return None
+        bot = self._bot_factory(token)
+        self.created += 1
+        self._bots[token] = (bot, now)
+        self._evict(now)
+        return bot
+
+    def _evict(self, now: float) -> None:
+        while self._bots:
+            token, (_, used) = next(iter(self._bots.items()))
+            if len(self._bots) <= self._max_bots and now - used < self._idle:
+                return
+            del self._bots[token]
+            self.evicted += 1
+
+    def forget(self, bot_id: int | None) -> None:
+        """Settings listener: drop the changed bot, or all on a full reload."""
+        if bot_id is None:
+            self._bots.clear()
+            return
+        for token in [token for token in self._bots if token_bot_id(token) == bot_id]:
+            del self._bots[token]
+
+    def __len__(self) -> int:
+        return len(self._bots)
+
+    def stats(self) -> dict[str, int]:
+        return {
+            "bots": len(self._bots),
+            "created": self.created,
+            "hits": self.hits,
+            "refused": self.refused,
+            "evicted": self.evicted,
+        }
@@ -0,0 +1,436 @@
+"""Resumable ``/send`` broadcasts.
+
+``/send`` used to deliver to each listed user in the handler, one after
+another, and only reported at the end, so a restart lost the whole run. Now
+the command stores a job in ``t_broadcasts`` with one
+``t_broadcast_recipients`` row per chat and hands it to
+:class:`BroadcastEngine`:
+
+* ``CONCURRENCY`` workers send in parallel; pacing is left to the outbound
+  send scheduler (``bot/send_scheduler.py``);
+* ``TelegramRetryAfter`` and network/5xx errors are retried with backoff up
+  to ``MAX_ATTEMPTS`` times, other API errors fail the recipient at once;
+* per-recipient results are written every ``FLUSH_INTERVAL_SECONDS``;
+* one progress message in the master chat is edited every
+  ``PROGRESS_INTERVAL_SECONDS`` and turned into the final report at the end.
+
+Jobs still ``running`` at startup are resumed with their pending recipients.
+Delivery is at-least-once: a recipient sent within the last flush window
+before a crash is sent again on resume.
+"""
+
+from __future__ import annotations
+
+import asyncio
+import datetime
+import io
+import re
+import time
+from collections.abc import Awaitable, Callable, Iterable
+from typing import Final
+
+from aiogram import Bot
+from aiogram.exceptions import (
+    TelegramNetworkError,
+    TelegramRetryAfter,
+    TelegramServerError,
+)
+from aiogram.types import Document
+from loguru import logger
+from sqlalchemy import func, insert, select, update
+from sqlalchemy.ext.asyncio import AsyncSession, async_sessionmaker
+
+from bot.sharding import current_shard
+from config.bot_config import bot_config, make_bot
+from database.models import BroadcastRecipients, Broadcasts, session_maker
+from database.repositories import Repo
+from database.write_behind import MessageWriteBehind, message_writer
+
+CONCURRENCY: Final[int] = 8
+MAX_ATTEMPTS: Final[int] = 5
+BACKOFF_SECONDS: Final[float] = 2.0
+MAX_BACKOFF_SECONDS: Final[float] = 60.0
+FLUSH_INTERVAL_SECONDS: Final[float] = 1.0
+# Edits count against the master chat's 20 messages/minute budget.
+PROGRESS_INTERVAL_SECONDS: Final[float] = 10.0
+MAX_ID_FILE_BYTES: Final[int] = 1_000_000
+FAILED_IDS_IN_REPORT: Final[int] = 50
+
+PENDING: Final = "pending"
+SENT: Final = "sent"
+FAILED: Final = "failed"
+RUNNING: Final = "running"
+DONE: Final = "done"
+
+_ID_RE: Final = re.compile(r"#?(?:id)?(-?\d+)", re.IGNORECASE)
+
+
+def parse_recipient_ids(text: str) -> list[int]:
+    """Extract chat ids from ``/send`` arguments or an uploaded list.
+
+    Like the old parser, a token must be longer than 5 characters and may
+    carry an ``ID``/``#ID`` prefix (``ID123456``); anything else is skipped. Ids are
+    deduplicated, keeping the first occurrence.
+    """
+    ids: dict[int, None] = {}
+    for token in re.split(r"[\s,;()]+", text):
+        if len(token) <= 5:
+            continue
+        match = _ID_RE.fullmatch(token)
+        if match:
+            ids[int(match.group(1))] = None
+    return list(ids)
+
+
+async def read_id_file(bot: Bot, document: Document) -> str:
+    """Download an attached id list; raises ``ValueError`` if it is too big."""
+    if document.file_size and document.file_size > MAX_ID_FILE_BYTES:
+        raise ValueError(f"file is larger than {MAX_ID_FILE_BYTES} bytes")
+    buffer = io.BytesIO()
+    await bot.download(document, destination=buffer)
+    return buffer.getvalue().decode("utf-8", errors="ignore")
+
+
+def _progress_text(
+    broadcast_id: int, total: int, sent: int, failed: int, finished: bool
+) -> str:
+    if finished:
+        return (
+            f"Рассылка #{broadcast_id} завершена: отправлено {sent} из {total}, "
+            f"ошибок {failed}"
+        )
+    return (
+        f"Рассылка #{broadcast_id}: отправлено {sent} из {total}, ошибок {failed}, "
+        f"осталось {total - sent - failed}"
+    )
+
+
+class BroadcastEngine:
+    def __init__(
+        self,
+        session_factory: async_sessionmaker[AsyncSession] = session_maker,
+        writer: MessageWriteBehind = message_writer,
+        *,
+        concurrency: int = CONCURRENCY,
+        sleep: Callable[[float], Awaitable[None]] = asyncio.sleep,
+    ):
+        self._session_factory = session_factory
+        self._writer = writer
+        self._concurrency = concurrency
+        self._sleep = sleep
+        self._tasks: dict[int, asyncio.Task[None]] = {}
+
+    async def create(
+        self,
+        *,
+        bot_id: int,
+        chat_id: int,
+        thread_id: int | None,
+        command_message_id: int,
+        text: str,
+        support_user_id: int | None,
+        recipients: Iterable[int],
+    ) -> int:
+        """Store a job with all recipients pending; returns its id."""
+        async with self._session_factory() as session:
+            job = Broadcasts(
+                bot_id=bot_id,
+                chat_id=chat_id,
+                thread_id=thread_id,
+                command_message_id=command_message_id,
+                support_user_id=support_user_id,
+                text=text,
+                status=RUNNING,
+            )
+            session.add(job)
+            await session.flush()
+            await session.execute(
+                insert(BroadcastRecipients),
+                [
+                    {
+                        "broadcast_id": job.broadcast_id,
+                        "chat_id": recipient,
+                        "status": PENDING,
+                        "attempts": 0,
+                    }
+                    for recipient in recipients
+                ],
+            )
+            await session.commit()
+            return job.broadcast_id
+
+    def start(self, bot: Bot, broadcast_id: int, *, close_bot: bool = False) -> None:
+        """Run a stored job in the background."""
+        task = asyncio.create_task(self._run(bot, broadcast_id, close_bot))
+        self._tasks[broadcast_id] = task
+        task.add_done_callback(lambda _: self._tasks.pop(broadcast_id, None))
+
+    async def resume(self, bot_for: Callable[[int], Bot | None]) -> int:
+        """Restart jobs left ``running``; returns how many were resumed."""
+        async with self._session_factory() as session:
+            result = await session.execute(
+                select(Broadcasts.broadcast_id, Broadcasts.bot_id).filter(
+                    Broadcasts.status == RUNNING
+                )
+            )
+            jobs = result.all()
+        resumed = 0
+        for broadcast_id, bot_id in jobs:
+            # With several worker processes each resumes its own bots' jobs.
+            if broadcast_id in self._tasks or not current_shard.owns(bot_id):
+                continue
+            bot = bot_for(bot_id)
+            if bot is None:
+                logger.warning(
+                    f"broadcast not resumed, bot unavailable — "
+                    f"broadcast_id={broadcast_id}, bot_id={bot_id}"
+                )
+                continue
+            self.start(bot, broadcast_id, close_bot=True)
+            resumed += 1
+        if resumed:
+            logger.info(f"resumed broadcasts — count={resumed}")
+        return resumed
+
+    async def close(self) -> None:
+        """Stop running jobs; they stay ``running`` and resume on next start."""
+        tasks = list(self._tasks.values())
+        for task in tasks:
+            task.cancel()
+        await asyncio.gather(*tasks, return_exceptions=True)
+
+    async def wait(self, broadcast_id: int) -> None:
+        task = self._tasks.get(broadcast_id)
+        if task is not None:
+            await task
+
+    async def _run(self, bot: Bot, broadcast_id: int, close_bot: bool) -> None:
+        try:
+            await self._deliver_job(bot, broadcast_id)
+        except asyncio.CancelledError:
+            raise
+        except Exception as ex:
+            logger.exception(
+                f"broadcast failed — broadcast_id={broadcast_id}, bot_id={bot.id}: {ex}"
+            )
+        finally:
+            if close_bot:
+                await bot.session.close()
+
+    async def _deliver_job(self, bot: Bot, broadcast_id: int) -> None:
+        async with self._session_factory() as session:
+            job = await session.get(Broadcasts, broadcast_id)
+            if job is None or job.status != RUNNING:
+                return
+            rows = await session.execute(
+                select(BroadcastRecipients.status, func.count())
+                .filter(BroadcastRecipients.broadcast_id == broadcast_id)
+                .group_by(BroadcastRecipients.status)
+            )
+            counts: dict[str, int] = {status: count for status, count in rows}
+            pending = list(
+                (
+                    await session.scalars(
+                        select(BroadcastRecipients.chat_id).filter(
+                            BroadcastRecipients.broadcast_id == broadcast_id,
+                            BroadcastRecipients.status == PENDING,
+                        )
+                    )
+                ).all()
+            )
+        progress = _Progress(
+            total=sum(counts.values()),
+            sent=counts.get(SENT, 0),
+            failed=counts.get(FAILED, 0),
+        )
+        logger.info(
+            f"broadcast started — broadcast_id={broadcast_id}, bot_id={bot.id}, "
+            f"pending={len(pending)}, total={progress.total}"
+        )
+        await self._report(bot, job, progress, finished=False)
+
+        queue: asyncio.Queue[int] = asyncio.Queue()
+        for chat_id in pending:
+            queue.put_nowait(chat_id)
+        results: list[dict] = []
+        repo = Repo(writer=self._writer, session_factory=self._session_factory)
+        workers = [
+            asyncio.create_task(self._worker(bot, job, repo, queue, results, progress))
+            for _ in range(min(self._concurrency, len(pending)))
+        ]
+        last_report = time.monotonic()
+        try:
+            while workers and not all(worker.done() for worker in workers):
+                await asyncio.wait(workers, timeout=FLUSH_INTERVAL_SECONDS)
+                await self._flush(broadcast_id, results)
+                if time.monotonic() - last_report >= PROGRESS_INTERVAL_SECONDS:
+                    await self._report(bot, job, progress, finished=False)
+                    last_report = time.monotonic()
+            for worker in workers:
+                worker.result()
+        finally:
+            for worker in workers:
+                worker.cancel()
+            await asyncio.gather(*workers, return_exceptions=True)
+            await asyncio.shield(self._flush(broadcast_id, results))
+            await repo.close()
+
+        await self._finish(bot, job, progress)
+
+    async def _worker(
+        self,
+        bot: Bot,
+        job: Broadcasts,
+        repo: Repo,
+        queue: asyncio.Queue[int],
+        results: list[dict],
+        progress: _Progress,
+    ) -> None:
+        while not queue.empty():
+            chat_id = queue.get_nowait()
+            status, attempts, error = await self._deliver(bot, job, repo, chat_id)
+            if status == SENT:
+                progress.sent += 1
+            else:
+                progress.failed += 1
+                progress.failed_ids.append(chat_id)
+            results.append(
+                {
+                    "broadcast_id": job.broadcast_id,
+                    "chat_id": chat_id,
+                    "status": status,
+                    "attempts": attempts,
+                    "error": error,
+                }
+            )
+
+    async def _deliver(
+        self, bot: Bot, job: Broadcasts, repo: Repo, chat_id: int
+    ) -> tuple[str, int, str | None]:
+        error = None
+        for attempt in range(1, MAX_ATTEMPTS + 1):
+            try:
+                sent = await bot.send_message(chat_id=chat_id, text=job.text)
+            except TelegramRetryAfter as ex:
+                delay, error = float(ex.retry_after), str(ex)
+            except (TelegramNetworkError, TelegramServerError) as ex:
+                delay = min(BACKOFF_SECONDS * 2 ** (attempt - 1), MAX_BACKOFF_SECONDS)
+                error = str(ex)
+            except Exception as ex:
+                logger.warning(
+                    f"broadcast send failed — broadcast_id={job.broadcast_id}, "
+                    f"bot_id={bot.id}, target_chat_id={chat_id}: {ex}"
+                )
+                return FAILED, attempt, str(ex)
+            else:
+                await repo.save_message_ids(
+                    bot_id=bot.id,
+                    user_id=job.support_user_id,
+                    message_id=job.command_message_id,
+                    resend_id=sent.message_id,
+                    chat_from_id=job.chat_id,
+                    chat_for_id=sent.chat.id,
+                )
+                return SENT, attempt, None
+            if attempt < MAX_ATTEMPTS:
+                await self._sleep(delay)
+        logger.warning(
+            f"broadcast send gave up — broadcast_id={job.broadcast_id}, "
+            f"bot_id={bot.id}, target_chat_id={chat_id}: {error}"
+        )
+        return FAILED, MAX_ATTEMPTS, error
+
+    async def _flush(self, broadcast_id: int, results: list[dict]) -> None:
+        if not results:
+            return
+        batch = results[:]
+        del results[: len(batch)]
+        try:
+            async with self._session_factory() as session:
+                await session.execute(update(BroadcastRecipients), batch)
+                await session.commit()
+        except Exception as ex:
+            results[:0] = batch
+            logger.error(
+                f"broadcast progress not saved — broadcast_id={broadcast_id}, "
+                f"rows={len(batch)}: {ex}"
+            )
+
+    async def _report(
+        self, bot: Bot, job: Broadcasts, progress: _Progress, *, finished: bool
+    ) -> None:
+        text = _progress_text(
+            job.broadcast_id, progress.total, progress.sent, progress.failed, finished
+        )
+        if finished and progress.failed_ids:
+            shown = " ".join(map(str, progress.failed_ids[:FAILED_IDS_IN_REPORT]))
+            more = len(progress.failed_ids) - FAILED_IDS_IN_REPORT
+            text += f"\nНе доставлено: {shown}" + (f" и ещё {more}" if more > 0 else "")
+        try:
+            if job.progress_message_id is None:
+                message = await bot.send_message(
+                    chat_id=job.chat_id,
+                    text=text,
+                    message_thread_id=job.thread_id,
+                    reply_to_message_id=job.command_message_id,
+                )
+                job.progress_message_id = message.message_id
+                async with self._session_factory() as session:
+                    await session.execute(
+                        update(Broadcasts)
+                        .filter(Broadcasts.broadcast_id == job.broadcast_id)
+                        .values(progress_message_id=message.message_id)
+                    )
+                    await session.commit()
+            else:
+                await bot.edit_message_text(
+                    text=text, chat_id=job.chat_id, message_id=job.progress_message_id
+                )
+        except Exception as ex:
+            logger.warning(
+                f"broadcast progress message not updated — "
+                f"broadcast_id={job.broadcast_id}: {ex}"
+            )
+
+    async def _finish(self, bot: Bot, job: Broadcasts, progress: _Progress) -> None:
+        async with self._session_factory() as session:
+            await session.execute(
+                update(Broadcasts)
+                .filter(Broadcasts.broadcast_id == job.broadcast_id)
+                .values(status=DONE, finished_at=datetime.datetime.now())
+            )
+            await session.commit()
+        logger.info(
+            f"broadcast finished — broadcast_id={job.broadcast_id}, bot_id={bot.id}, "
+            f"sent={progress.sent}, failed={progress.failed}"
+        )
+        await self._report(bot, job, progress, finished=True)
+
+
+class _Progress:
+    __slots__ = ("total", "sent", "failed", "failed_ids")
+
+    def __init__(self, total: int, sent: int, failed: int):
+        self.total = total
+        self.sent = sent
+        self.failed = failed
+        # Only failures of this run; earlier ones are in the DB.
+        self.failed_ids: list[int] = []
+
+
+def _bot_for(bot_id: int) -> Bot | None:
+    settings = bot_config.get_bot_setting(bot_id)
+    if settings is None or not settings.can_work:
+        return None
+    return make_bot(settings.token)
+
+
+async def resume_broadcasts() -> None:
+    """Startup hook: continue jobs interrupted by a restart."""
+    try:
+        await broadcasts.resume(_bot_for)
+    except Exception as ex:
+        logger.error(f"broadcasts not resumed: {ex}")
+
+
+broadcasts = BroadcastEngine()
@@ -1,4 +1,5 @@
 from .loader import get_all_routers as get_all_routers
+from .loader import get_customization_routers as get_customization_routers
 from .registry import get_customization as get_customization
 
-__all__ = ["get_customization", "get_all_routers"]
+__all__ = ["get_customization", "get_all_routers", "get_customization_routers"]
@@ -11,23 +11,26 @@ def get_all_routers() -> Router:
     """
     master_router = Router()
 
-    # We need to instantiate customizations to get their routers
-    # Since specific bot logic might be needed, we iterate through registered classes
-    # But wait, get_customization returns a fresh instance.
-    # Routers should ideally be singleton-ish or at least stateless regarding the bot instance if possible
-    # or the customization instance handles it.
+    # get_customization returns the per-bot instance that cmd_resend also
+    # uses, so handlers on these routers share state with the support router.
 
-    # For now, let's just make sure we import all known customizations here
+    # Make sure we import all known customizations here
     # so they register themselves.
 
     # Import known customizations
     importlib.import_module("bot.customizations.helper")
     importlib.import_module("bot.customizations.test_customization")
 
-    for bot_id in _CUSTOMIZATION_REGISTRY:
-        customization = get_customization(bot_id)
+    for router in get_customization_routers().values():
         # We only add the router if it has handlers (not empty)
         # But even empty routers are fine.
-        master_router.include_router(customization.router)
+        master_router.include_router(router)
 
     return master_router
+
+
+def get_customization_routers() -> dict[int, Router]:
+    """Router of every registered customization, by bot_id."""
+    return {
+        bot_id: get_customization(bot_id).router for bot_id in _CUSTOMIZATION_REGISTRY
+    }
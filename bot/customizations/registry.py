@@ -6,16 +6,31 @@ from .default import DefaultBotCustomization
 # Mapping of bot_id -> Customization Class
 _CUSTOMIZATION_REGISTRY: Dict[int, Type[AbstractBotCustomization]] = {}
 
+# One long-lived instance per customized bot_id, created on first use.
+# Customizations own a Router and in-flight state (e.g. pending acks), so the
+# instance serving handlers must be the same one the support router talks to.
+_INSTANCES: Dict[int, AbstractBotCustomization] = {}
+
+# Bots without a customization share one stateless default.
+_DEFAULT = DefaultBotCustomization()
+
 
 def register_customization(bot_id: int):
     def decorator(cls: Type[AbstractBotCustomization]):
         _CUSTOMIZATION_REGISTRY[bot_id] = cls
+        _INSTANCES.pop(bot_id, None)
         return cls
 
     return decorator
 
 
 def get_customization(bot_id: int) -> AbstractBotCustomization:
-    """Returns an instance of the customization for the given bot_id, or Default."""
-    customization_cls = _CUSTOMIZATION_REGISTRY.get(bot_id, DefaultBotCustomization)
-    return customization_cls()
+    """Returns the customization instance for the given bot_id, or Default."""
+    instance = _INSTANCES.get(bot_id)
+    if instance is not None:
+        return instance
+    customization_cls = _CUSTOMIZATION_REGISTRY.get(bot_id)
+    if customization_cls is None:
+        return _DEFAULT
+    instance = _INSTANCES[bot_id] = customization_cls()
+    return instance
@@ -0,0 +1,164 @@
+"""One aiohttp connection pool shared by every ``Bot`` built with ``make_bot``.
+
+aiogram's ``AiohttpSession`` owns a ``ClientSession`` with its own
+``TCPConnector``, SSL context and DNS cache, so a process serving 1,000
+support bots kept 1,000 of each plus at least one keep-alive socket per bot
+that had sent anything. ``PooledAiohttpSession`` keeps aiogram's request
+code but takes its ``ClientSession`` from the process-wide ``http_pool``:
+all bots multiplex over one connector, bounded by ``TELEGRAM_POOL_LIMIT``.
+
+``PooledAiohttpSession.close()`` does not close the shared session: bots are
+closed all over the code (``async with`` temp bots, ``/logout``,
+broadcasts), while the pool lives until ``http_pool.close()`` on shutdown.
+A request after that opens a fresh pool, as ``AiohttpSession`` does.
+
+Tunables (env, read once on import):
+
+* ``TELEGRAM_POOL_LIMIT`` — connections in total (default 100);
+* ``TELEGRAM_POOL_LIMIT_PER_HOST`` — per host, 0 for no extra cap;
+* ``TELEGRAM_POOL_KEEPALIVE`` — seconds an idle connection is kept;
+* ``TELEGRAM_POOL_DNS_TTL`` — seconds a resolved address is cached.
+"""
+
+from __future__ import annotations
+
+import asyncio
+import ssl
+from typing import Any, Final
+
+import certifi
+from aiogram.__meta__ import __version__
+from aiogram.client.session.aiohttp import AiohttpSession
+from aiogram.client.session.base import BaseSession
+from aiohttp import ClientSession, TCPConnector, TraceConfig
+from aiohttp.hdrs import USER_AGENT
+from aiohttp.http import SERVER_SOFTWARE
+
+from config.bot_config import env
+
+POOL_LIMIT: Final[int] = env.int("TELEGRAM_POOL_LIMIT", 100)
+POOL_LIMIT_PER_HOST: Final[int] = env.int("TELEGRAM_POOL_LIMIT_PER_HOST", 0)
+KEEPALIVE_SECONDS: Final[float] = env.float("TELEGRAM_POOL_KEEPALIVE", 30.0)
+# Same as aiogram: the Bot API host does not move, and without a cache every
+# new connection does a lookup (https://github.com/aiogram/aiogram/issues/1500).
+DNS_TTL_SECONDS: Final[int] = env.int("TELEGRAM_POOL_DNS_TTL", 3600)
+
+
+class ConnectionPool:
+    def __init__(
+        self,
+        *,
+        limit: int = POOL_LIMIT,
+        limit_per_host: int = POOL_LIMIT_PER_HOST,
+        keepalive_timeout: float = KEEPALIVE_SECONDS,
+        dns_ttl: int = DNS_TTL_SECONDS,
+    ):
+        self.limit = limit
+        self.limit_per_host = limit_per_host
+        self.keepalive_timeout = keepalive_timeout
+        self.dns_ttl = dns_ttl
+        self._session: ClientSession | None = None
+        self._loop: asyncio.AbstractEventLoop | None = None
+        self.sessions_opened = 0
+        self.connections_created = 0
+        self.connections_reused = 0
+        self.queued = 0
+        self.peak_queued = 0
+
+    async def client_session(self) -> ClientSession:
+        loop = asyncio.get_running_loop()
+        # single_bot.py calls get_me() under its own asyncio.run() before
+        # polling starts; a session is bound to the loop it was opened in.
+        if self._session is None or self._session.closed or self._loop is not loop:
+            self._session = self._open()
+            self._loop = loop
+        return self._session
+
+    def _open(self) -> ClientSession:
+        connector = TCPConnector(
+            ssl=ssl.create_default_context(cafile=certifi.where()),
+            limit=self.limit,
+            limit_per_host=self.limit_per_host,
+            keepalive_timeout=self.keepalive_timeout,
+            ttl_dns_cache=self.dns_ttl,
+        )
+        self.sessions_opened += 1
+        return ClientSession(
+            connector=connector,
+            headers={USER_AGENT: f"{SERVER_SOFTWARE} aiogram/{__version__}"},
+            trace_configs=[self._trace_config()],
+        )
+
+    def _trace_config(self) -> TraceConfig:
+        trace = TraceConfig()
+
+        async def created(*_: Any) -> None:
+            self.connections_created += 1
+
+        async def reused(*_: Any) -> None:
+            self.connections_reused += 1
+
+        async def queued(*_: Any) -> None:
+            self.queued += 1
+            self.peak_queued = max(self.peak_queued, self.queued)
+
+        async def dequeued(*_: Any) -> None:
+            self.queued -= 1
+
+        trace.on_connection_create_end.append(created)
+        trace.on_connection_reuseconn.append(reused)
+        trace.on_connection_queued_start.append(queued)
+        trace.on_connection_queued_end.append(dequeued)
+        trace.freeze()
+        return trace
+
+    async def close(self) -> None:
+        session, self._session = self._session, None
+        if session is not None and not session.closed:
+            await session.close()
+            # Let SSL transports finish closing, as AiohttpSession.close() does.
+            await asyncio.sleep(0.25)
+
+    def stats(self) -> dict[str, int]:
+        session = self._session
+        connector = session.connector if session and not session.closed else None
+        # aiohttp has no public counters for these; read them defensively.
+        acquired = getattr(connector, "_acquired", ())
+        idle = getattr(connector, "_conns", {})
+        return {
+            "limit": self.limit,
+            "in_use": len(acquired),
+            "idle": sum(len(conns) for conns in idle.values()),
+            "hosts": len(idle),
+            "queued": self.queued,
+            "peak_queued": self.peak_queued,
+            "connections_created": self.connections_created,
+            "connections_reused": self.connections_reused,
+            "sessions_opened": self.sessions_opened,
+        }
+
+
+class PooledAiohttpSession(AiohttpSession):
+    """aiogram session that sends through a shared ``ConnectionPool``.
+
+    Skips ``AiohttpSession.__init__``: it would build an SSL context and
+    connector settings per bot that are never used. Proxies are not
+    supported.
+    """
+
+    def __init__(self, pool: ConnectionPool | None = None, **kwargs: Any) -> None:
+        BaseSession.__init__(self, **kwargs)
+        self._pool = pool or http_pool
+        self._session = None
+        self._proxy = None
+        self._should_reset_connector = False
+
+    async def create_session(self) -> ClientSession:
+        return await self._pool.client_session()
+
+    async def close(self) -> None:
+        # The ClientSession belongs to the pool; see the module docstring.
+        return None
+
+
+http_pool = ConnectionPool()
@@ -0,0 +1,131 @@
+"""Per-bot ``getMe`` answers, kept in memory.
+
+Handlers used to call ``bot.get_me()`` just to log the bot's username: a Bot
+API round trip before every forward in ``cmd_resend``. Now they read
+:meth:`BotIdentities.username` synchronously. The cache is filled by a
+background task started on dispatcher startup and refreshed every
+``REFRESH_INTERVAL_SECONDS``; until a bot has been fetched (or when
+``getMe`` fails) the username stored in its ``SupportBotSettings`` is used.
+With several worker processes each one fetches only the bots it owns
+(``bot/sharding.py``); a bot moved here while its worker is down uses the
+settings username.
+"""
+
+from __future__ import annotations
+
+import asyncio
+import time
+from collections.abc import Awaitable, Callable
+from typing import Final
+
+from aiogram import Bot
+from aiogram.types import User
+from loguru import logger
+
+from bot.sharding import Shard, current_shard
+from config.bot_config import BotConfig, SupportBotSettings, bot_config, make_bot
+
+REFRESH_INTERVAL_SECONDS: Final[float] = 6 * 3600
+CONCURRENCY: Final[int] = 8
+
+
+class BotIdentities:
+    def __init__(
+        self,
+        config: BotConfig = bot_config,
+        *,
+        bot_factory: Callable[[str], Bot] = make_bot,
+        shard: Shard = current_shard,
+        interval: float = REFRESH_INTERVAL_SECONDS,
+        sleep: Callable[[float], Awaitable[None]] = asyncio.sleep,
+    ):
+        self._config = config
+        self._bot_factory = bot_factory
+        self._shard = shard
+        self._interval = interval
+        self._sleep = sleep
+        self._users: dict[int, User] = {}
+        self._task: asyncio.Task[None] | None = None
+        self.refreshes = 0
+        self.errors = 0
+
+    def get(self, bot_id: int) -> User | None:
+        return self._users.get(bot_id)
+
+    def username(self, bot_id: int) -> str | None:
+        user = self._users.get(bot_id)
+        if user is not None:
+            return user.username
+        settings = self._config.get_bot_setting(bot_id)
+        return settings.username if settings is not None else None
+
+    def remember(self, user: User) -> None:
+        """Store a ``getMe`` answer a caller already has."""
+        self._users[user.id] = user
+
+    async def refresh(self) -> int:
+        """Fetch every working bot this worker owns; returns how many answered."""
+        started = time.perf_counter()
+        semaphore = asyncio.Semaphore(CONCURRENCY)
+        settings = [
+            item
+            for item in self._config.get_bot_settings()
+            if item.can_work and self._shard.owns(item.id)
+        ]
+
+        async def fetch(item: SupportBotSettings) -> bool:
+            async with semaphore:
+                try:
+                    async with self._bot_factory(item.token) as bot:
+                        user = await bot.get_me()
+                except Exception as ex:
+                    self.errors += 1
+                    logger.warning(f"getMe failed for bot_id={item.id}: {ex}")
+                    return False
+            if user.username != item.username:
+                logger.warning(
+                    f"bot_id={item.id} is @{user.username}, "
+                    f"settings say @{item.username}"
+                )
+            self.remember(user)
+            return True
+
+        fetched = sum(await asyncio.gather(*(fetch(item) for item in settings)))
+        self.refreshes += 1
+        logger.info(
+            f"bot identities refreshed — {fetched}/{len(settings)}, "
+            f"took={time.perf_counter() - started:.2f}s"
+        )
+        return fetched
+
+    async def start(self) -> None:
+        """Startup hook: refresh in the background, so startup does not wait."""
+        if self._task is None or self._task.done():
+            self._task = asyncio.create_task(self._run())
+
+    async def _run(self) -> None:
+        while True:
+            try:
+                await self.refresh()
+            except Exception as ex:
+                logger.error(f"bot identities not refreshed: {ex}")
+            await self._sleep(self._interval)
+
+    async def close(self) -> None:
+        task, self._task = self._task, None
+        if task is not None:
+            task.cancel()
+            await asyncio.gather(task, return_exceptions=True)
+
+    def clear(self) -> None:
+        self._users.clear()
+
+    def stats(self) -> dict[str, int]:
+        return {
+            "bots": len(self._users),
+            "refreshes": self.refreshes,
+            "errors": self.errors,
+        }
+
+
+bot_identities = BotIdentities()
@@ -0,0 +1,287 @@
+"""Collects album (media group) parts and forwards each album once.
+
+Telegram delivers an album as separate messages sharing a
+``media_group_id``, with no marker for the last part. ``resend_message_plus``
+used to keep the parts in ``BotConfig.media_groups`` and park the first
+handler in ``sleep(7)``; only photo albums were handled.
+
+:class:`MediaGroupAggregator` keeps the parts per ``(bot_id, chat_id,
+media_group_id)`` and runs the album's flush callback ``IDLE_SECONDS`` after
+the last part arrived (``MAX_WAIT_SECONDS`` after the first at the latest).
+Handlers return right away; the callback gets the parts ordered by
+``message_id``.
+
+With several webhook workers the parts of one album can land in different
+processes. :meth:`MediaGroupAggregator.attach` then moves the buffer to the
+Redis behind ``RedisStorage`` (:class:`RedisAlbumStore`): parts are appended
+to one list per album, and the worker that received the last part claims and
+drains it under a short lease once its idle timer fires. The first part's
+worker drains the list at ``MAX_WAIT_SECONDS`` regardless, and the list
+expires after ``PARTS_TTL_SECONDS`` if every worker holding a timer for it
+died.
+"""
+
+from __future__ import annotations
+
+import asyncio
+import os
+from collections.abc import Awaitable, Callable, Coroutine
+from typing import Any, Final
+
+from aiogram.types import (
+    InputMediaAudio,
+    InputMediaDocument,
+    InputMediaPhoto,
+    InputMediaVideo,
+    Message,
+)
+from loguru import logger
+from redis.asyncio import Redis
+
+IDLE_SECONDS: Final[float] = 0.6
+MAX_WAIT_SECONDS: Final[float] = 5.0
+PARTS_TTL_SECONDS: Final[float] = 60.0
+# Covers the check and drain in RedisAlbumStore.claim, not the forwarding.
+LEASE_SECONDS: Final[float] = 5.0
+
+AlbumKey = tuple[int, int, str]
+AlbumMedia = InputMediaAudio | InputMediaDocument | InputMediaPhoto | InputMediaVideo
+FlushCallback = Callable[[list[Message]], Awaitable[None]]
+
+
+def album_media(message: Message, *, with_caption: bool = True) -> AlbumMedia | None:
+    """The ``send_media_group`` item for an album part."""
+    # html_text renders the caption with its entities for the HTML parse mode.
+    caption = message.html_text if with_caption and message.caption else None
+    if message.photo:
+        return InputMediaPhoto(media=message.photo[-1].file_id, caption=caption)
+    if message.video:
+        return InputMediaVideo(media=message.video.file_id, caption=caption)
+    if message.document:
+        return InputMediaDocument(media=message.document.file_id, caption=caption)
+    if message.audio:
+        return InputMediaAudio(media=message.audio.file_id, caption=caption)
+    return None
+
+
+class RedisAlbumStore:
+    """Album parts shared between processes through Redis."""
+
+    def __init__(
+        self,
+        redis: Redis,
+        *,
+        prefix: str = "media_group",
+        ttl: float = PARTS_TTL_SECONDS,
+        lease: float = LEASE_SECONDS,
+    ):
+        self._redis = redis
+        self._prefix = prefix
+        self._ttl_ms = int(ttl * 1000)
+        self._lease_ms = int(lease * 1000)
+
+    def _key(self, key: AlbumKey) -> str:
+        bot_id, chat_id, media_group_id = key
+        return f"{self._prefix}:{bot_id}:{chat_id}:{media_group_id}"
+
+    async def append(self, key: AlbumKey, message: Message) -> int:
+        """Add a part; returns how many parts the album has now."""
+        name = self._key(key)
+        async with self._redis.pipeline(transaction=True) as pipe:
+            pipe.rpush(name, message.model_dump_json(exclude_none=True))
+            pipe.pexpire(name, self._ttl_ms)
+            count, _ = await pipe.execute()
+        return int(count)
+
+    async def claim(self, key: AlbumKey, expected: int = 0) -> list[Message] | None:
+        """Take every part of the album, or None if someone else should.
+
+        With ``expected`` set, the parts are only taken while the album still
+        has that many, i.e. nobody appended after the caller's part.
+        """
+        name = self._key(key)
+        lease = f"{name}:lease"
+        # The holder's pid, for whoever looks at Redis during an incident.
+        if not await self._redis.set(lease, os.getpid(), nx=True, px=self._lease_ms):
+            return None
+        try:
+            count = await self._redis.llen(name)
+            if count == 0 or (expected and count != expected):
+                return None
+            async with self._redis.pipeline(transaction=True) as pipe:
+                pipe.lrange(name, 0, -1)
+                pipe.delete(name)
+                parts, _ = await pipe.execute()
+        finally:
+            await self._redis.delete(lease)
+        return [Message.model_validate_json(part) for part in parts]
+
+
+class _Album:
+    __slots__ = ("messages", "flush", "timer", "started")
+
+    def __init__(self, flush: FlushCallback, started: float):
+        self.messages: list[Message] = []
+        self.flush = flush
+        self.timer: asyncio.TimerHandle | None = None
+        self.started = started
+
+
+class _Claim:
+    """This worker's timers for an album buffered in Redis."""
+
+    __slots__ = ("flush", "idle", "deadline")
+
+    def __init__(self, flush: FlushCallback):
+        self.flush = flush
+        self.idle: asyncio.TimerHandle | None = None
+        self.deadline: asyncio.TimerHandle | None = None
+
+
+class MediaGroupAggregator:
+    def __init__(
+        self,
+        *,
+        idle: float = IDLE_SECONDS,
+        max_wait: float = MAX_WAIT_SECONDS,
+        store: RedisAlbumStore | None = None,
+    ):
+        self._idle = idle
+        self._max_wait = max_wait
+        self._store = store
+        self._albums: dict[AlbumKey, _Album] = {}
+        self._claims: dict[AlbumKey, _Claim] = {}
+        self._tasks: set[asyncio.Task[None]] = set()
+        self.albums = 0
+        self.parts = 0
+        self.failures = 0
+        self.claims_skipped = 0
+
+    def attach(self, store: RedisAlbumStore | None) -> None:
+        """Buffer albums in ``store`` (shared by all workers) from now on."""
+        self._store = store
+
+    async def add(self, key: AlbumKey, message: Message, flush: FlushCallback) -> bool:
+        """Buffer a part; ``flush`` of the album's first part is the one run.
+
+        With a Redis store it is the ``flush`` of the last part's worker.
+        Returns True when ``message`` opened a new album.
+        """
+        if self._store is not None:
+            return await self._add_shared(key, message, flush)
+        loop = asyncio.get_running_loop()
+        album = self._albums.get(key)
+        opened = album is None
+        if album is None:
+            album = self._albums[key] = _Album(flush, loop.time())
+        album.messages.append(message)
+        self.parts += 1
+        if album.timer is not None:
+            album.timer.cancel()
+        delay = min(self._idle, album.started + self._max_wait - loop.time())
+        album.timer = loop.call_later(max(delay, 0.0), self._due, key)
+        return opened
+
+    async def _add_shared(
+        self, key: AlbumKey, message: Message, flush: FlushCallback
+    ) -> bool:
+        assert self._store is not None
+        count = await self._store.append(key, message)
+        self.parts += 1
+        loop = asyncio.get_running_loop()
+        claim = self._claims.get(key)
+        if claim is None:
+            claim = self._claims[key] = _Claim(flush)
+        claim.flush = flush
+        if claim.idle is not None:
+            claim.idle.cancel()
+        claim.idle = loop.call_later(self._idle, self._claim_due, key, count)
+        if count == 1:
+            claim.deadline = loop.call_later(self._max_wait, self._claim_due, key, 0)
+        return count == 1
+
+    def _claim_due(self, key: AlbumKey, expected: int) -> None:
+        claim = self._claims.get(key)
+        if claim is not None:
+            if expected:
+                claim.idle = None
+            else:
+                claim.deadline = None
+        self._track(self._claim(key, expected))
+
+    async def _claim(self, key: AlbumKey, expected: int) -> None:
+        assert self._store is not None
+        try:
+            messages = await self._store.claim(key, expected)
+        except Exception as ex:
+            self.failures += 1
+            logger.error(f"album not claimed — media_group_id={key[2]}: {ex}")
+            return
+        claim = self._claims.get(key)
+        if messages is None:
+            self.claims_skipped += 1
+            # Later parts went elsewhere; keep only a pending max-wait timer.
+            if claim is not None and claim.idle is None and claim.deadline is None:
+                del self._claims[key]
+            return
+        if claim is None:
+            return
+        del self._claims[key]
+        for timer in (claim.idle, claim.deadline):
+            if timer is not None:
+                timer.cancel()
+        album = _Album(claim.flush, 0.0)
+        album.messages = messages
+        await self._flush(key, album)
+
+    def _track(self, coro: Coroutine[Any, Any, None]) -> None:
+        task = asyncio.create_task(coro)
+        self._tasks.add(task)
+        task.add_done_callback(self._tasks.discard)
+
+    def _due(self, key: AlbumKey) -> None:
+        album = self._albums.pop(key, None)
+        if album is None:
+            return
+        self._track(self._flush(key, album))
+
+    async def _flush(self, key: AlbumKey, album: _Album) -> None:
+        self.albums += 1
+        messages = sorted(album.messages, key=lambda message: message.message_id)
+        try:
+            await album.flush(messages)
+        except Exception as ex:
+            self.failures += 1
+            logger.error(
+                f"album not forwarded — bot_id={key[0]}, chat_id={key[1]}, "
+                f"media_group_id={key[2]}, parts={len(messages)}: {ex}"
+            )
+
+    async def close(self) -> None:
+        """Flush buffered albums now and wait for running flushes."""
+        for key, album in list(self._albums.items()):
+            if album.timer is not None:
+                album.timer.cancel()
+            self._due(key)
+        for key, claim in list(self._claims.items()):
+            for timer in (claim.idle, claim.deadline):
+                if timer is not None:
+                    timer.cancel()
+            # Drains parts other workers added too; they have nobody to wait for.
+            claim.idle = claim.deadline = None
+            self._track(self._claim(key, 0))
+        if self._tasks:
+            await asyncio.gather(*self._tasks, return_exceptions=True)
+
+    def stats(self) -> dict[str, int]:
+        return {
+            "buffered": len(self._albums) + len(self._claims),
+            "flushing": len(self._tasks),
+            "albums": self.albums,
+            "parts": self.parts,
+            "failures": self.failures,
+            "claims_skipped": self.claims_skipped,
+        }
+
+
+media_groups = MediaGroupAggregator()
@@ -0,0 +1,24 @@
+"""In-process counters served as JSON for monitoring.
+
+Components register a ``stats()`` callable under a name; in webhook mode
+``main.py`` serves all of them at ``/{SECRET_URL}/metrics``.
+"""
+
+from collections.abc import Callable, Mapping
+from typing import Any
+
+from aiohttp import web
+
+_sources: dict[str, Callable[[], Mapping[str, Any]]] = {}
+
+
+def register(name: str, stats: Callable[[], Mapping[str, Any]]) -> None:
+    _sources[name] = stats
+
+
+def snapshot() -> dict[str, Mapping[str, Any]]:
+    return {name: stats() for name, stats in _sources.items()}
+
+
+async def metrics_handler(request: web.Request) -> web.Response:
+    return web.json_response(snapshot())
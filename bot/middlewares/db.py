@@ -14,6 +14,11 @@ class DbSessionMiddleware(BaseMiddleware):
         event: TelegramObject,
         data: Dict[str, Any],
     ) -> Any:
-        async with session_maker() as session:
-            data["repo"] = Repo(session)
+        # The session is opened by Repo on its first query, so updates that
+        # never touch the DB (/start, callbacks, cache hits) skip it entirely.
+        repo = Repo(session_factory=session_maker)
+        data["repo"] = repo
+        try:
             return await handler(event, data)
+        finally:
+            await repo.close()
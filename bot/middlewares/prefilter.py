@@ -0,0 +1,93 @@
+"""Outer update middleware that drops updates no support handler should see.
+
+Registered as the first outer middleware of the support bots' dispatcher, so
+rejected updates never open a DB session, never build a ``Repo`` and never
+reach handler resolution. It drops updates:
+
+* for bots without settings (``unknown_bot``) — no handler could run without
+  ``bot_settings`` anyway;
+* sent by other bots outside the master chat (``bot_sender``);
+* from users in ``ignore_users`` outside the master chat (``ignored_user``).
+
+The master chat is never filtered: operators and bots there are handled as
+before. Changes of the bot's own membership (``my_chat_member``) always pass.
+"""
+
+from collections import Counter
+from typing import Any, Awaitable, Callable, Dict
+
+from aiogram import BaseMiddleware, Bot
+from aiogram.dispatcher.event.bases import UNHANDLED
+from aiogram.types import Chat, TelegramObject, Update, User
+
+from config.bot_config import BotConfig, SupportBotSettings
+
+_ignored: dict[int, tuple[object, frozenset[int]]] = {}
+
+
+def ignored_user_ids(bot_settings: SupportBotSettings) -> frozenset[int]:
+    """Return ``ignore_users`` of a settings snapshot as a set.
+
+    Cached per bot and rebuilt only when the snapshot carries a different
+    ``ignore_users`` list.
+    """
+    users = bot_settings.ignore_users
+    cached = _ignored.get(bot_settings.id)
+    if cached is not None and cached[0] is users:
+        return cached[1]
+    ignored = frozenset(users)
+    _ignored[bot_settings.id] = (users, ignored)
+    return ignored
+
+
+def clear_cache() -> None:
+    """Drop the cached ignore sets. Intended for tests."""
+    _ignored.clear()
+
+
+class PrefilterMiddleware(BaseMiddleware):
+    def __init__(self, config: BotConfig):
+        self.config = config
+        self.passed = 0
+        self.dropped: Counter[str] = Counter()
+
+    async def __call__(
+        self,
+        handler: Callable[[TelegramObject, Dict[str, Any]], Awaitable[Any]],
+        event: TelegramObject,
+        data: Dict[str, Any],
+    ) -> Any:
+        reason = self._reject_reason(event, data)
+        if reason is not None:
+            self.dropped[reason] += 1
+            return UNHANDLED
+        self.passed += 1
+        return await handler(event, data)
+
+    def _reject_reason(self, event: TelegramObject, data: Dict[str, Any]) -> str | None:
+        bot: Bot | None = data.get("bot")
+        bot_settings = self.config.get_bot_setting(bot.id) if bot else None
+        if bot_settings is None:
+            return "unknown_bot"
+        if isinstance(event, Update) and event.my_chat_member is not None:
+            return None
+        # Filled by aiogram's UserContextMiddleware, which runs before us.
+        user: User | None = data.get("event_from_user")
+        if user is None:
+            return None
+        chat: Chat | None = data.get("event_chat")
+        if chat is not None and chat.id == bot_settings.master_chat:
+            return None
+        if user.is_bot:
+            return "bot_sender"
+        if user.id in ignored_user_ids(bot_settings):
+            return "ignored_user"
+        return None
+
+    def stats(self) -> dict[str, int]:
+        return {
+            "passed": self.passed,
+            "unknown_bot": self.dropped["unknown_bot"],
+            "bot_sender": self.dropped["bot_sender"],
+            "ignored_user": self.dropped["ignored_user"],
+        }
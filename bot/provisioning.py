@@ -0,0 +1,211 @@
+"""Webhook and command setup for every support bot at startup.
+
+``aiogram_on_startup_webhook`` used to call ``setMyCommands`` and
+``setWebhook`` for each enabled bot in turn, so a large fleet took minutes
+to come up and every restart re-posted the same configuration. Now
+:func:`provision_bots` runs ``CONCURRENCY`` bots at a time and, per bot,
+reads ``getWebhookInfo`` / ``getMyCommands`` first and only writes what
+differs. Network errors, 5xx and ``RetryAfter`` are retried up to
+``MAX_ATTEMPTS`` times; a revoked token disables the bot. The per-bot
+results are summarised by :func:`format_summary` for the admin.
+
+Each bot subscribes only to the update types its handlers use, see
+:func:`allowed_updates_for`.
+"""
+
+from __future__ import annotations
+
+import asyncio
+import time
+from collections import Counter
+from collections.abc import Awaitable, Callable, Sequence
+from dataclasses import dataclass
+from html import escape
+from typing import Final, TypeVar
+
+from aiogram import Bot, Router
+from aiogram.dispatcher.router import INTERNAL_UPDATE_TYPES
+from aiogram.exceptions import (
+    TelegramNetworkError,
+    TelegramRetryAfter,
+    TelegramServerError,
+    TelegramUnauthorizedError,
+)
+from aiogram.types import BotCommandScopeAllPrivateChats
+from loguru import logger
+
+from config.bot_config import PRIVATE_COMMANDS, BotConfig, SupportBotSettings
+
+CONCURRENCY: Final[int] = 16
+MAX_ATTEMPTS: Final[int] = 3
+BACKOFF_SECONDS: Final[float] = 1.0
+# Longer RetryAfter fails the bot instead of holding up startup.
+MAX_RETRY_AFTER: Final[float] = 30.0
+PROBLEMS_IN_SUMMARY: Final[int] = 30
+
+UNCHANGED: Final = "unchanged"
+UPDATED: Final = "updated"
+SKIPPED: Final = "skipped"
+UNAUTHORIZED: Final = "unauthorized"
+FAILED: Final = "failed"
+
+# Without a master chat there is nothing to mirror edits and reactions to.
+_MASTER_CHAT_UPDATES: Final = frozenset({"edited_message", "message_reaction"})
+
+T = TypeVar("T")
+
+
+@dataclass(frozen=True, slots=True)
+class ProvisionResult:
+    bot_id: int
+    username: str
+    status: str
+    detail: str = ""
+
+
+def allowed_updates_for(settings: SupportBotSettings) -> list[str]:
+    """Update types a support bot needs.
+
+    The support router's handlers plus the handlers of this bot's own
+    customization; other bots' customization routers are skipped, so e.g.
+    ``channel_post`` only goes to the bot whose customization handles it.
+    """
+    from bot.customizations import get_customization, get_customization_routers
+    from bot.routers.supports import router as support_router
+
+    own = get_customization(settings.id).router
+    foreign = {
+        id(tail)
+        for router in get_customization_routers().values()
+        if router is not own
+        for tail in router.chain_tail
+    }
+    used: set[str] = set()
+    for router in support_router.chain_tail:
+        if id(router) not in foreign:
+            used.update(_handled_updates(router))
+    if settings.master_chat is None:
+        used -= _MASTER_CHAT_UPDATES
+    return sorted(used)
+
+
+def _handled_updates(router: Router) -> set[str]:
+    # Router.resolve_used_update_types() without descending into sub-routers.
+    return {
+        name
+        for name, observer in router.observers.items()
+        if observer.handlers and name not in INTERNAL_UPDATE_TYPES
+    }
+
+
+async def with_retries(
+    call: Callable[[], Awaitable[T]],
+    sleep: Callable[[float], Awaitable[None]] = asyncio.sleep,
+) -> T:
+    """Run ``call``, retrying transient Bot API errors."""
+    for attempt in range(1, MAX_ATTEMPTS + 1):
+        try:
+            return await call()
+        except TelegramRetryAfter as ex:
+            if attempt == MAX_ATTEMPTS or ex.retry_after > MAX_RETRY_AFTER:
+                raise
+            delay = float(ex.retry_after)
+        except (TelegramNetworkError, TelegramServerError):
+            if attempt == MAX_ATTEMPTS:
+                raise
+            delay = BACKOFF_SECONDS * 2 ** (attempt - 1)
+        await sleep(delay)
+    raise AssertionError("unreachable")  # pragma: no cover
+
+
+async def sync_bot(bot: Bot, url: str, allowed_updates: Sequence[str]) -> bool:
+    """Bring one bot's webhook and commands in line; True if anything changed."""
+    changed = False
+    info = await bot.get_webhook_info()
+    if info.url != url or set(info.allowed_updates or ()) != set(allowed_updates):
+        await bot.set_webhook(url=url, allowed_updates=list(allowed_updates))
+        changed = True
+    scope = BotCommandScopeAllPrivateChats()
+    commands = await bot.get_my_commands(scope=scope)
+    if [(item.command, item.description) for item in commands] != [
+        (item.command, item.description) for item in PRIVATE_COMMANDS
+    ]:
+        await bot.set_my_commands(commands=PRIVATE_COMMANDS, scope=scope)
+        changed = True
+    return changed
+
+
+async def provision_bots(
+    config: BotConfig,
+    *,
+    bot_factory: Callable[[str], Bot],
+    allowed_updates: Callable[[SupportBotSettings], Sequence[str]] = (
+        allowed_updates_for
+    ),
+    concurrency: int = CONCURRENCY,
+    sleep: Callable[[float], Awaitable[None]] = asyncio.sleep,
+) -> list[ProvisionResult]:
+    semaphore = asyncio.Semaphore(concurrency)
+
+    async def provision(settings: SupportBotSettings) -> ProvisionResult:
+        if not settings.can_work:
+            logger.info(
+                f"skip webhook setup for disabled bot {settings.username} {settings.id}"
+            )
+            return ProvisionResult(settings.id, settings.username, SKIPPED)
+        url = config.other_bots_url.format(bot_token=settings.token)
+        wanted = allowed_updates(settings)
+        async with semaphore:
+            try:
+                async with bot_factory(settings.token) as bot:
+                    changed = await with_retries(
+                        lambda: sync_bot(bot, url, wanted), sleep
+                    )
+            except TelegramUnauthorizedError:
+                logger.error(
+                    f"TelegramUnauthorizedError {settings.username} {settings.id} "
+                    f"- disabling bot"
+                )
+                await config.save_settings_to_db(
+                    settings.model_copy(update={"can_work": False})
+                )
+                return ProvisionResult(settings.id, settings.username, UNAUTHORIZED)
+            except Exception as ex:
+                logger.error(
+                    f"set_webhook_error {settings.username} {settings.id}: {ex}"
+                )
+                return ProvisionResult(
+                    settings.id, settings.username, FAILED, str(ex)[:100]
+                )
+        return ProvisionResult(
+            settings.id, settings.username, UPDATED if changed else UNCHANGED
+        )
+
+    started = time.perf_counter()
+    results = await asyncio.gather(
+        *(provision(settings) for settings in config.get_bot_settings())
+    )
+    counts = Counter(result.status for result in results)
+    logger.info(
+        f"webhooks provisioned in {time.perf_counter() - started:.1f}s: {dict(counts)}"
+    )
+    return list(results)
+
+
+def format_summary(results: Sequence[ProvisionResult]) -> str:
+    counts = Counter(result.status for result in results)
+    lines = [
+        f"Вебхуки: {len(results)} ботов — "
+        f"без изменений {counts[UNCHANGED]}, обновлено {counts[UPDATED]}, "
+        f"ошибок {counts[FAILED]}, отключено (токен отозван) {counts[UNAUTHORIZED]}, "
+        f"пропущено {counts[SKIPPED]}"
+    ]
+    problems = [result for result in results if result.status in (FAILED, UNAUTHORIZED)]
+    for result in problems[:PROBLEMS_IN_SUMMARY]:
+        detail = f": {escape(result.detail)}" if result.detail else ""
+        lines.append(
+            f"@{escape(result.username)} ({result.bot_id}) {result.status}{detail}"
+        )
+    if len(problems) > PROBLEMS_IN_SUMMARY:
+        lines.append(f"… и ещё {len(problems) - PROBLEMS_IN_SUMMARY}")
+    return "\n".join(lines)
@@ -10,6 +10,8 @@ from aiogram_dialog.widgets.kbd import Select, Column, SwitchTo, ManagedCheckbox
 from aiogram_dialog.widgets.text import Const, Format
 from loguru import logger
 
+from bot.bot_health import bot_health
+from bot.provisioning import allowed_updates_for
 from config.bot_config import (
     BotConfig,
     SupportBotSettings,
@@ -159,12 +161,13 @@ async def mh_change_chat(
 
             topic_id = int(chat_data[1]) if len(chat_data) > 1 else None
 
-            bot_setting.master_chat = chat_id
-            bot_setting.master_thread = topic_id
+            bot_setting = bot_setting.model_copy(
+                update={"master_chat": chat_id, "master_thread": topic_id}
+            )
             await config.update_bot_setting(bot_setting)
 
             if bot_setting.can_work:
-                bot_setting.can_work = False
+                bot_setting = bot_setting.model_copy(update={"can_work": False})
                 await config.update_bot_setting(bot_setting)
                 async with make_bot(bot_setting.token) as temp_bot:
                     await delete_webhook(temp_bot)
@@ -198,8 +201,9 @@ async def mh_change_start_message(
     if message.text is None:
         return
 
-    bot_setting.start_message = message.text
-    await config.update_bot_setting(bot_setting)
+    await config.update_bot_setting(
+        bot_setting.model_copy(update={"start_message": message.text})
+    )
 
     await message.answer("Приветственное сообщение успешно обновлено.")
     await dialog_manager.switch_to(AdminBotStates.options)
@@ -220,8 +224,9 @@ async def mh_change_security_policy(
     if message.text is None:
         return
 
-    bot_setting.security_policy = message.text
-    await config.update_bot_setting(bot_setting)
+    await config.update_bot_setting(
+        bot_setting.model_copy(update={"security_policy": message.text})
+    )
 
     await message.answer("Политика конфиденциальности успешно обновлена.")
     await dialog_manager.switch_to(AdminBotStates.options)
@@ -242,8 +247,9 @@ async def mh_change_auto_reply(
     if message.text is None:
         return
 
-    bot_setting.auto_reply = message.text
-    await config.update_bot_setting(bot_setting)
+    await config.update_bot_setting(
+        bot_setting.model_copy(update={"auto_reply": message.text})
+    )
 
     await message.answer("Автоответ успешно обновлен.")
     await dialog_manager.switch_to(AdminBotStates.options)
@@ -277,12 +283,15 @@ async def mh_change_spam_block_words(
         return
 
     if message.text.strip() == "-":
-        bot_setting.spam_block_words = []
-        await config.update_bot_setting(bot_setting)
+        await config.update_bot_setting(
+            bot_setting.model_copy(update={"spam_block_words": []})
+        )
         await message.answer("Список стоп-слов очищен.")
     else:
-        bot_setting.spam_block_words = _parse_spam_block_words(message.text)
-        await config.update_bot_setting(bot_setting)
+        spam_block_words = _parse_spam_block_words(message.text)
+        await config.update_bot_setting(
+            bot_setting.model_copy(update={"spam_block_words": spam_block_words})
+        )
         await message.answer("Список стоп-слов успешно обновлен.")
     await dialog_manager.switch_to(AdminBotStates.options)
 
@@ -309,8 +318,9 @@ async def mh_change_owner(
 
         # Если чат найден, меняем владельца
         old_owner = bot_setting.owner
-        bot_setting.owner = new_owner_id
-        await config.update_bot_setting(bot_setting)
+        await config.update_bot_setting(
+            bot_setting.model_copy(update={"owner": new_owner_id})
+        )
 
         # Отправляем сообщения новому и старому владельцу
         assert message.bot is not None
@@ -420,22 +430,34 @@ async def button_clicked(
         return
 
     if button.widget_id == "mark_bad":
-        bot_setting.mark_bad = not bot_setting.mark_bad
+        bot_setting = bot_setting.model_copy(
+            update={"mark_bad": not bot_setting.mark_bad}
+        )
         await config.update_bot_setting(bot_setting)
     elif button.widget_id == "use_auto_reply":
-        bot_setting.use_auto_reply = not bot_setting.use_auto_reply
+        bot_setting = bot_setting.model_copy(
+            update={"use_auto_reply": not bot_setting.use_auto_reply}
+        )
         await config.update_bot_setting(bot_setting)
     elif button.widget_id == "local_names":
-        bot_setting.use_local_names = not bot_setting.use_local_names
+        bot_setting = bot_setting.model_copy(
+            update={"use_local_names": not bot_setting.use_local_names}
+        )
         await config.update_bot_setting(bot_setting)
     elif button.widget_id == "ignore_commands":
-        bot_setting.ignore_commands = not bot_setting.ignore_commands
+        bot_setting = bot_setting.model_copy(
+            update={"ignore_commands": not bot_setting.ignore_commands}
+        )
         await config.update_bot_setting(bot_setting)
     elif button.widget_id == "block_links":
-        bot_setting.block_links = not bot_setting.block_links
+        bot_setting = bot_setting.model_copy(
+            update={"block_links": not bot_setting.block_links}
+        )
         await config.update_bot_setting(bot_setting)
     elif button.widget_id == "can_work":
         if not bot_setting.can_work:
+            # The owner re-enables a bot the breaker disabled: let the check through.
+            bot_health.reset_force(bot_setting.id)
             try:
                 async with make_bot(bot_setting.token) as temp_bot:
                     try:
@@ -453,8 +475,10 @@ async def button_clicked(
                         webhook_url = config.other_bots_url.format(
                             bot_token=bot_setting.token
                         )
-                        await set_webhook(temp_bot, webhook_url)
-                        bot_setting.can_work = True
+                        await set_webhook(
+                            temp_bot, webhook_url, allowed_updates_for(bot_setting)
+                        )
+                        bot_setting = bot_setting.model_copy(update={"can_work": True})
                         await config.update_bot_setting(bot_setting)
                         await callback.answer("Бот успешно активирован!")
                     except TelegramBadRequest as e:
@@ -474,7 +498,7 @@ async def button_clicked(
             try:
                 async with make_bot(bot_setting.token) as temp_bot:
                     await delete_webhook(temp_bot)
-                bot_setting.can_work = False
+                bot_setting = bot_setting.model_copy(update={"can_work": False})
                 await config.update_bot_setting(bot_setting)
                 await callback.answer("Бот деактивирован")
             except Exception as e:
@@ -1,6 +1,5 @@
 import os
 from html import escape
-from asyncio import sleep
 
 from aiogram import types, Router, Bot, F
 from aiogram.enums import ChatType, ChatMemberStatus, MessageEntityType, ContentType
@@ -23,6 +22,11 @@ from config.bot_config import SupportBotSettings, BotConfig
 from database.repositories import Repo
 from bot.customizations import get_customization, get_all_routers
 from bot.reactions import safe_react_to_message, safe_set_message_reaction
+from bot.broadcast import broadcasts, parse_recipient_ids, read_id_file
+from bot.identity import bot_identities
+from bot.media_groups import album_media, media_groups
+from bot.middlewares.prefilter import ignored_user_ids
+from bot.spam_matcher import get_matcher
 
 router = Router()
 router.include_router(get_all_routers())
@@ -132,12 +136,14 @@ def _has_blocked_entity(message: types.Message) -> bool:
     return any(entity.type in blocked_entity_types for entity in message.entities)
 
 
-def _has_spam_block_word(message: types.Message, block_words: list[str]) -> bool:
-    if message.text is None:
+def _has_spam_block_word(
+    message: types.Message, bot_settings: SupportBotSettings
+) -> bool:
+    if message.text is None or not bot_settings.spam_block_words:
         return False
 
-    text = message.text.casefold()
-    return any(word.strip().casefold() in text for word in block_words if word.strip())
+    matcher = get_matcher(bot_settings.id, bot_settings.spam_block_words)
+    return matcher.search(message.text) is not None
 
 
 def _should_block_pre_reply_content(
@@ -147,7 +153,7 @@ def _should_block_pre_reply_content(
         return True
     if _has_blocked_entity(message):
         return True
-    return _has_spam_block_word(message, bot_settings.spam_block_words)
+    return _has_spam_block_word(message, bot_settings)
 
 
 class LinkChatCallbackData(CallbackData, prefix="link_chat"):
@@ -194,8 +200,10 @@ async def cmd_myname(
         if username in bot_settings.local_names.values():
             await message.answer(text=f"Псевдоним {username} уже занят")
             return
-        bot_settings.local_names[str(user.id)] = username
-        await config.update_bot_setting(bot_settings)
+        local_names = {**bot_settings.local_names, str(user.id): username}
+        await config.update_bot_setting(
+            bot_settings.model_copy(update={"local_names": local_names})
+        )
         await message.answer(
             text=f'Имя сохранено как "{username}" (локально для этого бота)'
         )
@@ -255,12 +263,16 @@ async def cmd_add_ignore(
         try:
             user_id = int(data[1])
             if user_id in bot_settings.ignore_users:
-                bot_settings.ignore_users.remove(user_id)
+                ignore_users = [
+                    item for item in bot_settings.ignore_users if item != user_id
+                ]
                 await message.answer(text=f"ID {user_id} удален из игнорируемых")
             else:
-                bot_settings.ignore_users.append(user_id)
+                ignore_users = [*bot_settings.ignore_users, user_id]
                 await message.answer(text=f"ID {user_id} добавлен в игнорируемые")
-            await config.update_bot_setting(bot_settings)
+            await config.update_bot_setting(
+                bot_settings.model_copy(update={"ignore_users": ignore_users})
+            )
         except ValueError:
             await message.answer(text="ID пользователя должен быть числом")
 
@@ -277,9 +289,6 @@ async def cmd_send(
         if bot_settings.ignore_commands:
             return
         if message.reply_to_message:
-            all_users = _require_text(message).split()
-            good_users = []
-            bad_users = []
             from_user = _require_from_user(message)
 
             user_info = (
@@ -294,41 +303,30 @@ async def cmd_send(
             support_user_id = (
                 from_user.id if bot_settings.use_local_names else user_info.user_id  # type: ignore[union-attr]
             )
-            i = 0
-            for user in all_users:
-                user = str(user)
-                if len(user) > 5:  # user.upper().find('ID') != -1:
-                    if user.upper().find("ID") > -1:
-                        chat_id = int(user[user.upper().find("ID") + 2 :])
-                    else:
-                        chat_id = int(user)
-                    if i == 10:
-                        await sleep(2)
-                        i = 0
-                    try:
-                        i += 1
-                        await resend_message_plus(
-                            message=message,
-                            bot=bot,
-                            repo=repo,
-                            chat_id=chat_id,
-                            text=f"{message.reply_to_message.html_text}\n\n"
-                            f"Вам ответил {agent_name}",
-                            reply_to_message_id=None,
-                            support_user_id=support_user_id,
-                            message_thread_id=None,
-                            config=config,
-                            do_exception=True,
-                        )
-                        good_users.append(str(chat_id))
-                    except Exception as ex:
-                        bad_users.append(str(chat_id))
-                        logger.warning(
-                            f"cmd_send failed — bot_id={bot.id}, target_chat_id={chat_id}: {ex}"
-                        )
-            await message.reply(
-                f"was send to {' '.join(good_users)} \n can`t send to {' '.join(bad_users)}"
+            # IDs come from the command itself and/or an attached list file
+            # (the command is then the document caption).
+            ids_text = message.text or message.caption or ""
+            if message.document:
+                try:
+                    ids_text += "\n" + await read_id_file(bot, message.document)
+                except Exception as ex:
+                    await message.reply(f"Не удалось прочитать файл со списком: {ex}")
+                    return
+            recipients = parse_recipient_ids(ids_text)
+            if not recipients:
+                await message.reply("Не найдено ни одного ID получателя")
+                return
+            broadcast_id = await broadcasts.create(
+                bot_id=bot.id,
+                chat_id=message.chat.id,
+                thread_id=message.message_thread_id,
+                command_message_id=message.message_id,
+                text=f"{message.reply_to_message.html_text}\n\n"
+                f"Вам ответил {agent_name}",
+                support_user_id=support_user_id,
+                recipients=recipients,
             )
+            broadcasts.start(bot, broadcast_id)
         else:
             await message.reply("Надо в ответ на сообщение")
 
@@ -442,7 +440,7 @@ async def cmd_resend(
     config: BotConfig,
 ):
     logger.info(
-        f"Support bot message - Username: {(await bot.get_me()).username}, Chat ID: {message.chat.id}"
+        f"Support bot message - Username: {bot_identities.username(bot.id)}, Chat ID: {message.chat.id}"
     )
     if message.chat.id == bot_settings.master_chat:
         reply_message = message.reply_to_message
@@ -490,6 +488,8 @@ async def cmd_resend(
     elif message.chat.type == "private":
         from_user = _require_from_user(message)
         master_chat = _require_master_chat(bot_settings)
+        if from_user.id in ignored_user_ids(bot_settings):
+            return
         user_has_reply = await repo.has_user_received_reply(
             bot_id=bot.id, user_id=from_user.id
         )
@@ -497,8 +497,6 @@ async def cmd_resend(
             if _should_block_pre_reply_content(message, bot_settings):
                 await message.reply(SPAM_BLOCK_REPLY_TEXT)
                 return
-        if from_user.id in bot_settings.ignore_users:
-            return
 
         user = from_user
         reply_to_message_id = None
@@ -571,12 +569,12 @@ async def cmd_edit_msg(
             if agent_name is None:
                 await message.reply(_no_name_error_text(bot_settings.use_local_names))
                 return
-            send_info = await repo.get_message_resend_info(
+            counterpart = await repo.get_message_counterpart(
                 bot_id=bot.id,
+                chat_id=message.chat.id,
                 message_id=message.message_id,
-                chat_from_id=message.chat.id,
             )
-            if send_info is None:
+            if counterpart is None:
                 await message.reply("Не удалось отправить изменения =(")
                 return
 
@@ -584,9 +582,9 @@ async def cmd_edit_msg(
 
             try:
                 await bot.edit_message_text(
-                    chat_id=send_info.chat_for_id,
+                    chat_id=counterpart.chat_id,
                     text=text,
-                    message_id=send_info.resend_id,
+                    message_id=counterpart.message_id,
                 )
                 await message.reply("Изменение отправлено")
             except Exception as ex:
@@ -595,21 +593,20 @@ async def cmd_edit_msg(
                 else:
                     logger.warning(
                         f"edit_message_text failed — bot_id={bot.id}, "
-                        f"chat_id={send_info.chat_for_id}, message_id={send_info.resend_id}: {ex}"
+                        f"chat_id={counterpart.chat_id}, message_id={counterpart.message_id}: {ex}"
                     )
                     await message.reply(f"Не получилось изменить сообщение =(\n{ex}")
 
     else:
         user = _require_from_user(message)
         master_chat = _require_master_chat(bot_settings)
-        send_info = await repo.get_message_resend_info(
-            bot_id=bot.id, message_id=message.message_id, chat_from_id=message.chat.id
+        counterpart = await repo.get_message_counterpart(
+            bot_id=bot.id, chat_id=message.chat.id, message_id=message.message_id
         )
-        if send_info:
-            reply_to_message_id = send_info.resend_id
-        else:
+        if counterpart is None:
             await message.reply("Не удалось отправить изменения =(")
             return
+        reply_to_message_id = counterpart.message_id
 
         await resend_message_plus(
             message=message,
@@ -636,56 +633,65 @@ async def resend_message_plus(
     config: BotConfig,
     do_exception: bool = False,
     reply_markup: types.InlineKeyboardMarkup | None = None,
+    album: list[types.Message] | None = None,
 ):
-    try:
-        if message.photo:
-            if message.media_group_id:
-                if message.media_group_id in config.media_groups:
-                    config.media_groups[message.media_group_id].append(
-                        message.photo[-1].file_id
-                    )
-                    return
-                config.media_groups[message.media_group_id] = [
-                    message.photo[-1].file_id
-                ]
-                await sleep(7)
+    """Copy ``message`` to ``chat_id`` and record the mappings.
+
+    Album parts are handed to the media group aggregator and forwarded
+    together once the album is complete; ``album`` then holds every part,
+    ordered, and ``message`` is the part ``text`` was built from.
+    """
+    if album is None and message.media_group_id and album_media(message):
+        # Runs after the handler returned; the repo is only used to queue
+        # mappings to the write-behind, which needs no session.
+        async def forward_album(parts: list[types.Message]) -> None:
+            await resend_message_plus(
+                message=message,
+                bot=bot,
+                repo=repo,
+                chat_id=chat_id,
+                text=text,
+                reply_to_message_id=reply_to_message_id,
+                support_user_id=support_user_id,
+                message_thread_id=message_thread_id,
+                config=config,
+                reply_markup=reply_markup,
+                album=parts,
+            )
 
-                album_file_ids = config.media_groups.pop(message.media_group_id, [])
-                new_album: list[MediaUnion] = [
-                    types.InputMediaPhoto(media=file_id) for file_id in album_file_ids
-                ]
-                resend_messages = await bot.send_media_group(
-                    chat_id=chat_id,
-                    message_thread_id=message_thread_id,
-                    media=new_album,
-                    reply_to_message_id=reply_to_message_id,
-                )
-                for resend_message in resend_messages:
-                    await repo.save_message_ids(
-                        bot_id=bot.id,
-                        user_id=support_user_id,
-                        message_id=message.message_id,
-                        resend_id=resend_message.message_id,
-                        chat_from_id=message.chat.id,
-                        chat_for_id=resend_message.chat.id,
-                    )
-            else:
-                resend_message = await bot.send_photo(
-                    chat_id=chat_id,
-                    message_thread_id=message_thread_id,
-                    photo=message.photo[-1].file_id,
-                    reply_to_message_id=reply_to_message_id,
-                )
-                await repo.save_message_ids(
-                    bot_id=bot.id,
-                    user_id=support_user_id,
-                    message_id=message.message_id,
-                    resend_id=resend_message.message_id,
-                    chat_from_id=message.chat.id,
-                    chat_for_id=resend_message.chat.id,
-                )
+        await media_groups.add(
+            (bot.id, message.chat.id, message.media_group_id), message, forward_album
+        )
+        return
 
-        if message.document:
+    try:
+        if album is not None and len(album) > 1:
+            await _resend_album(
+                bot=bot,
+                repo=repo,
+                album=album,
+                caption_in_text=message,
+                chat_id=chat_id,
+                reply_to_message_id=reply_to_message_id,
+                support_user_id=support_user_id,
+                message_thread_id=message_thread_id,
+            )
+        elif message.photo:
+            resend_message = await bot.send_photo(
+                chat_id=chat_id,
+                message_thread_id=message_thread_id,
+                photo=message.photo[-1].file_id,
+                reply_to_message_id=reply_to_message_id,
+            )
+            await repo.save_message_ids(
+                bot_id=bot.id,
+                user_id=support_user_id,
+                message_id=message.message_id,
+                resend_id=resend_message.message_id,
+                chat_from_id=message.chat.id,
+                chat_for_id=resend_message.chat.id,
+            )
+        elif message.document:
             resend_message = await bot.send_document(
                 chat_id=chat_id,
                 message_thread_id=message_thread_id,
@@ -700,7 +706,7 @@ async def resend_message_plus(
                 chat_from_id=message.chat.id,
                 chat_for_id=resend_message.chat.id,
             )
-        if message.sticker:
+        elif message.sticker:
             resend_message = await bot.send_sticker(
                 chat_id=chat_id,
                 message_thread_id=message_thread_id,
@@ -715,7 +721,7 @@ async def resend_message_plus(
                 chat_from_id=message.chat.id,
                 chat_for_id=resend_message.chat.id,
             )
-        if message.audio:
+        elif message.audio:
             resend_message = await bot.send_audio(
                 chat_id=chat_id,
                 message_thread_id=message_thread_id,
@@ -730,7 +736,7 @@ async def resend_message_plus(
                 chat_from_id=message.chat.id,
                 chat_for_id=resend_message.chat.id,
             )
-        if message.video:
+        elif message.video:
             resend_message = await bot.send_video(
                 chat_id=chat_id,
                 message_thread_id=message_thread_id,
@@ -884,6 +890,7 @@ async def resend_message_plus(
                     config=config,
                     do_exception=do_exception,
                     reply_markup=reply_markup,
+                    album=album,
                 )
                 return
         logger.error(
@@ -921,6 +928,46 @@ async def resend_message_plus(
             await message.answer("Send error =(")
 
 
+async def _resend_album(
+    bot: Bot,
+    repo: Repo,
+    album: list[types.Message],
+    caption_in_text: types.Message,
+    chat_id: int,
+    reply_to_message_id: int | None,
+    support_user_id: int | None,
+    message_thread_id: int | None,
+) -> None:
+    # The caption of the part the text was built from is already in the text.
+    # Compared by id: parts assembled in Redis are fresh copies.
+    media: list[MediaUnion] = [
+        item
+        for part in album
+        if (
+            item := album_media(
+                part, with_caption=part.message_id != caption_in_text.message_id
+            )
+        )
+    ]
+    resend_messages = await bot.send_media_group(
+        chat_id=chat_id,
+        message_thread_id=message_thread_id,
+        media=media,
+        reply_to_message_id=reply_to_message_id,
+    )
+    # Part i of the copy maps to part i of the original; queued back to back,
+    # the rows are committed in one write-behind batch.
+    for part, resend_message in zip(album, resend_messages):
+        await repo.save_message_ids(
+            bot_id=bot.id,
+            user_id=support_user_id,
+            message_id=part.message_id,
+            resend_id=resend_message.message_id,
+            chat_from_id=part.chat.id,
+            chat_for_id=resend_message.chat.id,
+        )
+
+
 @router.message_reaction()
 async def message_reaction(
     message: types.MessageReactionUpdated,
@@ -931,20 +978,15 @@ async def message_reaction(
     if len(message.new_reaction) == 0:
         return
 
-    if message.chat.id == bot_settings.master_chat:
-        # Check if Admin is reacting to a forwarded ticket (resend_id=msg_id)
-        send_info = await repo.get_message_resend_info(
-            bot_id=bot.id, resend_id=message.message_id, chat_for_id=message.chat.id
-        )
-        # If not, check if Admin is reacting to their own reply (message_id=msg_id)
-        if not send_info:
-            send_info = await repo.get_message_resend_info(
-                bot_id=bot.id,
-                message_id=message.message_id,
-                chat_from_id=message.chat.id,
-            )
+    # Admin reacting to a forwarded ticket or to their own reply, or user
+    # reacting to their ticket or to a received reply — one lookup resolves
+    # which side the message is on and where its counterpart lives.
+    counterpart = await repo.get_message_counterpart(
+        bot_id=bot.id, chat_id=message.chat.id, message_id=message.message_id
+    )
 
-        if send_info is None:
+    if message.chat.id == bot_settings.master_chat:
+        if counterpart is None:
             if bot_settings.mark_bad:
                 await safe_set_message_reaction(
                     bot,
@@ -955,20 +997,10 @@ async def message_reaction(
                 )
             return
 
-        # Determine target chat and message ID
-        if send_info.chat_for_id == message.chat.id:
-            # We found it via resend_id (Forwarded Ticket). Target is source (User).
-            target_chat = send_info.chat_from_id
-            target_msg = send_info.message_id
-        else:
-            # We found it via message_id (Admin Reply). Target is destination (User).
-            target_chat = send_info.chat_for_id
-            target_msg = send_info.resend_id
-
         await safe_set_message_reaction(
             bot,
-            chat_id=target_chat,
-            message_id=target_msg,
+            chat_id=counterpart.chat_id,
+            message_id=counterpart.message_id,
             reaction=message.new_reaction[0],
             log_hint="admin proxy",
         )
@@ -980,43 +1012,21 @@ async def message_reaction(
             log_hint="admin ack",
         )
 
-    else:
-        # Check if User is reacting to their own ticket (message_id=msg_id)
-        send_info = await repo.get_message_resend_info(
-            bot_id=bot.id, message_id=message.message_id, chat_from_id=message.chat.id
+    elif counterpart is not None:
+        await safe_set_message_reaction(
+            bot,
+            chat_id=counterpart.chat_id,
+            message_id=counterpart.message_id,
+            reaction=message.new_reaction[0],
+            log_hint="user proxy",
+        )
+        await safe_set_message_reaction(
+            bot,
+            chat_id=message.chat.id,
+            message_id=message.message_id,
+            reaction=ReactionTypeEmoji(emoji="👍"),
+            log_hint="user ack",
         )
-
-        # If not, check if User is reacting to an Admin reply (resend_id=msg_id)
-        if not send_info:
-            send_info = await repo.get_message_resend_info(
-                bot_id=bot.id, resend_id=message.message_id, chat_for_id=message.chat.id
-            )
-
-        if send_info:
-            # Determine target chat and message ID
-            if send_info.chat_from_id == message.chat.id:
-                # Found via message_id (User Ticket). Target is destination (Master).
-                target_chat = send_info.chat_for_id
-                target_msg = send_info.resend_id
-            else:
-                # Found via resend_id (Received Reply). Target is source (Master).
-                target_chat = send_info.chat_from_id
-                target_msg = send_info.message_id
-
-            await safe_set_message_reaction(
-                bot,
-                chat_id=target_chat,
-                message_id=target_msg,
-                reaction=message.new_reaction[0],
-                log_hint="user proxy",
-            )
-            await safe_set_message_reaction(
-                bot,
-                chat_id=message.chat.id,
-                message_id=message.message_id,
-                reaction=ReactionTypeEmoji(emoji="👍"),
-                log_hint="user ack",
-            )
 
 
 @router.my_chat_member()
@@ -1024,8 +1034,7 @@ async def on_my_chat_member(update: ChatMemberUpdated, bot: Bot):
     chat = update.chat
     old_status = update.old_chat_member.status
     new_status = update.new_chat_member.status
-    bot_user = await bot.get_me()
-    bot_info = f"Bot {bot_user.id} (@{bot_user.username})"
+    bot_info = f"Bot {bot.id} (@{bot_identities.username(bot.id)})"
 
     if old_status != new_status:
         if new_status == ChatMemberStatus.MEMBER:
@@ -1081,10 +1090,15 @@ async def process_link_callback(
     else:
         # Here you would implement the logic to save the link in your database
         # For example: save_chat_link(from_chat_id, to_chat_id, thread_id)
-        bot_settings.master_chat = callback_data.new_chat_id
-        bot_settings.master_thread = callback_data.new_thread_id
-        bot_settings.can_work = False
-        await config.update_bot_setting(bot_settings)
+        await config.update_bot_setting(
+            bot_settings.model_copy(
+                update={
+                    "master_chat": callback_data.new_chat_id,
+                    "master_thread": callback_data.new_thread_id,
+                    "can_work": False,
+                }
+            )
+        )
         await callback_message.edit_text(
             "Chat successfully linked!\n"
             "Now bot deactivated. "
@@ -1103,8 +1117,7 @@ async def on_migrate(
     assert new_chat_id is not None
     logger.info(f"Chat {old_chat_id} migrated to {new_chat_id}")
 
-    bot_settings.can_work = False
-    await config.update_bot_setting(bot_settings)
+    await config.update_bot_setting(bot_settings.model_copy(update={"can_work": False}))
 
     await bot.send_message(
         chat_id=new_chat_id,
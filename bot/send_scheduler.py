@@ -0,0 +1,208 @@
+"""Process-wide outbound rate scheduler for Bot API sends.
+
+Installed by ``make_session`` as an aiogram request middleware, so every
+``Bot`` built through ``make_bot`` shares it. Each send (``send*``,
+``copy*``, ``forward*``, ``edit*``, ``setMessageReaction``) reserves a slot
+in up to two token buckets before it goes out:
+
+* the bot bucket — ``BOT_RATE`` requests/s for all chats of a bot;
+* the chat bucket — ``PRIVATE_RATE``/s for a private chat, or
+  ``GROUP_RATE_PER_MINUTE`` for a group, supergroup or channel (master
+  chats included).
+
+Buckets are GCRA reservations: a request takes the earliest slot allowed by
+all its buckets and sleeps until then, so concurrent senders are served in
+arrival order without a lock. When Telegram still answers
+``TelegramRetryAfter`` the chat bucket (or the bot bucket for chat-less
+methods) is paused for ``retry_after`` seconds and the request is retried
+through the scheduler, up to ``MAX_RETRIES`` times.
+
+Other methods (``getMe``, ``setWebhook``, ``getChat``…) are not throttled.
+"""
+
+from __future__ import annotations
+
+import asyncio
+import time
+from collections.abc import Awaitable, Callable
+from typing import TYPE_CHECKING, Final
+
+from aiogram.client.session.middlewares.base import (
+    BaseRequestMiddleware,
+    NextRequestMiddlewareType,
+)
+from aiogram.exceptions import TelegramRetryAfter
+from aiogram.methods.base import TelegramType
+from loguru import logger
+
+if TYPE_CHECKING:
+    from aiogram import Bot
+    from aiogram.methods import Response, TelegramMethod
+
+BOT_RATE: Final[float] = 30.0
+BOT_BURST: Final[int] = 30
+PRIVATE_RATE: Final[float] = 1.0
+PRIVATE_BURST: Final[int] = 3
+GROUP_RATE_PER_MINUTE: Final[float] = 20.0
+GROUP_BURST: Final[int] = 20
+MAX_RETRIES: Final[int] = 2
+# RetryAfter longer than this is raised to the caller instead of waited out.
+MAX_RETRY_AFTER: Final[float] = 60.0
+# Waits longer than this are logged as a saturation hint.
+SLOW_WAIT_SECONDS: Final[float] = 5.0
+# Idle chat buckets are dropped once there are more than this many.
+MAX_IDLE_BUCKETS: Final[int] = 10_000
+
+_THROTTLED_PREFIXES: Final = ("send", "copy", "forward", "edit", "setMessageReaction")
+_UNTHROTTLED: Final = frozenset({"sendChatAction"})
+
+
+class _Bucket:
+    """GCRA bucket: ``tat`` is the theoretical arrival time of the next slot."""
+
+    __slots__ = ("interval", "tolerance", "tat", "paused_until")
+
+    def __init__(self, rate: float, per: float, burst: int):
+        self.interval = per / rate
+        self.tolerance = self.interval * (burst - 1)
+        self.tat = 0.0
+        self.paused_until = 0.0
+
+    def ready_at(self, now: float) -> float:
+        return max(now, self.tat - self.tolerance, self.paused_until)
+
+    def take(self, at: float) -> None:
+        self.tat = max(self.tat, at) + self.interval
+
+    def idle(self, now: float) -> bool:
+        return self.tat <= now and self.paused_until <= now
+
+
+class SendScheduler(BaseRequestMiddleware):
+    def __init__(
+        self,
+        *,
+        clock: Callable[[], float] = time.monotonic,
+        sleep: Callable[[float], Awaitable[None]] = asyncio.sleep,
+    ):
+        self._clock = clock
+        self._sleep = sleep
+        self._bots: dict[int, _Bucket] = {}
+        self._chats: dict[tuple[int, int | str], _Bucket] = {}
+        self.waiting = 0
+        self.peak_waiting = 0
+        self.requests = 0
+        self.delayed = 0
+        self.wait_seconds = 0.0
+        self.max_wait_seconds = 0.0
+        self.retry_after = 0
+
+    async def __call__(
+        self,
+        make_request: NextRequestMiddlewareType[TelegramType],
+        bot: Bot,
+        method: TelegramMethod[TelegramType],
+    ) -> Response[TelegramType]:
+        api_method = method.__api_method__
+        if not api_method.startswith(_THROTTLED_PREFIXES) or (
+            api_method in _UNTHROTTLED
+        ):
+            return await make_request(bot, method)
+
+        chat_id = getattr(method, "chat_id", None)
+        buckets = (self._bot_bucket(bot.id),)
+        if chat_id:
+            buckets += (self._chat_bucket(bot.id, chat_id),)
+        for attempt in range(MAX_RETRIES + 1):
+            await self._acquire(buckets)
+            try:
+                return await make_request(bot, method)
+            except TelegramRetryAfter as ex:
+                self.retry_after += 1
+                # The chat bucket when there is one, the bot bucket otherwise.
+                paused = buckets[-1]
+                paused.paused_until = max(
+                    paused.paused_until, self._clock() + ex.retry_after
+                )
+                logger.warning(
+                    f"send paused by RetryAfter — bot_id={bot.id}, chat_id={chat_id}, "
+                    f"method={api_method}, retry_after={ex.retry_after}, "
+                    f"attempt={attempt + 1}"
+                )
+                if attempt == MAX_RETRIES or ex.retry_after > MAX_RETRY_AFTER:
+                    raise
+        raise AssertionError("unreachable")  # pragma: no cover
+
+    async def _acquire(self, buckets: tuple[_Bucket, ...]) -> None:
+        now = self._clock()
+        self.requests += 1
+        at = max(bucket.ready_at(now) for bucket in buckets)
+        # Reserve the slot right away, so later callers queue behind this one.
+        for bucket in buckets:
+            bucket.take(at)
+        if at <= now:
+            return
+        started = now
+        self.waiting += 1
+        self.peak_waiting = max(self.peak_waiting, self.waiting)
+        try:
+            while at > now:
+                await self._sleep(at - now)
+                now = self._clock()
+                # A RetryAfter pause that came in meanwhile pushes us back.
+                at = max(now, *(bucket.paused_until for bucket in buckets))
+        finally:
+            self.waiting -= 1
+        wait = now - started
+        self.delayed += 1
+        self.wait_seconds += wait
+        self.max_wait_seconds = max(self.max_wait_seconds, wait)
+        if wait > SLOW_WAIT_SECONDS:
+            logger.warning(f"send waited {wait:.1f}s for a rate slot")
+
+    def _bot_bucket(self, bot_id: int) -> _Bucket:
+        bucket = self._bots.get(bot_id)
+        if bucket is None:
+            bucket = self._bots[bot_id] = _Bucket(BOT_RATE, 1.0, BOT_BURST)
+        return bucket
+
+    def _chat_bucket(self, bot_id: int, chat_id: int | str) -> _Bucket:
+        key = (bot_id, chat_id)
+        bucket = self._chats.get(key)
+        if bucket is None:
+            if len(self._chats) >= MAX_IDLE_BUCKETS:
+                self._prune()
+            if isinstance(chat_id, int) and chat_id > 0:
+                bucket = _Bucket(PRIVATE_RATE, 1.0, PRIVATE_BURST)
+            else:
+                bucket = _Bucket(GROUP_RATE_PER_MINUTE, 60.0, GROUP_BURST)
+            self._chats[key] = bucket
+        return bucket
+
+    def _prune(self) -> None:
+        now = self._clock()
+        self._chats = {
+            key: bucket for key, bucket in self._chats.items() if not bucket.idle(now)
+        }
+
+    def clear(self) -> None:
+        self._bots.clear()
+        self._chats.clear()
+        self.waiting = self.peak_waiting = self.requests = self.delayed = 0
+        self.retry_after = 0
+        self.wait_seconds = self.max_wait_seconds = 0.0
+
+    def stats(self) -> dict[str, int | float]:
+        return {
+            "waiting": self.waiting,
+            "peak_waiting": self.peak_waiting,
+            "requests": self.requests,
+            "delayed": self.delayed,
+            "wait_seconds": round(self.wait_seconds, 3),
+            "max_wait_seconds": round(self.max_wait_seconds, 3),
+            "retry_after": self.retry_after,
+            "chat_buckets": len(self._chats),
+        }
+
+
+send_scheduler = SendScheduler()
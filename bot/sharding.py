@@ -0,0 +1,154 @@
+"""Which worker process serves which support bot.
+
+With ``WEBHOOK_PROCESSES`` > 1, ``main.py`` runs a supervisor
+(``bot/supervisor.py``) that starts that many worker processes and forwards
+every support bot's webhook to the worker owning the bot on a
+:class:`HashRing`. All updates of a bot then land in one process, so the
+per-process state keyed by bot (mapping cache, write-behind, replied users,
+chat ordering in ``UpdateQueue``) stays coherent. While a worker is down its
+bots move to the next worker on the ring and come back when it is up again;
+only the dead worker's share moves.
+
+Workers learn their place from ``SHARD_INDEX`` / ``SHARD_COUNT``;
+:data:`current_shard` owns every bot in a single-process run.
+
+Settings edited through the admin bot (worker 0) reach the other workers
+over Redis pub/sub: :class:`SettingsBus` publishes each
+``save_settings_to_db`` / ``delete_bot_setting`` and the receivers reload
+the settings table.
+"""
+
+from __future__ import annotations
+
+import asyncio
+import bisect
+import hashlib
+import os
+from collections.abc import Iterable
+from typing import Final
+
+from loguru import logger
+from redis.asyncio import Redis
+
+from config.bot_config import BotConfig, env
+
+PROCESSES: Final[int] = env.int("WEBHOOK_PROCESSES", 1)
+REPLICAS: Final[int] = 64
+SETTINGS_CHANNEL: Final[str] = "support_bot:settings"
+
+
+def _point(value: str) -> int:
+    return int.from_bytes(hashlib.blake2b(value.encode(), digest_size=8).digest())
+
+
+class HashRing:
+    """Consistent hash of bot ids onto worker indexes."""
+
+    def __init__(self, nodes: Iterable[int], *, replicas: int = REPLICAS):
+        self.replicas = replicas
+        self.nodes = frozenset(nodes)
+        ring = sorted(
+            (_point(f"{node}#{replica}"), node)
+            for node in self.nodes
+            for replica in range(replicas)
+        )
+        self._points = [point for point, _ in ring]
+        self._owners = [node for _, node in ring]
+
+    def owner(self, bot_id: int) -> int:
+        if not self._points:
+            raise LookupError("hash ring has no nodes")
+        index = bisect.bisect(self._points, _point(str(bot_id)))
+        return self._owners[index % len(self._owners)]
+
+    def without(self, node: int) -> HashRing:
+        return HashRing(self.nodes - {node}, replicas=self.replicas)
+
+    def with_node(self, node: int) -> HashRing:
+        return HashRing(self.nodes | {node}, replicas=self.replicas)
+
+
+class Shard:
+    def __init__(self, index: int = 0, count: int = 1):
+        self.index = index
+        self.count = count
+        self.ring = HashRing(range(count))
+
+    @classmethod
+    def from_env(cls) -> Shard:
+        return cls(env.int("SHARD_INDEX", 0), env.int("SHARD_COUNT", 1))
+
+    @property
+    def is_primary(self) -> bool:
+        """Worker 0 runs the admin bot and startup provisioning."""
+        return self.index == 0
+
+    def owns(self, bot_id: int) -> bool:
+        return self.count == 1 or self.ring.owner(bot_id) == self.index
+
+
+current_shard = Shard.from_env()
+
+
+class SettingsBus:
+    def __init__(
+        self, redis: Redis, config: BotConfig, *, channel: str = SETTINGS_CHANNEL
+    ):
+        self._redis = redis
+        self._config = config
+        self._channel = channel
+        self._sender = f"{os.getpid()}"
+        self._task: asyncio.Task[None] | None = None
+        self._pending: set[asyncio.Task[None]] = set()
+        self.published = 0
+        self.received = 0
+
+    def _changed(self, bot_id: int | None) -> None:
+        # None is a full reload, e.g. the one triggered by _receive.
+        if bot_id is None:
+            return
+        task = asyncio.get_running_loop().create_task(self._publish(bot_id))
+        self._pending.add(task)
+        task.add_done_callback(self._pending.discard)
+
+    async def _publish(self, bot_id: int) -> None:
+        try:
+            await self._redis.publish(self._channel, f"{self._sender}:{bot_id}")
+            self.published += 1
+        except Exception as ex:
+            logger.error(f"settings change not published — bot_id={bot_id}: {ex}")
+
+    async def start(self) -> None:
+        """Startup hook: publish local changes, reload on remote ones."""
+        if self._task is None:
+            self._config.add_listener(self._changed)
+            pubsub = self._redis.pubsub()
+            await pubsub.subscribe(self._channel)
+            self._task = asyncio.create_task(self._receive(pubsub))
+
+    async def _receive(self, pubsub) -> None:
+        async with pubsub:
+            async for message in pubsub.listen():
+                if message.get("type") != "message":
+                    continue
+                data = message["data"]
+                sender, _, bot_id = (
+                    data.decode() if isinstance(data, bytes) else data
+                ).partition(":")
+                if sender == self._sender:
+                    continue
+                self.received += 1
+                logger.info(f"settings changed in worker pid={sender}, bot_id={bot_id}")
+                # sqlite is read in a thread; this runs in every worker.
+                await self._config.reload_from_db()
+
+    async def close(self) -> None:
+        if self._pending:
+            await asyncio.gather(*self._pending, return_exceptions=True)
+        task, self._task = self._task, None
+        if task is not None:
+            task.cancel()
+            await asyncio.gather(task, return_exceptions=True)
+
+    def stats(self) -> dict[str, int]:
+        return {"published": self.published, "received": self.received}
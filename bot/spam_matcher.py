@@ -0,0 +1,253 @@
+"""Compiled stop-word matcher for ``spam_block_words``.
+
+Each bot's stop words are compiled once and cached per bot; the cache entry
+is rebuilt only when the bot's settings snapshot carries a different
+``spam_block_words`` list (settings are immutable and replaced as a whole on
+save). Lists of up to ``SCAN_MAX_PATTERNS`` normalized words are checked
+with plain substring searches, which run in C and win for short lists; longer
+lists are compiled into an Aho–Corasick automaton, so a message is scanned in
+a single pass regardless of how many words are configured.
+
+Words and message text go through the same :func:`normalize` folding:
+
+* NFKD compatibility decomposition — fullwidth letters, mathematical
+  alphanumerics, ligatures and superscripts become plain letters;
+* combining marks and invisible format characters (zero-width spaces,
+  joiners, soft hyphens) are dropped;
+* casefold;
+* inside a word that mixes Latin with Cyrillic or Greek letters, confusable
+  letters are folded to their Latin look-alikes, so ``USDТ`` with a Cyrillic
+  ``Т`` still matches ``usdt``. Words written in one script are left alone:
+  ``Привет`` must not match ``bet``.
+
+Each stop word is compiled both as written and fully folded, so ``крипта``
+also matches ``kpиптa``; in both modes the folded forms only count when the
+message had a mixed-script word, so ``сам`` does not match ``camera``. Matching stays substring-based, like the plain ``in``
+check it replaces.
+"""
+
+from __future__ import annotations
+
+import re
+import unicodedata
+from collections import deque
+from collections.abc import Iterable
+from typing import Final
+
+# Combining diacritics (base, extended, supplement, half marks) and
+# invisible format characters used to split words without changing the look.
+_INVISIBLE_RE: Final = re.compile(
+    "[\u0300-\u036f\u1ab0-\u1aff\u1dc0-\u1dff\ufe20-\ufe2f"
+    "\u00ad\u034f\u061c\u115f\u1160\u180e\u200b-\u200f\u202a-\u202e"
+    "\u2060-\u2064\u206a-\u206f\ufeff]"
+)
+
+# Lowercase (post-casefold) Cyrillic and Greek letters that render like Latin.
+_CONFUSABLES: Final[dict[str, str]] = {
+    # Cyrillic
+    "а": "a",
+    "в": "b",
+    "е": "e",
+    "з": "3",
+    "і": "i",
+    "ј": "j",
+    "к": "k",
+    "м": "m",
+    "н": "h",
+    "о": "o",
+    "р": "p",
+    "с": "c",
+    "т": "t",
+    "у": "y",
+    "х": "x",
+    "ѕ": "s",
+    "ԁ": "d",
+    "ԛ": "q",
+    "ԝ": "w",
+    "ү": "y",
+    "һ": "h",
+    "ӏ": "l",
+    # Greek
+    "α": "a",
+    "β": "b",
+    "ε": "e",
+    "η": "n",
+    "ι": "i",
+    "κ": "k",
+    "ν": "v",
+    "ο": "o",
+    "ρ": "p",
+    "τ": "t",
+    "υ": "u",
+    "χ": "x",
+    "ω": "w",
+}
+_FOLD_TABLE: Final = str.maketrans(_CONFUSABLES)
+_LATIN_RE: Final = re.compile("[a-z]")
+_LOOKALIKE_SCRIPT_RE: Final = re.compile("[\u0370-\u03ff\u0400-\u052f]")
+# A word with both a Latin and a Cyrillic/Greek letter; anchored at word
+# starts, so a message is scanned in linear time.
+_MIXED_WORD_RE: Final = re.compile(
+    "\\b(?=\\w*?[a-z])(?=\\w*?[\u0370-\u03ff\u0400-\u052f])\\w++"
+)
+
+# Up to this many patterns a substring search per pattern beats walking the
+# automaton in Python (see benchmarks/spam_matcher.py).
+SCAN_MAX_PATTERNS: Final[int] = 600
+
+
+def _unmark(text: str) -> str:
+    text = unicodedata.normalize("NFKD", text)
+    return _INVISIBLE_RE.sub("", text).casefold()
+
+
+def _is_mixed(word: str) -> bool:
+    return bool(_LATIN_RE.search(word) and _LOOKALIKE_SCRIPT_RE.search(word))
+
+
+def _fold_word(match: re.Match[str]) -> str:
+    return match[0].translate(_FOLD_TABLE)
+
+
+def _normalize(text: str) -> tuple[str, bool]:
+    text = _unmark(text)
+    if not _is_mixed(text):
+        return text, False
+    folded = _MIXED_WORD_RE.sub(_fold_word, text)
+    return folded, folded != text
+
+
+def normalize(text: str) -> str:
+    """Fold text to the form stop words are compiled in."""
+    return _normalize(text)[0]
+
+
+class SpamMatcher:
+    """Substring scan or Aho–Corasick automaton over normalized stop words."""
+
+    __slots__ = ("_plain", "_all", "_goto", "_fail", "_match", "_plain_match", "words")
+
+    def __init__(self, words: Iterable[str]):
+        self.words: tuple[str, ...] = tuple(
+            word.strip() for word in words if word.strip()
+        )
+        # Pattern -> index of the first word it came from. Fully folded forms
+        # can only match text in which a mixed-script word was folded.
+        plain: dict[str, int] = {}
+        for index, word in enumerate(self.words):
+            if pattern := normalize(word):
+                plain.setdefault(pattern, index)
+        folded = dict(plain)
+        for pattern, index in plain.items():
+            folded.setdefault(pattern.translate(_FOLD_TABLE), index)
+        # Per state: outgoing edges, failure link and the matched word index
+        # (or -1), with matches inherited along failure links. ``_plain_match``
+        # counts only patterns as written, for text in which nothing was folded.
+        self._goto: list[dict[str, int]] = [{}]
+        self._fail: list[int] = [0]
+        self._match: list[int] = [-1]
+        self._plain_match: list[int] = [-1]
+        if len(folded) <= SCAN_MAX_PATTERNS:
+            self._plain = tuple(plain.items())
+            self._all = tuple(folded.items())
+            return
+        self._plain = self._all = ()
+        for pattern, index in folded.items():
+            self._add(pattern, index, pattern in plain)
+        self._link()
+
+    def _add(self, pattern: str, index: int, plain: bool) -> None:
+        state = 0
+        for char in pattern:
+            nxt = self._goto[state].get(char)
+            if nxt is None:
+                nxt = len(self._goto)
+                self._goto.append({})
+                self._fail.append(0)
+                self._match.append(-1)
+                self._plain_match.append(-1)
+                self._goto[state][char] = nxt
+            state = nxt
+        if self._match[state] == -1:
+            self._match[state] = index
+        if plain and self._plain_match[state] == -1:
+            self._plain_match[state] = index
+
+    def _link(self) -> None:
+        goto, fail, match = self._goto, self._fail, self._match
+        plain_match = self._plain_match
+        queue = deque(goto[0].values())
+        while queue:
+            state = queue.popleft()
+            for char, nxt in goto[state].items():
+                queue.append(nxt)
+                link = fail[state]
+                while link and char not in goto[link]:
+                    link = fail[link]
+                target = goto[link].get(char, 0)
+                fail[nxt] = target if target != nxt else 0
+                if match[nxt] == -1:
+                    match[nxt] = match[fail[nxt]]
+                if plain_match[nxt] == -1:
+                    plain_match[nxt] = plain_match[fail[nxt]]
+
+    def __bool__(self) -> bool:
+        return bool(self._all) or len(self._goto) > 1
+
+    def search(self, text: str) -> str | None:
+        """Return the first configured word found in ``text``, if any."""
+        if not self:
+            return None
+        text, folded = _normalize(text)
+        if self._all:
+            return self._scan(text, self._all if folded else self._plain)
+        goto, fail = self._goto, self._fail
+        match = self._match if folded else self._plain_match
+        state = 0
+        for char in text:
+            nxt = goto[state].get(char)
+            while nxt is None and state:
+                state = fail[state]
+                nxt = goto[state].get(char)
+            state = nxt or 0
+            if match[state] != -1:
+                return self.words[match[state]]
+        return None
+
+    def _scan(self, text: str, patterns: tuple[tuple[str, int], ...]) -> str | None:
+        for pattern, _ in patterns:
+            if pattern in text:
+                break
+        else:
+            return None
+        # Same answer as the automaton: the match that ends first, the
+        # longest one among those.
+        best: tuple[int, int, int] | None = None
+        for pattern, index in patterns:
+            start = text.find(pattern)
+            if start != -1:
+                found = (start + len(pattern), -len(pattern), index)
+                best = found if best is None else min(best, found)
+        return self.words[best[2]] if best is not None else None
+
+
+_matchers: dict[int, tuple[object, SpamMatcher]] = {}
+
+
+def get_matcher(bot_id: int, words: list[str]) -> SpamMatcher:
+    """Return the compiled matcher for a bot's current ``spam_block_words``.
+
+    ``words`` is the list object of the bot's settings snapshot; a new
+    snapshot brings a new list, which triggers a recompile.
+    """
+    cached = _matchers.get(bot_id)
+    if cached is not None and cached[0] is words:
+        return cached[1]
+    matcher = SpamMatcher(words)
+    _matchers[bot_id] = (words, matcher)
+    return matcher
+
+
+def clear_cache() -> None:
+    """Drop all compiled matchers. Intended for tests."""
+    _matchers.clear()
@@ -0,0 +1,254 @@
+"""Front process for ``WEBHOOK_PROCESSES`` > 1.
+
+``main.py`` runs this instead of the dispatchers when more than one process
+is configured. The supervisor starts the workers (``main.py`` again, with
+``SHARD_INDEX`` / ``SHARD_COUNT`` set, listening on ``WORKER_BASE_PORT +
+index`` on localhost) and keeps the public port:
+
+* the admin bot's webhook goes to worker 0;
+* a support bot's webhook goes to the worker owning its bot id (the token's
+  prefix) on the :class:`~bot.sharding.HashRing` of workers that are up;
+* ``/{SECRET_URL}/metrics`` returns the supervisor's counters and every
+  worker's metrics.
+
+Unknown and disabled tokens are answered 404 here, by the same
+``token_filter`` the workers use, so their bodies are never read or
+forwarded; the supervisor keeps its settings current through the
+``SettingsBus``.
+
+The request body is passed through as bytes; the supervisor never parses
+updates. A worker that exits is taken off the ring and restarted with
+backoff; it rejoins once its port accepts connections. A worker that is slow
+to start (worker 0 provisions the whole fleet first) is waited for, with a
+warning every ``READY_WARN_SECONDS``, rather than given up on.
+"""
+
+from __future__ import annotations
+
+import asyncio
+import os
+import sys
+import time
+from pathlib import Path
+from typing import Any, Final
+
+from aiohttp import ClientError, ClientSession, ClientTimeout, web
+from loguru import logger
+
+from bot.sharding import HashRing, SettingsBus
+from bot.token_index import TokenIndex, token_filter
+from config.bot_config import BotConfig, env
+
+WORKER_BASE_PORT: Final[int] = env.int("WORKER_BASE_PORT", 8100)
+WORKER_HOST: Final[str] = "127.0.0.1"
+READY_WARN_SECONDS: Final[float] = 120.0
+RESTART_DELAY_SECONDS: Final[float] = 1.0
+MAX_RESTART_DELAY_SECONDS: Final[float] = 30.0
+# A worker that stayed up this long restarts without backoff.
+STABLE_SECONDS: Final[float] = 60.0
+
+_MAIN_SCRIPT: Final = Path(__file__).resolve().parents[1] / "main.py"
+_FORWARDED_HEADERS: Final = ("Content-Type", "X-Telegram-Bot-Api-Secret-Token")
+
+
+def worker_port(index: int) -> int:
+    return WORKER_BASE_PORT + index
+
+
+class Supervisor:
+    def __init__(
+        self,
+        count: int,
+        *,
+        tokens: TokenIndex | None = None,
+        command: tuple[str, ...] = (sys.executable, str(_MAIN_SCRIPT)),
+    ):
+        self.count = count
+        self.tokens = tokens
+        self._command = command
+        self.ring = HashRing(())
+        self._processes: dict[int, asyncio.subprocess.Process] = {}
+        self._watchers: list[asyncio.Task[None]] = []
+        self._session: ClientSession | None = None
+        self._closing = False
+        self.forwarded = 0
+        self.unavailable = 0
+        self.restarts = 0
+
+    def _url(self, index: int, path: str) -> str:
+        return f"http://{WORKER_HOST}:{worker_port(index)}{path}"
+
+    async def start(self, app: web.Application | None = None) -> None:
+        self._session = ClientSession(timeout=ClientTimeout(total=60))
+        self._watchers = [
+            asyncio.create_task(self._watch(index)) for index in range(self.count)
+        ]
+
+    async def _watch(self, index: int) -> None:
+        delay = RESTART_DELAY_SECONDS
+        while not self._closing:
+            started = time.monotonic()
+            process = await asyncio.create_subprocess_exec(
+                *self._command,
+                env={
+                    **os.environ,
+                    "SHARD_INDEX": str(index),
+                    "SHARD_COUNT": str(self.count),
+                },
+            )
+            self._processes[index] = process
+            logger.info(f"worker {index} started — pid={process.pid}")
+            if await self._wait_ready(index, process):
+                self.ring = self.ring.with_node(index)
+                logger.info(f"worker {index} ready — ring={sorted(self.ring.nodes)}")
+            code = await process.wait()
+            self.ring = self.ring.without(index)
+            if self._closing:
+                return
+            self.restarts += 1
+            if time.monotonic() - started > STABLE_SECONDS:
+                delay = RESTART_DELAY_SECONDS
+            logger.error(
+                f"worker {index} exited with {code}, restarting in {delay:.1f}s — "
+                f"ring={sorted(self.ring.nodes)}"
+            )
+            await asyncio.sleep(delay)
+            delay = min(delay * 2, MAX_RESTART_DELAY_SECONDS)
+
+    async def _wait_ready(
+        self, index: int, process: asyncio.subprocess.Process
+    ) -> bool:
+        started = time.monotonic()
+        warn_at = started + READY_WARN_SECONDS
+        # aiohttp binds the port only after on_startup, so poll until the port
+        # opens or the worker exits (and is restarted by _watch).
+        while process.returncode is None:
+            try:
+                _, writer = await asyncio.open_connection(
+                    WORKER_HOST, worker_port(index)
+                )
+            except OSError:
+                if time.monotonic() >= warn_at:
+                    waited = time.monotonic() - started
+                    logger.warning(f"worker {index} not ready after {waited:.0f}s")
+                    warn_at += READY_WARN_SECONDS
+                await asyncio.sleep(0.5)
+                continue
+            writer.close()
+            return True
+        return False
+
+    def owner(self, bot_id: int) -> int | None:
+        return self.ring.owner(bot_id) if self.ring.nodes else None
+
+    async def _forward(self, index: int | None, request: web.Request) -> web.Response:
+        if index is None or self._session is None:
+            self.unavailable += 1
+            return web.Response(status=503, headers={"Retry-After": "1"})
+        headers = {
+            name: request.headers[name]
+            for name in _FORWARDED_HEADERS
+            if name in request.headers
+        }
+        try:
+            async with self._session.request(
+                request.method,
+                self._url(index, request.path),
+                data=await request.read(),
+                headers=headers,
+            ) as response:
+                body = await response.read()
+        except ClientError as ex:
+            # Telegram redelivers; by then the ring may have moved on.
+            self.unavailable += 1
+            logger.warning(f"worker {index} unreachable: {ex}")
+            return web.Response(status=503, headers={"Retry-After": "1"})
+        self.forwarded += 1
+        retry_after = response.headers.get("Retry-After")
+        passed = {"Retry-After": retry_after} if retry_after else None
+        return web.Response(
+            status=response.status,
+            body=body,
+            content_type=response.content_type,
+            headers=passed,
+        )
+
+    async def handle_main_bot(self, request: web.Request) -> web.Response:
+        return await self._forward(0 if 0 in self.ring.nodes else None, request)
+
+    async def handle_support_bot(self, request: web.Request) -> web.Response:
+        prefix = request.match_info["bot_token"].partition(":")[0]
+        if not prefix.isdigit():
+            raise web.HTTPNotFound()
+        return await self._forward(self.owner(int(prefix)), request)
+
+    async def handle_metrics(self, request: web.Request) -> web.Response:
+        assert self._session is not None
+        result: dict[str, Any] = {"supervisor": self.stats()}
+        for index in sorted(self.ring.nodes):
+            try:
+                async with self._session.get(self._url(index, request.path)) as reply:
+                    result[f"worker_{index}"] = await reply.json()
+            except Exception as ex:
+                result[f"worker_{index}"] = {"error": str(ex)}
+        return web.json_response(result)
+
+    async def close(self, app: web.Application | None = None) -> None:
+        self._closing = True
+        for process in self._processes.values():
+            if process.returncode is None:
+                process.terminate()
+        await asyncio.gather(
+            *(process.wait() for process in self._processes.values()),
+            return_exceptions=True,
+        )
+        for watcher in self._watchers:
+            watcher.cancel()
+        await asyncio.gather(*self._watchers, return_exceptions=True)
+        if self._session is not None:
+            await self._session.close()
+
+    def stats(self) -> dict[str, Any]:
+        return {
+            "workers": self.count,
+            "up": sorted(self.ring.nodes),
+            "forwarded": self.forwarded,
+            "unavailable": self.unavailable,
+            "restarts": self.restarts,
+            "tokens": self.tokens.stats() if self.tokens else {},
+        }
+
+
+def build_app(supervisor: Supervisor, config: BotConfig) -> web.Application:
+    middlewares = [token_filter(supervisor.tokens)] if supervisor.tokens else []
+    app = web.Application(middlewares=middlewares)
+    prefix = f"/{config.SECRET_URL}"
+    app.router.add_post(f"{prefix}/{config.MAIN_BOT_PATH}", supervisor.handle_main_bot)
+    app.router.add_post(
+        f"{prefix}/{config.OTHER_BOTS_PATH}", supervisor.handle_support_bot
+    )
+    app.router.add_get(f"{prefix}/metrics", supervisor.handle_metrics)
+    app.on_startup.append(supervisor.start)
+    app.on_cleanup.append(supervisor.close)
+    return app
+
+
+def run_supervisor(count: int, config: BotConfig) -> None:
+    from redis.asyncio import Redis
+
+    logger.info(f"Starting supervisor with {count} workers")
+    tokens = TokenIndex(config)
+    config.add_listener(tokens.rebuild)
+    supervisor = Supervisor(count, tokens=tokens)
+    bus = SettingsBus(Redis.from_url(config.REDIS_URL), config)
+    app = build_app(supervisor, config)
+
+    async def start_bus(app: web.Application) -> None:
+        await bus.start()
+
+    async def close_bus(app: web.Application) -> None:
+        await bus.close()
+
+    app.on_startup.append(start_bus)
+    app.on_cleanup.append(close_bus)
+    web.run_app(app, host=config.WEB_SERVER_HOST, port=config.WEB_SERVER_PORT)
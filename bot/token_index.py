@@ -0,0 +1,76 @@
+"""Token -> bot id index guarding the support bots' webhook route.
+
+Anything can be posted to ``/{SECRET_URL}/bot/{bot_token}``; before, every
+request reached aiogram's handler (and, with several processes, was read and
+forwarded by the supervisor) whatever the token. :class:`TokenIndex` holds
+the tokens of enabled bots in a dict rebuilt whenever ``BotConfig`` changes,
+and :func:`token_filter` answers 404 for any other token in an aiohttp
+middleware, before the handler runs or the body is read.
+"""
+
+from __future__ import annotations
+
+from collections.abc import Awaitable, Callable
+
+from aiohttp import web
+
+from config.bot_config import BotConfig
+
+
+class TokenIndex:
+    def __init__(self, config: BotConfig):
+        self._config = config
+        self._enabled: dict[str, int] = {}
+        self._disabled: frozenset[str] = frozenset()
+        self.accepted = 0
+        self.rejected_unknown = 0
+        self.rejected_disabled = 0
+        self.rebuilds = 0
+        self.rebuild()
+
+    def rebuild(self, bot_id: int | None = None) -> None:
+        """Settings listener; a few thousand bots take well under a millisecond."""
+        settings = self._config.get_bot_settings()
+        self._enabled = {item.token: item.id for item in settings if item.can_work}
+        self._disabled = frozenset(item.token for item in settings if not item.can_work)
+        self.rebuilds += 1
+
+    def bot_id(self, token: str) -> int | None:
+        """The enabled bot ``token`` belongs to; counts the outcome."""
+        bot_id = self._enabled.get(token)
+        if bot_id is not None:
+            self.accepted += 1
+        elif token in self._disabled:
+            self.rejected_disabled += 1
+        else:
+            self.rejected_unknown += 1
+        return bot_id
+
+    def __contains__(self, token: str) -> bool:
+        return token in self._enabled
+
+    def stats(self) -> dict[str, int]:
+        return {
+            "enabled": len(self._enabled),
+            "disabled": len(self._disabled),
+            "accepted": self.accepted,
+            "rejected_unknown": self.rejected_unknown,
+            "rejected_disabled": self.rejected_disabled,
+            "rebuilds": self.rebuilds,
+        }
+
+
+Handler = Callable[[web.Request], Awaitable[web.StreamResponse]]
+
+
+def token_filter(index: TokenIndex) -> Callable[..., Awaitable[web.StreamResponse]]:
+    """aiohttp middleware: 404 for ``{bot_token}`` routes with unknown tokens."""
+
+    @web.middleware
+    async def middleware(request: web.Request, handler: Handler) -> web.StreamResponse:
+        token = request.match_info.get("bot_token")
+        if token is not None and index.bot_id(token) is None:
+            return web.Response(status=404)
+        return await handler(request)
+
+    return middleware
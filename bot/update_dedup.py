@@ -0,0 +1,109 @@
+"""Drops webhook updates Telegram delivers more than once.
+
+Telegram re-posts an update when the webhook answered late or not with 200,
+and ``cmd_resend`` then forwarded the same user message twice and wrote two
+mapping rows. :class:`UpdateDeduplicator` remembers the last ``WINDOW``
+``(bot_id, update_id)`` pairs accepted by this process, oldest first;
+with :meth:`~UpdateDeduplicator.attach` it also claims each pair in Redis
+(``SET NX`` with ``TTL_SECONDS``) so a redelivery that lands on another
+worker is caught too. A pair is claimed only when the update was queued: an
+update answered 429 is released again, since Telegram will send it back.
+
+Nothing touches the database. If Redis fails the update is let through.
+
+Tunables (env, read once on import): ``UPDATE_DEDUP_WINDOW`` (10000),
+``UPDATE_DEDUP_TTL`` (3600).
+"""
+
+from __future__ import annotations
+
+from collections import OrderedDict
+from typing import Final
+
+from loguru import logger
+from redis.asyncio import Redis
+
+from config.bot_config import env
+
+WINDOW: Final[int] = env.int("UPDATE_DEDUP_WINDOW", 10_000)
+TTL_SECONDS: Final[int] = env.int("UPDATE_DEDUP_TTL", 3600)
+
+UpdateKey = tuple[int, int]
+
+
+class UpdateDeduplicator:
+    def __init__(
+        self,
+        *,
+        window: int = WINDOW,
+        redis: Redis | None = None,
+        ttl: int = TTL_SECONDS,
+        prefix: str = "update",
+    ):
+        self._window = window
+        # Insertion-ordered, so the oldest key is dropped first.
+        self._seen: OrderedDict[UpdateKey, None] = OrderedDict()
+        self._redis = redis
+        self._ttl = ttl
+        self._prefix = prefix
+        self.checked = 0
+        self.duplicates = 0
+        self.duplicates_shared = 0
+        self.redis_errors = 0
+
+    def attach(self, redis: Redis | None) -> None:
+        """Also claim updates in ``redis``, shared by all workers."""
+        self._redis = redis
+
+    def _remember(self, key: UpdateKey) -> None:
+        self._seen[key] = None
+        if len(self._seen) > self._window:
+            self._seen.popitem(last=False)
+
+    async def claim(self, bot_id: int, update_id: int) -> bool:
+        """True the first time an update is seen, False for a redelivery."""
+        key = (bot_id, update_id)
+        self.checked += 1
+        if key in self._seen:
+            self.duplicates += 1
+            return False
+        # Remember before awaiting Redis, so a concurrent redelivery to this
+        # process is caught locally.
+        self._remember(key)
+        if self._redis is None:
+            return True
+        try:
+            claimed = await self._redis.set(
+                f"{self._prefix}:{bot_id}:{update_id}", 1, nx=True, ex=self._ttl
+            )
+        except Exception as ex:
+            self.redis_errors += 1
+            logger.warning(f"update dedup fell back to local — {ex}")
+            return True
+        if not claimed:
+            self.duplicates += 1
+            self.duplicates_shared += 1
+            return False
+        return True
+
+    async def release(self, bot_id: int, update_id: int) -> None:
+        """Forget an update that was not processed, so its redelivery is."""
+        self._seen.pop((bot_id, update_id), None)
+        if self._redis is not None:
+            try:
+                await self._redis.delete(f"{self._prefix}:{bot_id}:{update_id}")
+            except Exception as ex:
+                self.redis_errors += 1
+                logger.warning(f"update dedup release failed — {ex}")
+
+    def stats(self) -> dict[str, int]:
+        return {
+            "window": len(self._seen),
+            "checked": self.checked,
+            "duplicates": self.duplicates,
+            "duplicates_shared": self.duplicates_shared,
+            "redis_errors": self.redis_errors,
+        }
+
+
+update_dedup = UpdateDeduplicator()
@@ -0,0 +1,324 @@
+"""Bounded queue between the webhook handlers and the dispatchers.
+
+aiogram's request handlers answer Telegram at once and feed each update in a
+task of its own (``handle_in_background``). Nothing bounds those tasks: a
+burst, or handlers slowed down by the send scheduler, piles up unlimited
+work in memory while Telegram keeps posting. ``QueuedSimpleRequestHandler``
+and ``QueuedTokenBasedRequestHandler`` still answer at once, but put the
+update on an :class:`UpdateQueue` drained by a fixed number of workers.
+
+When the queue is full the overflow policy decides:
+
+* ``reject`` (default) — answer 429 with ``Retry-After``; Telegram keeps the
+  update and delivers it again later;
+* ``drop`` — answer 200 and discard the update (logged and counted).
+
+Updates of one chat run one at a time, in arrival order: a later update of
+a ``(bot_id, chat_id)`` that is queued or running waits in that chat's line
+and is released to the workers when the previous one finishes, so an edit
+or reaction never overtakes the message it refers to. Different chats run
+in parallel on any free worker. Updates without a chat are not ordered.
+
+One bot gets at most ``BOT_WORKERS`` workers at a time; its further updates
+wait in the bot's own line. A bot whose handlers sit in the send scheduler
+(a busy master chat gets 20 messages a minute) would otherwise take every
+worker and stall all other bots behind it.
+
+With an ``UpdateDeduplicator`` the handlers answer a redelivered update
+200 without queueing it again (``bot/update_dedup.py``).
+
+Tunables (env, read once on import): ``WEBHOOK_QUEUE_SIZE`` (1000),
+``WEBHOOK_WORKERS`` (32), ``WEBHOOK_BOT_WORKERS`` (4), ``WEBHOOK_OVERFLOW``
+(``reject``/``drop``).
+"""
+
+from __future__ import annotations
+
+import asyncio
+import time
+from collections import deque
+from collections.abc import Awaitable, Callable
+from typing import Any, Final
+
+from aiogram import Bot
+from aiogram.webhook.aiohttp_server import (
+    BaseRequestHandler,
+    SimpleRequestHandler,
+    TokenBasedRequestHandler,
+)
+from aiohttp import web
+from loguru import logger
+
+from bot.bot_pool import BotPool
+from bot.update_dedup import UpdateDeduplicator
+from config.bot_config import env
+
+QUEUE_SIZE: Final[int] = env.int("WEBHOOK_QUEUE_SIZE", 1000)
+WORKERS: Final[int] = env.int("WEBHOOK_WORKERS", 32)
+BOT_WORKERS: Final[int] = env.int("WEBHOOK_BOT_WORKERS", 4)
+OVERFLOW: Final[str] = env.str("WEBHOOK_OVERFLOW", "reject")
+RETRY_AFTER_SECONDS: Final[int] = 1
+
+REJECT: Final = "reject"
+DROP: Final = "drop"
+
+Job = Callable[[], Awaitable[None]]
+ChatKey = tuple[int, int]
+_Entry = tuple[float, Job, ChatKey | None, int | None]
+
+
+def update_chat_id(update: dict[str, Any]) -> int | None:
+    """Chat a raw update belongs to, if any."""
+    for name, payload in update.items():
+        if name == "update_id" or not isinstance(payload, dict):
+            continue
+        # callback_query carries the chat in its message; inline_query and
+        # other chat-less updates fall back to the sender.
+        for holder in (payload, payload.get("message")):
+            if isinstance(holder, dict) and isinstance(holder.get("chat"), dict):
+                return holder["chat"].get("id")
+        sender = payload.get("from")
+        if isinstance(sender, dict):
+            return sender.get("id")
+    return None
+
+
+class UpdateQueue:
+    def __init__(
+        self,
+        name: str,
+        *,
+        size: int = QUEUE_SIZE,
+        workers: int = WORKERS,
+        bot_workers: int = BOT_WORKERS,
+        overflow: str = OVERFLOW,
+    ):
+        if overflow not in (REJECT, DROP):
+            raise ValueError(f"unknown overflow policy {overflow!r}")
+        if bot_workers < 1:
+            raise ValueError(f"bot_workers must be at least 1, got {bot_workers}")
+        self.name = name
+        self.size = size
+        self.overflow = overflow
+        self._workers_count = workers
+        self._bot_workers = bot_workers
+        # Jobs a worker may start now; size is enforced on self.pending.
+        self._ready: asyncio.Queue[_Entry] = asyncio.Queue()
+        # Chats with a job queued or running -> their jobs waiting behind it.
+        self._lines: dict[ChatKey, deque[tuple[float, Job]]] = {}
+        # Bot -> its jobs on _ready or running (at most bot_workers).
+        self._admitted: dict[int, int] = {}
+        # Bot -> its jobs waiting for one of those slots.
+        self._held: dict[int, deque[_Entry]] = {}
+        self._workers: list[asyncio.Task[None]] = []
+        self.pending = 0
+        self.peak_chats = 0
+        self.held = 0
+        self.peak_held = 0
+        self.busy = 0
+        self.accepted = 0
+        self.rejected = 0
+        self.dropped = 0
+        self.processed = 0
+        self.failed = 0
+        self.wait_seconds = 0.0
+        self.max_wait_seconds = 0.0
+        self.process_seconds = 0.0
+        self.max_process_seconds = 0.0
+
+    def put(
+        self, job: Job, key: ChatKey | None = None, *, bot_id: int | None = None
+    ) -> bool:
+        """Queue ``job`` behind the jobs of chat ``key``; False when full.
+
+        ``bot_id`` (by default the one in ``key``) is the bot whose worker
+        share the job counts against.
+        """
+        if not self._workers:
+            self._workers = [
+                asyncio.create_task(self._work()) for _ in range(self._workers_count)
+            ]
+        if self.pending >= self.size:
+            if self.overflow == DROP:
+                self.dropped += 1
+            else:
+                self.rejected += 1
+            return False
+        self.pending += 1
+        self.accepted += 1
+        if bot_id is None and key is not None:
+            bot_id = key[0]
+        entry = (time.perf_counter(), job, key, bot_id)
+        if key is None:
+            self._admit(entry)
+        elif key in self._lines:
+            self._lines[key].append(entry[:2])
+        else:
+            self._lines[key] = deque()
+            self.peak_chats = max(self.peak_chats, len(self._lines))
+            self._admit(entry)
+        return True
+
+    def _admit(self, entry: _Entry) -> None:
+        bot_id = entry[3]
+        if bot_id is not None:
+            admitted = self._admitted.get(bot_id, 0)
+            if admitted >= self._bot_workers:
+                self._held.setdefault(bot_id, deque()).append(entry)
+                self.held += 1
+                self.peak_held = max(self.peak_held, self.held)
+                return
+            self._admitted[bot_id] = admitted + 1
+        self._ready.put_nowait(entry)
+
+    def _finished(self, bot_id: int) -> None:
+        held = self._held.get(bot_id)
+        if held:
+            # The slot passes straight to the bot's next job.
+            self.held -= 1
+            self._ready.put_nowait(held.popleft())
+            if not held:
+                del self._held[bot_id]
+        elif self._admitted[bot_id] > 1:
+            self._admitted[bot_id] -= 1
+        else:
+            del self._admitted[bot_id]
+
+    def _release(self, key: ChatKey) -> None:
+        line = self._lines[key]
+        if line:
+            queued_at, job = line.popleft()
+            self._admit((queued_at, job, key, key[0]))
+        else:
+            del self._lines[key]
+
+    async def _work(self) -> None:
+        while True:
+            queued_at, job, key, bot_id = await self._ready.get()
+            self.pending -= 1
+            started = time.perf_counter()
+            waited = started - queued_at
+            self.wait_seconds += waited
+            self.max_wait_seconds = max(self.max_wait_seconds, waited)
+            self.busy += 1
+            try:
+                await job()
+            except Exception as ex:
+                self.failed += 1
+                logger.exception(f"update failed in {self.name} queue: {ex}")
+            finally:
+                took = time.perf_counter() - started
+                self.process_seconds += took
+                self.max_process_seconds = max(self.max_process_seconds, took)
+                self.busy -= 1
+                self.processed += 1
+                if bot_id is not None:
+                    self._finished(bot_id)
+                if key is not None:
+                    self._release(key)
+                self._ready.task_done()
+
+    async def close(self) -> None:
+        """Finish queued updates, then stop the workers."""
+        # A released job is put on _ready before task_done() of the one that
+        # released it, so join() also covers the chats' and bots' lines.
+        if self._workers:
+            await self._ready.join()
+        workers, self._workers = self._workers, []
+        for worker in workers:
+            worker.cancel()
+        await asyncio.gather(*workers, return_exceptions=True)
+
+    def stats(self) -> dict[str, int | float]:
+        done = self.processed or 1
+        return {
+            "depth": self.pending,
+            "size": self.size,
+            "chats": len(self._lines),
+            "peak_chats": self.peak_chats,
+            "held": self.held,
+            "peak_held": self.peak_held,
+            "bots": len(self._admitted),
+            "workers": len(self._workers),
+            "busy": self.busy,
+            "accepted": self.accepted,
+            "rejected": self.rejected,
+            "dropped": self.dropped,
+            "processed": self.processed,
+            "failed": self.failed,
+            "avg_wait_seconds": round(self.wait_seconds / done, 4),
+            "max_wait_seconds": round(self.max_wait_seconds, 4),
+            "avg_process_seconds": round(self.process_seconds / done, 4),
+            "max_process_seconds": round(self.max_process_seconds, 4),
+        }
+
+
+class _QueuedHandlerMixin(BaseRequestHandler):
+    queue: UpdateQueue
+    dedup: UpdateDeduplicator | None = None
+
+    async def _handle_request_background(
+        self, bot: Bot, request: web.Request
+    ) -> web.Response:
+        update = await request.json(loads=bot.session.json_loads)
+        update_id = update.get("update_id")
+        dedup = self.dedup if isinstance(update_id, int) else None
+        if dedup is not None and not await dedup.claim(bot.id, update_id):
+            # A redelivery of an update already queued: acknowledge only.
+            return web.json_response({}, dumps=bot.session.json_dumps)
+        chat_id = update_chat_id(update)
+        key = (bot.id, chat_id) if chat_id is not None else None
+        if not self.queue.put(
+            lambda: self._background_feed_update(bot, update), key, bot_id=bot.id
+        ):
+            logger.warning(
+                f"{self.queue.name} queue full, {self.queue.overflow} "
+                f"update_id={update_id} bot_id={bot.id}"
+            )
+            if self.queue.overflow == REJECT:
+                if dedup is not None:
+                    await dedup.release(bot.id, update_id)
+                return web.Response(
+                    status=429, headers={"Retry-After": str(RETRY_AFTER_SECONDS)}
+                )
+        return web.json_response({}, dumps=bot.session.json_dumps)
+
+    async def close(self) -> None:
+        await self.queue.close()
+        await super().close()
+
+
+class QueuedSimpleRequestHandler(_QueuedHandlerMixin, SimpleRequestHandler):
+    def __init__(
+        self,
+        *args: Any,
+        queue: UpdateQueue,
+        dedup: UpdateDeduplicator | None = None,
+        **kwargs: Any,
+    ) -> None:
+        super().__init__(*args, **kwargs)
+        self.queue = queue
+        self.dedup = dedup
+
+
+class QueuedTokenBasedRequestHandler(_QueuedHandlerMixin, TokenBasedRequestHandler):
+    """Support bots' handler; bots come from a :class:`~bot.bot_pool.BotPool`."""
+
+    def __init__(
+        self,
+        *args: Any,
+        queue: UpdateQueue,
+        pool: BotPool,
+        dedup: UpdateDeduplicator | None = None,
+        **kwargs: Any,
+    ) -> None:
+        super().__init__(*args, **kwargs)
+        self.queue = queue
+        self.pool = pool
+        self.dedup = dedup
+
+    async def resolve_bot(self, request: web.Request) -> Bot:
+        bot = self.pool.get(request.match_info["bot_token"])
+        if bot is None:
+            raise web.HTTPNotFound()
+        return bot
@@ -1,7 +1,8 @@
+import asyncio
 import json
 import os
 from dataclasses import dataclass, field
-from typing import Dict, Optional, List
+from typing import Callable, Dict, Optional, List
 
 
 from aiogram import Bot
@@ -10,7 +11,7 @@ from aiogram.client.session.aiohttp import AiohttpSession
 from aiogram.client.telegram import TelegramAPIServer
 from aiogram.types import BotCommand, BotCommandScopeAllPrivateChats
 from environs import Env
-from pydantic import BaseModel
+from pydantic import BaseModel, ConfigDict
 from loguru import logger
 
 env = Env()
@@ -21,7 +22,14 @@ except Exception as e:
 
 
 class SupportBotSettings(BaseModel):
-    """Model for support bot settings."""
+    """Model for support bot settings.
+
+    Instances are shared snapshots handed out by ``BotConfig``: never mutate
+    them, build a changed copy with ``model_copy(update=...)`` and pass it to
+    ``BotConfig.update_bot_setting``.
+    """
+
+    model_config = ConfigDict(frozen=True)
 
     id: int
     username: str
@@ -52,7 +60,6 @@ class BotConfig:
     """Singleton class for bot configuration and database operations."""
 
     bot_setting: Dict[str, Dict] = field(default_factory=dict)
-    media_groups: Dict[str, List] = field(default_factory=dict)
     main_bot_token: str = field(default_factory=lambda: env.str("BOT_TOKEN"))
 
     single_bot_token: Optional[str] = field(
@@ -101,10 +108,17 @@ class BotConfig:
     )
 
     json_config: dict = field(default_factory=dict)
+    # Validated snapshots of json_config, replaced as a whole on save/delete.
+    _settings: Dict[int, SupportBotSettings] = field(default_factory=dict)
+    _settings_list: List[SupportBotSettings] = field(default_factory=list)
+    # Called with the bot id after save/delete, or None after a full reload.
+    _listeners: List[Callable[[Optional[int]], None]] = field(default_factory=list)
 
     def __post_init__(self):
         # Initial empty config; will be populated via load_from_db()
         self.json_config = {}
+        self._settings = {}
+        self._settings_list = []
 
     @property
     def other_bots_url(self) -> str:
@@ -119,15 +133,38 @@ class BotConfig:
 
     def load_from_db(self) -> None:
         """Load bot settings from the database into memory synchronously (for startup)."""
+        self.json_config = {}
+        json_config = self._read_settings()
+        if json_config is None:
+            return
+        self.json_config = json_config
+        self.reload_settings()
+        logger.info(f"Loaded {len(self.json_config)} bot settings from DB")
+
+    async def reload_from_db(self) -> None:
+        """``load_from_db`` for a running loop: sqlite is read in a thread.
+
+        Listeners are still notified on the loop. If the read fails the
+        current settings are kept.
+        """
+        json_config = await asyncio.to_thread(self._read_settings)
+        if json_config is None:
+            return
+        self.json_config = json_config
+        self.reload_settings()
+        logger.info(f"Reloaded {len(self.json_config)} bot settings from DB")
+
+    def _read_settings(self) -> Optional[Dict[str, dict]]:
+        """Raw settings rows by bot id; None if they could not be read."""
         import sqlite3
 
+        json_config: Dict[str, dict] = {}
         try:
-            self.json_config = {}
             if not os.path.exists(self.SQLITE_FILE_NAME):
                 logger.warning(
                     f"Database file not found: {self.SQLITE_FILE_NAME}. Skipping load."
                 )
-                return
+                return None
 
             conn = sqlite3.connect(self.SQLITE_FILE_NAME)
             # Use dictionary cursor
@@ -187,36 +224,60 @@ class BotConfig:
                     if bot_dict["spam_block_words"] is None:
                         bot_dict["spam_block_words"] = []
 
-                    self.json_config[str(bot_id)] = bot_dict
+                    json_config[str(bot_id)] = bot_dict
 
-                logger.info(f"Loaded {len(self.json_config)} bot settings from DB")
+                return json_config
             except Exception as e:
                 # Table might not exist yet if migration hasn't run
                 logger.warning(
                     f"Could not load settings from DB (table might be missing): {e}"
                 )
+                return None
             finally:
                 conn.close()
 
         except Exception as e:
             logger.error(f"Error loading settings from DB: {e}")
+            return None
+
+    def reload_settings(self) -> None:
+        """Validate json_config into settings snapshots; call after replacing it."""
+        settings = {}
+        for bot in self.json_config.values():
+            try:
+                item = SupportBotSettings(**bot)
+            except Exception as e:
+                logger.error(f"Error validating bot settings {bot.get('id')}: {e}")
+                continue
+            settings[item.id] = item
+        self._settings = settings
+        self._settings_list = list(settings.values())
+        self._notify(None)
+
+    def add_listener(self, listener: Callable[[Optional[int]], None]) -> None:
+        """Call ``listener`` whenever the settings change."""
+        self._listeners.append(listener)
+
+    def _notify(self, bot_id: Optional[int]) -> None:
+        for listener in self._listeners:
+            try:
+                listener(bot_id)
+            except Exception as e:
+                logger.error(f"Settings listener failed for bot {bot_id}: {e}")
+
+    def _replace_setting(self, settings: SupportBotSettings) -> None:
+        updated = dict(self._settings)
+        updated[settings.id] = settings
+        self._settings = updated
+        self._settings_list = list(updated.values())
 
     def get_bot_settings(self) -> List[SupportBotSettings]:
         """Retrieve all bot settings."""
-        try:
-            return [SupportBotSettings(**bot) for bot in self.json_config.values()]
-        except Exception as e:
-            logger.error(f"Error retrieving bot settings: {e}")
-            return []
+        return self._settings_list
 
     def get_bot_setting(self, bot_id: int) -> Optional[SupportBotSettings]:
         """Retrieve bot settings by ID."""
-        try:
-            result = self.json_config.get(str(bot_id))
-            return SupportBotSettings(**result) if result else None
-        except Exception as e:
-            logger.error(f"Error retrieving bot settings: {e}")
-            return None
+        return self._settings.get(bot_id)
 
     async def save_settings_to_db(self, settings: SupportBotSettings) -> None:
         """Save a single bot setting to DB and update cache."""
@@ -281,6 +342,8 @@ class BotConfig:
 
             # Update cache
             self.json_config[str(settings.id)] = settings.model_dump()
+            self._replace_setting(settings)
+            self._notify(settings.id)
 
         except Exception as e:
             logger.error(f"Error saving setting to DB: {e}")
@@ -309,6 +372,11 @@ class BotConfig:
             # Delete from internal cache
             if bot_id_str in self.json_config:
                 del self.json_config[bot_id_str]
+                self._settings = {
+                    key: item for key, item in self._settings.items() if key != bot_id
+                }
+                self._settings_list = list(self._settings.values())
+                self._notify(bot_id)
             else:
                 logger.warning(
                     f"Attempt to delete non-existent bot in cache with ID: {bot_id}"
@@ -322,15 +390,17 @@ class BotConfig:
         await self.save_settings_to_db(settings)
 
 
+PRIVATE_COMMANDS = [
+    BotCommand(
+        command="start",
+        description="Start or ReStart bot",
+    ),
+]
+
+
 async def set_commands(bot):
-    commands_private = [
-        BotCommand(
-            command="start",
-            description="Start or ReStart bot",
-        ),
-    ]
     await bot.set_my_commands(
-        commands=commands_private, scope=BotCommandScopeAllPrivateChats()
+        commands=PRIVATE_COMMANDS, scope=BotCommandScopeAllPrivateChats()
     )
 
 
@@ -338,12 +408,26 @@ def make_session() -> AiohttpSession:
     """Создаёт aiohttp-сессию, уважающую env TELEGRAM_API_URL.
 
     Without env: default cloud api.telegram.org. With env: local Bot API server
-    via TelegramAPIServer.from_base(url, is_local=True).
+    via TelegramAPIServer.from_base(url, is_local=True). Requests share one
+    connection pool (bot/http_pool.py) and sends go through the process-wide
+    rate scheduler (bot/send_scheduler.py), behind the per-bot circuit breaker
+    (bot/bot_health.py).
     """
+    from bot.bot_health import bot_health
+    from bot.http_pool import PooledAiohttpSession
+    from bot.send_scheduler import send_scheduler
+
     local_url = env.str("TELEGRAM_API_URL", None)
     if local_url:
-        return AiohttpSession(api=TelegramAPIServer.from_base(local_url, is_local=True))
-    return AiohttpSession()
+        session = PooledAiohttpSession(
+            api=TelegramAPIServer.from_base(local_url, is_local=True)
+        )
+    else:
+        session = PooledAiohttpSession()
+    # The first middleware is the outermost: an open breaker never waits.
+    session.middleware(bot_health)
+    session.middleware(send_scheduler)
+    return session
 
 
 def make_bot(token: str, default: Optional[DefaultBotProperties] = None) -> Bot:
@@ -355,9 +439,9 @@ def make_bot(token: str, default: Optional[DefaultBotProperties] = None) -> Bot:
     )
 
 
-async def set_webhook(bot: Bot, url: str):
+async def set_webhook(bot: Bot, url: str, allowed_updates: Optional[List[str]] = None):
     await set_commands(bot)
-    await bot.set_webhook(url=url)
+    await bot.set_webhook(url=url, allowed_updates=allowed_updates)
 
 
 async def delete_webhook(bot: Bot):
@@ -0,0 +1,152 @@
+"""In-process cache of recent ``t_messages`` mappings.
+
+Reactions, edits and replies almost always touch messages from the last few
+hours, so the mappings written by ``Repo.save_message_ids`` are kept here,
+keyed both ways:
+
+* copy key ``(bot_id, chat_for_id, resend_id)`` — "what was this copy made
+  from";
+* original key ``(bot_id, chat_from_id, message_id)`` — "where was this
+  message copied to".
+
+Entries are evicted least-recently-used first once ``MAX_MAPPINGS`` is
+reached and expire ``TTL_SECONDS`` after they were stored.
+
+Only the mapping columns are kept; ``user_id`` of DB-filled entries is
+``None``. A mapping costs about 0.5 KB, so the default cap keeps the cache
+near 25 MB.
+"""
+
+from __future__ import annotations
+
+import time
+from collections import OrderedDict
+from collections.abc import Callable
+from dataclasses import dataclass
+from typing import Final
+
+from database.write_behind import MessageMapping
+
+TTL_SECONDS: Final[float] = 6 * 60 * 60
+MAX_MAPPINGS: Final[int] = 50_000
+
+_Key = tuple[int, int, int]
+
+
+@dataclass(slots=True)
+class _Entry:
+    row: MessageMapping
+    expires_at: float
+
+
+class MessageMappingCache:
+    def __init__(
+        self,
+        *,
+        max_mappings: int = MAX_MAPPINGS,
+        ttl: float = TTL_SECONDS,
+        clock: Callable[[], float] = time.monotonic,
+    ):
+        self._max_mappings = max_mappings
+        self._ttl = ttl
+        self._clock = clock
+        self._by_copy: OrderedDict[_Key, _Entry] = OrderedDict()
+        self._by_original: OrderedDict[_Key, _Entry] = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.expirations = 0
+
+    def put(self, row: MessageMapping) -> None:
+        """Remember a mapping under both of its keys."""
+        entry = _Entry(row, self._clock() + self._ttl)
+        self._store(self._by_copy, (row.bot_id, row.chat_for_id, row.resend_id), entry)
+        # One original can be copied to many chats (/send broadcasts); like the
+        # DB lookup, the oldest mapping wins.
+        original = (row.bot_id, row.chat_from_id, row.message_id)
+        if self._get(self._by_original, original) is None:
+            self._store(self._by_original, original, entry)
+
+    def get_by_copy(
+        self, bot_id: int, chat_id: int, message_id: int
+    ) -> MessageMapping | None:
+        return self._count(self._get(self._by_copy, (bot_id, chat_id, message_id)))
+
+    def get_by_original(
+        self, bot_id: int, chat_id: int, message_id: int
+    ) -> MessageMapping | None:
+        return self._count(self._get(self._by_original, (bot_id, chat_id, message_id)))
+
+    def find_either_side(
+        self, bot_id: int, chat_id: int, message_id: int
+    ) -> MessageMapping | None:
+        """Return the mapping where the message is the copy or the original."""
+        key = (bot_id, chat_id, message_id)
+        return self._count(
+            self._get(self._by_copy, key) or self._get(self._by_original, key)
+        )
+
+    def find(
+        self,
+        bot_id: int,
+        message_id: int | None = None,
+        resend_id: int | None = None,
+        chat_from_id: int | None = None,
+        chat_for_id: int | None = None,
+    ) -> MessageMapping | None:
+        """Answer ``Repo.get_message_resend_info`` filters that match a key.
+
+        Other filter combinations are not cached and return ``None`` without
+        touching the counters.
+        """
+        if resend_id and chat_for_id and not message_id and not chat_from_id:
+            return self.get_by_copy(bot_id, chat_for_id, resend_id)
+        if message_id and chat_from_id and not resend_id and not chat_for_id:
+            return self.get_by_original(bot_id, chat_from_id, message_id)
+        return None
+
+    def clear(self) -> None:
+        self._by_copy.clear()
+        self._by_original.clear()
+        self.hits = self.misses = self.evictions = self.expirations = 0
+
+    def stats(self) -> dict[str, int]:
+        return {
+            "mappings": len(self._by_copy),
+            "hits": self.hits,
+            "misses": self.misses,
+            "evictions": self.evictions,
+            "expirations": self.expirations,
+        }
+
+    def _count(self, row: MessageMapping | None) -> MessageMapping | None:
+        if row is None:
+            self.misses += 1
+        else:
+            self.hits += 1
+        return row
+
+    def _get(
+        self, entries: OrderedDict[_Key, _Entry], key: _Key
+    ) -> MessageMapping | None:
+        entry = entries.get(key)
+        if entry is None:
+            return None
+        if entry.expires_at <= self._clock():
+            del entries[key]
+            self.expirations += 1
+            return None
+        entries.move_to_end(key)
+        return entry.row
+
+    def _store(
+        self, entries: OrderedDict[_Key, _Entry], key: _Key, entry: _Entry
+    ) -> None:
+        entries[key] = entry
+        entries.move_to_end(key)
+        while len(entries) > self._max_mappings:
+            entries.popitem(last=False)
+            self.evictions += 1
+
+
+message_cache = MessageMappingCache()
@@ -0,0 +1,81 @@
+"""Versioned schema migrations for the SQLite database.
+
+``Base.metadata.create_all`` only creates missing tables, it never touches
+existing ones. Changes to existing tables live here as numbered steps; the
+number of the last applied step is kept in ``PRAGMA user_version``, so every
+step runs exactly once per database file.
+
+Steps must stay idempotent: a fresh database already gets the current schema
+from ``create_all`` and then walks through all steps from version 0.
+"""
+
+from __future__ import annotations
+
+from dataclasses import dataclass
+from collections.abc import Awaitable, Callable
+from typing import Final
+
+from loguru import logger
+from sqlalchemy.ext.asyncio import AsyncConnection
+
+from database.models import Base, Messages
+
+
+@dataclass(frozen=True, slots=True)
+class Migration:
+    version: int
+    name: str
+    apply: Callable[[AsyncConnection], Awaitable[None]]
+
+
+async def _table_columns(conn: AsyncConnection, table: str) -> set[str]:
+    result = await conn.exec_driver_sql(f"PRAGMA table_info({table})")
+    return {row[1] for row in result}
+
+
+async def _add_spam_block_words(conn: AsyncConnection) -> None:
+    if "spam_block_words" in await _table_columns(conn, "bot_settings"):
+        return
+    await conn.exec_driver_sql(
+        "ALTER TABLE bot_settings ADD COLUMN spam_block_words JSON DEFAULT '[]'"
+    )
+
+
+async def _add_message_lookup_indexes(conn: AsyncConnection) -> None:
+    def create_indexes(sync_conn) -> None:
+        for index in Base.metadata.tables[Messages.__tablename__].indexes:
+            index.create(sync_conn, checkfirst=True)
+
+    await conn.run_sync(create_indexes)
+
+
+MIGRATIONS: Final[tuple[Migration, ...]] = (
+    Migration(1, "bot_settings.spam_block_words column", _add_spam_block_words),
+    Migration(2, "t_messages lookup indexes", _add_message_lookup_indexes),
+)
+
+
+async def get_schema_version(conn: AsyncConnection) -> int:
+    result = await conn.exec_driver_sql("PRAGMA user_version")
+    return int(result.scalar() or 0)
+
+
+async def apply_migrations(
+    conn: AsyncConnection, migrations: tuple[Migration, ...] = MIGRATIONS
+) -> int:
+    """Apply pending migrations inside the caller's transaction.
+
+    Returns the schema version after the run.
+    """
+    version = await get_schema_version(conn)
+    for migration in migrations:
+        if migration.version <= version:
+            continue
+        logger.info(
+            f"Applying DB migration {migration.version}: {migration.name} "
+            f"(from version {version})"
+        )
+        await migration.apply(conn)
+        await conn.exec_driver_sql(f"PRAGMA user_version = {migration.version}")
+        version = migration.version
+    return version
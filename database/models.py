@@ -11,6 +11,7 @@ from sqlalchemy import (
     Boolean,
     Integer,
     JSON,
+    Index,
 )
 from sqlalchemy.ext.asyncio import create_async_engine, async_sessionmaker
 from sqlalchemy.orm import DeclarativeBase, Mapped, mapped_column
@@ -51,6 +52,27 @@ class Users(Base):
 
 class Messages(Base):
     __tablename__ = "t_messages"
+    # Covering indexes for the hot lookups in Repo: reply/reaction by the copy
+    # side, edit/reaction by the original side, and "has user got a reply".
+    __table_args__ = (
+        Index(
+            "ix_t_messages_bot_resend_for",
+            "bot_id",
+            "resend_id",
+            "chat_for_id",
+            "message_id",
+            "chat_from_id",
+        ),
+        Index(
+            "ix_t_messages_bot_message_from",
+            "bot_id",
+            "message_id",
+            "chat_from_id",
+            "resend_id",
+            "chat_for_id",
+        ),
+        Index("ix_t_messages_bot_for", "bot_id", "chat_for_id"),
+    )
     record_id: Mapped[int] = mapped_column(primary_key=True)
     record_add_date: Mapped[datetime.datetime] = mapped_column(
         DateTime(), default=datetime.datetime.now
@@ -87,15 +109,45 @@ class BotSettings(Base):
     ignore_users: Mapped[list] = mapped_column(JSON, default=list)
 
 
+class Broadcasts(Base):
+    """A /send job; recipients and their delivery state are in t_broadcast_recipients."""
+
+    __tablename__ = "t_broadcasts"
+    broadcast_id: Mapped[int] = mapped_column(primary_key=True)
+    bot_id: Mapped[int] = mapped_column(BigInteger)
+    chat_id: Mapped[int] = mapped_column(BigInteger)
+    thread_id: Mapped[int | None] = mapped_column(BigInteger, nullable=True)
+    command_message_id: Mapped[int] = mapped_column(BigInteger)
+    progress_message_id: Mapped[int | None] = mapped_column(BigInteger, nullable=True)
+    support_user_id: Mapped[int | None] = mapped_column(BigInteger, nullable=True)
+    text: Mapped[str] = mapped_column(String)
+    status: Mapped[str] = mapped_column(String(16), default="running")
+    created_at: Mapped[datetime.datetime] = mapped_column(
+        DateTime(), default=datetime.datetime.now
+    )
+    finished_at: Mapped[datetime.datetime | None] = mapped_column(
+        DateTime(), nullable=True
+    )
+
+
+class BroadcastRecipients(Base):
+    __tablename__ = "t_broadcast_recipients"
+    __table_args__ = (
+        Index("ix_t_broadcast_recipients_status", "broadcast_id", "status"),
+    )
+    broadcast_id: Mapped[int] = mapped_column(BigInteger, primary_key=True)
+    chat_id: Mapped[int] = mapped_column(BigInteger, primary_key=True)
+    status: Mapped[str] = mapped_column(String(16), default="pending")
+    attempts: Mapped[int] = mapped_column(Integer, default=0)
+    error: Mapped[str | None] = mapped_column(String, nullable=True)
+
+
 async def update_db():
+    from database.migrations import apply_migrations
+
     async with engine.begin() as conn:
         await conn.run_sync(Base.metadata.create_all)
-        result = await conn.exec_driver_sql("PRAGMA table_info(bot_settings)")
-        columns = {row[1] for row in result}
-        if "spam_block_words" not in columns:
-            await conn.exec_driver_sql(
-                "ALTER TABLE bot_settings ADD COLUMN spam_block_words JSON DEFAULT '[]'"
-            )
+        await apply_migrations(conn)
 
 
 async def save_message_ids(
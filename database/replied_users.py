@@ -0,0 +1,105 @@
+"""Per-bot set of users who have ever got a reply from support.
+
+``cmd_resend`` asks ``Repo.has_user_received_reply`` for every private
+message to decide whether the pre-reply spam filter applies. The answer only
+ever flips from "no" to "yes", when a mapping with ``chat_for_id == user_id``
+is saved, so it is kept in memory: :meth:`RepliedUsers.load` reads every
+``(bot_id, chat_for_id)`` pair once at startup (an index-only scan of
+``ix_t_messages_bot_for``) and ``Repo.save_message_ids`` adds new ones.
+
+With several worker processes each one loads only the bots it owns
+(``bot_ids``). A miss is a firm "no" only for a loaded bot. For any other
+bot, and until the index is loaded (or if loading failed), only positives
+are known and a miss falls back to the DB. So a bot that the ring moved here
+from a dead worker is never answered from a stale set. Group chats (negative
+ids) are skipped: the check is only made for private chats.
+"""
+
+from __future__ import annotations
+
+import time
+from collections.abc import Collection
+
+from loguru import logger
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession, async_sessionmaker
+
+from database.models import Messages, session_maker
+
+
+class RepliedUsers:
+    def __init__(self):
+        self._by_bot: dict[int, set[int]] = {}
+        self.loaded = False
+        # Bots whose sets are complete; None means every bot.
+        self._bot_ids: frozenset[int] | None = None
+
+    def add(self, bot_id: int, user_id: int) -> None:
+        users = self._by_bot.get(bot_id)
+        if users is None:
+            users = self._by_bot[bot_id] = set()
+        users.add(user_id)
+
+    def contains(self, bot_id: int, user_id: int) -> bool:
+        users = self._by_bot.get(bot_id)
+        return users is not None and user_id in users
+
+    def covers(self, bot_id: int) -> bool:
+        """True when a miss for ``bot_id`` means "never replied"."""
+        return self.loaded and (self._bot_ids is None or bot_id in self._bot_ids)
+
+    async def load(
+        self,
+        session_factory: async_sessionmaker[AsyncSession] = session_maker,
+        bot_ids: Collection[int] | None = None,
+    ) -> None:
+        """Build the sets from ``t_messages``; registered as a startup hook.
+
+        ``bot_ids`` limits the load to those bots; None loads every bot.
+        """
+        started = time.perf_counter()
+        loaded: dict[int, set[int]] = {}
+        query = (
+            select(Messages.bot_id, Messages.chat_for_id)
+            .filter(Messages.chat_for_id > 0)
+            .distinct()
+        )
+        if bot_ids is not None:
+            query = query.filter(Messages.bot_id.in_(bot_ids))
+        try:
+            async with session_factory() as session:
+                result = await session.stream(query)
+                async for bot_id, user_id in result:
+                    users = loaded.get(bot_id)
+                    if users is None:
+                        users = loaded[bot_id] = set()
+                    users.add(user_id)
+        except Exception as ex:
+            logger.error(f"replied users index not loaded, using DB fallback: {ex}")
+            return
+        # Keep users added by saves that ran while the query was streaming.
+        for bot_id, users in self._by_bot.items():
+            loaded.setdefault(bot_id, set()).update(users)
+        self._by_bot = loaded
+        self._bot_ids = frozenset(bot_ids) if bot_ids is not None else None
+        self.loaded = True
+        logger.info(
+            f"replied users index loaded — bots={len(loaded)}, "
+            f"users={sum(len(users) for users in loaded.values())}, "
+            f"took={time.perf_counter() - started:.2f}s"
+        )
+
+    def clear(self) -> None:
+        self._by_bot = {}
+        self._bot_ids = None
+        self.loaded = False
+
+    def stats(self) -> dict[str, int]:
+        return {
+            "loaded": int(self.loaded),
+            "bots": len(self._by_bot),
+            "users": sum(len(users) for users in self._by_bot.values()),
+        }
+
+
+replied_users = RepliedUsers()
@@ -1,26 +1,106 @@
-from sqlalchemy import select, func
-from sqlalchemy.ext.asyncio import AsyncSession
-from database.models import Messages, Users
+from dataclasses import asdict, dataclass
+
+from sqlalchemy import Row, select, func, union_all
+from sqlalchemy.ext.asyncio import AsyncSession, async_sessionmaker
+from sqlalchemy.orm import load_only
+from database.mapping_cache import MessageMappingCache, message_cache
+from database.models import Messages, Users, session_maker
+from database.replied_users import RepliedUsers, replied_users
+from database.write_behind import MessageMapping, MessageWriteBehind, message_writer
+
+# Columns served straight from the t_messages covering indexes.
+_MAPPING_COLUMNS = (
+    Messages.message_id,
+    Messages.resend_id,
+    Messages.chat_from_id,
+    Messages.chat_for_id,
+)
+
+
+@dataclass(frozen=True, slots=True)
+class MessageCounterpart:
+    """The other side of a message mapping.
+
+    ``is_copy`` tells which side the looked-up message is on: ``True`` when it
+    is the bot-made copy (``resend_id``), ``False`` when it is the original
+    (``message_id``).
+    """
+
+    chat_id: int
+    message_id: int
+    is_copy: bool
+
+
+def _counterpart_of(
+    row: Row | MessageMapping, chat_id: int, message_id: int
+) -> MessageCounterpart:
+    if row.resend_id == message_id and row.chat_for_id == chat_id:
+        return MessageCounterpart(row.chat_from_id, row.message_id, is_copy=True)
+    return MessageCounterpart(row.chat_for_id, row.resend_id, is_copy=False)
+
+
+def _mapping_of(bot_id: int, row: Messages | Row) -> MessageMapping:
+    # Lookups load only the mapping columns; user_id is not needed by callers.
+    return MessageMapping(
+        bot_id=bot_id,
+        user_id=None,
+        message_id=row.message_id,
+        resend_id=row.resend_id,
+        chat_from_id=row.chat_from_id,
+        chat_for_id=row.chat_for_id,
+    )
 
 
 class Repo:
-    def __init__(self, session: AsyncSession):
-        self.session = session
+    """Data access for one update.
+
+    Without an explicit ``session`` the session is opened from
+    ``session_factory`` on first use, so updates answered from memory never
+    open one; :meth:`close` releases it.
+    """
+
+    def __init__(
+        self,
+        session: AsyncSession | None = None,
+        writer: MessageWriteBehind = message_writer,
+        cache: MessageMappingCache = message_cache,
+        replied: RepliedUsers = replied_users,
+        session_factory: async_sessionmaker[AsyncSession] = session_maker,
+    ):
+        self._session = session
+        self._owns_session = session is None
+        self._session_factory = session_factory
+        self.writer = writer
+        self.cache = cache
+        self.replied = replied
+
+    @property
+    def session(self) -> AsyncSession:
+        if self._session is None:
+            self._session = self._session_factory()
+        return self._session
+
+    async def close(self) -> None:
+        """Close the lazily opened session, if any; a passed-in one is kept."""
+        if self._owns_session and self._session is not None:
+            session, self._session = self._session, None
+            await session.close()
 
     async def save_message_ids(
         self, bot_id, user_id, message_id, resend_id, chat_from_id, chat_for_id
     ):
-        self.session.add(
-            Messages(
-                bot_id=bot_id,
-                user_id=user_id,
-                message_id=message_id,
-                resend_id=resend_id,
-                chat_from_id=chat_from_id,
-                chat_for_id=chat_for_id,
-            )
+        """Queue a mapping row; it is committed by the write-behind flusher."""
+        row = MessageMapping(
+            bot_id=bot_id,
+            user_id=user_id,
+            message_id=message_id,
+            resend_id=resend_id,
+            chat_from_id=chat_from_id,
+            chat_for_id=chat_for_id,
         )
-        await self.session.commit()
+        self.writer.add(row)
+        self.cache.put(row)
+        self.replied.add(bot_id, chat_for_id)
 
     async def get_message_resend_info(
         self,
@@ -30,7 +110,20 @@ class Repo:
         chat_from_id=None,
         chat_for_id=None,
     ) -> Messages | None:
-        sl = select(Messages).filter(Messages.bot_id == bot_id)
+        cached = self.cache.find(
+            bot_id, message_id, resend_id, chat_from_id, chat_for_id
+        )
+        if cached is not None:
+            return Messages(**asdict(cached))
+        # Taken before the query: a flush may commit the row while we wait.
+        queued = self.writer.find(
+            bot_id, message_id, resend_id, chat_from_id, chat_for_id
+        )
+        sl = (
+            select(Messages)
+            .options(load_only(*_MAPPING_COLUMNS))
+            .filter(Messages.bot_id == bot_id)
+        )
         if message_id:
             sl = sl.filter(Messages.message_id == message_id)
         if resend_id:
@@ -39,16 +132,73 @@ class Repo:
             sl = sl.filter(Messages.chat_from_id == chat_from_id)
         if chat_for_id:
             sl = sl.filter(Messages.chat_for_id == chat_for_id)
-        result = await self.session.execute(sl)
-        return result.scalars().first()
+        result = await self.session.execute(sl.limit(1))
+        stored = result.scalars().first()
+        if stored is None and queued is not None:
+            return Messages(**asdict(queued))
+        if stored is not None:
+            self.cache.put(_mapping_of(bot_id, stored))
+        return stored
+
+    async def get_message_counterpart(
+        self, bot_id: int, chat_id: int, message_id: int
+    ) -> MessageCounterpart | None:
+        """Resolve a message on either side of a mapping in one query.
+
+        Both sides are probed in a single ``UNION ALL`` statement, one branch
+        per covering index; a plain ``OR`` makes SQLite fall back to scanning
+        every row of the bot.
+        """
+        cached = self.cache.find_either_side(bot_id, chat_id, message_id)
+        if cached is not None:
+            return _counterpart_of(cached, chat_id, message_id)
+        queued = self.writer.find_either_side(bot_id, chat_id, message_id)
+        as_copy = (
+            select(*_MAPPING_COLUMNS)
+            .filter(
+                Messages.bot_id == bot_id,
+                Messages.resend_id == message_id,
+                Messages.chat_for_id == chat_id,
+            )
+            .limit(1)
+        )
+        as_original = (
+            select(*_MAPPING_COLUMNS)
+            .filter(
+                Messages.bot_id == bot_id,
+                Messages.message_id == message_id,
+                Messages.chat_from_id == chat_id,
+            )
+            .limit(1)
+        )
+        sl = union_all(as_copy.subquery().select(), as_original.subquery().select())
+        result = await self.session.execute(sl.limit(1))
+        stored = result.first()
+        if stored is not None:
+            self.cache.put(_mapping_of(bot_id, stored))
+            return _counterpart_of(stored, chat_id, message_id)
+        if queued is not None:
+            return _counterpart_of(queued, chat_id, message_id)
+        return None
 
     async def has_user_received_reply(self, bot_id: int, user_id: int) -> bool:
         """Check if a user has received a reply from support."""
-        sl = select(Messages).filter(
-            Messages.bot_id == bot_id, Messages.chat_for_id == user_id
+        if self.replied.contains(bot_id, user_id):
+            return True
+        if self.replied.covers(bot_id):
+            return False
+        if self.writer.has_reply_for(bot_id, user_id):
+            return True
+        sl = (
+            select(Messages.record_id)
+            .filter(Messages.bot_id == bot_id, Messages.chat_for_id == user_id)
+            .limit(1)
         )
         result = await self.session.execute(sl)
-        return result.scalars().first() is not None
+        if result.scalar() is None:
+            return False
+        self.replied.add(bot_id, user_id)
+        return True
 
     async def save_user_name(self, user_id, user_name, bot_id):
         result = await self.session.execute(
@@ -81,6 +231,7 @@ class Repo:
         self, bot_id: int, master_chat_id: int
     ) -> list[tuple[int, int]]:
         """Return [(user_id, message_count)] for agent replies from master chat."""
+        await self.writer.flush()
         stmt = (
             select(
                 Messages.user_id,
@@ -98,6 +249,7 @@ class Repo:
 
     async def get_total_user_messages(self, bot_id: int, master_chat_id: int) -> int:
         """Return total messages sent TO master chat (from users)."""
+        await self.writer.flush()
         stmt = select(func.count(Messages.record_id)).filter(
             Messages.bot_id == bot_id,
             Messages.chat_for_id == master_chat_id,
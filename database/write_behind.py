@@ -0,0 +1,210 @@
+"""Group-commit write-behind queue for ``t_messages`` mapping rows.
+
+Every forwarded message, album item and operator reply produces one mapping
+row. Committing each of them separately costs one fsync per row, so rows are
+buffered here and written in a single transaction either after
+``FLUSH_INTERVAL_SECONDS`` or as soon as ``MAX_BATCH_ROWS`` rows are queued,
+whichever comes first. Rows from all bots share one queue.
+
+Rows that are queued or being written stay visible through :meth:`find` and
+:meth:`has_reply_for`, so a lookup right after a save never misses.
+:meth:`close` drains the queue on shutdown.
+"""
+
+from __future__ import annotations
+
+import asyncio
+import datetime
+from contextlib import suppress
+from dataclasses import asdict, dataclass, field
+from typing import Final
+
+from loguru import logger
+from sqlalchemy import insert
+from sqlalchemy.ext.asyncio import AsyncSession, async_sessionmaker
+
+from database.models import Messages, session_maker
+
+FLUSH_INTERVAL_SECONDS: Final[float] = 0.01
+MAX_BATCH_ROWS: Final[int] = 500
+RETRY_DELAY_SECONDS: Final[float] = 1.0
+# Upper bound for rows kept in memory while the DB keeps failing.
+MAX_PENDING_ROWS: Final[int] = 50_000
+
+
+@dataclass(frozen=True, slots=True)
+class MessageMapping:
+    bot_id: int
+    user_id: int | None
+    message_id: int
+    resend_id: int
+    chat_from_id: int
+    chat_for_id: int
+    record_add_date: datetime.datetime = field(default_factory=datetime.datetime.now)
+
+    def matches(
+        self,
+        bot_id: int,
+        message_id: int | None = None,
+        resend_id: int | None = None,
+        chat_from_id: int | None = None,
+        chat_for_id: int | None = None,
+    ) -> bool:
+        # Same "falsy filter is skipped" semantics as Repo.get_message_resend_info.
+        return (
+            self.bot_id == bot_id
+            and (not message_id or self.message_id == message_id)
+            and (not resend_id or self.resend_id == resend_id)
+            and (not chat_from_id or self.chat_from_id == chat_from_id)
+            and (not chat_for_id or self.chat_for_id == chat_for_id)
+        )
+
+
+class MessageWriteBehind:
+    def __init__(
+        self,
+        session_factory: async_sessionmaker[AsyncSession] = session_maker,
+        *,
+        flush_interval: float = FLUSH_INTERVAL_SECONDS,
+        max_batch: int = MAX_BATCH_ROWS,
+    ):
+        self._session_factory = session_factory
+        self._flush_interval = flush_interval
+        self._max_batch = max_batch
+        self._pending: list[MessageMapping] = []
+        self._in_flight: list[MessageMapping] = []
+        self._flush_task: asyncio.Task[None] | None = None
+        self._lock: asyncio.Lock | None = None
+        self._batch_full = asyncio.Event()
+        self._loop: asyncio.AbstractEventLoop | None = None
+        self.flushes = 0
+        self.rows_written = 0
+        self.failures = 0
+
+    def _bind_loop(self) -> None:
+        loop = asyncio.get_running_loop()
+        if self._loop is not loop:
+            # Tasks, locks and events of a previous (closed) loop are unusable.
+            self._loop = loop
+            self._lock = asyncio.Lock()
+            self._batch_full = asyncio.Event()
+            self._flush_task = None
+
+    def add(self, row: MessageMapping) -> None:
+        """Queue a row; it is written by the background flusher."""
+        self._bind_loop()
+        self._pending.append(row)
+        if len(self._pending) >= self._max_batch:
+            self._batch_full.set()
+        task = self._flush_task
+        if task is None or task.done():
+            self._flush_task = asyncio.create_task(self._run_flusher())
+
+    async def _run_flusher(self) -> None:
+        delay = self._flush_interval
+        while self._pending:
+            if len(self._pending) < self._max_batch:
+                with suppress(asyncio.TimeoutError):
+                    await asyncio.wait_for(self._batch_full.wait(), delay)
+            self._batch_full.clear()
+            # Shielded: cancelling the flusher must not abort a commit halfway.
+            written = await asyncio.shield(self.flush())
+            delay = self._flush_interval if written else RETRY_DELAY_SECONDS
+
+    async def flush(self) -> bool:
+        """Write everything queued so far in one transaction.
+
+        Returns ``False`` when the write failed; the rows are then put back
+        in front of the queue for the next attempt.
+        """
+        if not self._pending and not self._in_flight:
+            return True
+        self._bind_loop()
+        assert self._lock is not None
+        async with self._lock:
+            batch, self._pending = self._pending, []
+            if not batch:
+                return True
+            self._in_flight = batch
+            try:
+                async with self._session_factory() as session:
+                    await session.execute(
+                        insert(Messages), [asdict(row) for row in batch]
+                    )
+                    await session.commit()
+            except Exception as ex:
+                self.failures += 1
+                self._pending[:0] = batch
+                dropped = len(self._pending) - MAX_PENDING_ROWS
+                if dropped > 0:
+                    del self._pending[:dropped]
+                logger.error(
+                    f"message mapping flush failed — rows={len(batch)}, "
+                    f"pending={len(self._pending)}, dropped={max(dropped, 0)}: {ex}"
+                )
+                return False
+            finally:
+                self._in_flight = []
+            self.flushes += 1
+            self.rows_written += len(batch)
+            return True
+
+    async def close(self) -> None:
+        """Drain the queue; called on dispatcher shutdown."""
+        task = self._flush_task
+        if task is not None and not task.done():
+            task.cancel()
+        self._flush_task = None
+        if not await self.flush():
+            logger.error(
+                f"message mapping queue not drained on shutdown — "
+                f"lost rows={len(self._pending)}"
+            )
+
+    def _queued(self) -> list[MessageMapping]:
+        return self._in_flight + self._pending
+
+    def find(
+        self,
+        bot_id: int,
+        message_id: int | None = None,
+        resend_id: int | None = None,
+        chat_from_id: int | None = None,
+        chat_for_id: int | None = None,
+    ) -> MessageMapping | None:
+        """Return the oldest queued row matching the filters."""
+        for row in self._queued():
+            if row.matches(bot_id, message_id, resend_id, chat_from_id, chat_for_id):
+                return row
+        return None
+
+    def find_either_side(
+        self, bot_id: int, chat_id: int, message_id: int
+    ) -> MessageMapping | None:
+        """Return the oldest queued row where the message is copy or original."""
+        for row in self._queued():
+            if row.bot_id != bot_id:
+                continue
+            if (row.resend_id == message_id and row.chat_for_id == chat_id) or (
+                row.message_id == message_id and row.chat_from_id == chat_id
+            ):
+                return row
+        return None
+
+    def has_reply_for(self, bot_id: int, user_id: int) -> bool:
+        return any(
+            row.bot_id == bot_id and row.chat_for_id == user_id
+            for row in self._queued()
+        )
+
+    def stats(self) -> dict[str, int]:
+        return {
+            "pending": len(self._pending),
+            "in_flight": len(self._in_flight),
+            "flushes": self.flushes,
+            "rows_written": self.rows_written,
+            "failures": self.failures,
+        }
+
+
+message_writer = MessageWriteBehind()
@@ -1,11 +1,11 @@
 import asyncio
 import os
+from functools import partial
 from contextlib import suppress
 
 import sentry_sdk
 from aiogram import Bot, Dispatcher
-from aiogram.client.default import DefaultBotProperties
-from aiogram.exceptions import TelegramBadRequest, TelegramUnauthorizedError
+from aiogram.exceptions import TelegramBadRequest
 from aiogram.fsm.storage.base import DefaultKeyBuilder
 from aiogram.fsm.storage.redis import RedisStorage
 from aiogram_dialog import (
@@ -16,7 +16,7 @@ from loguru import logger
 from bot.routers.admin import router as admin_router
 from bot.routers.admin_dialog import dialog_all
 from bot.routers.supports import router as support_router
-from config.bot_config import bot_config, make_bot
+from config.bot_config import SupportBotSettings, bot_config, make_bot
 
 
 async def aiogram_on_startup_polling(dispatcher: Dispatcher, bot: Bot) -> None:
@@ -35,8 +35,11 @@ async def aiogram_on_startup_polling(dispatcher: Dispatcher, bot: Bot) -> None:
 
 
 async def aiogram_on_shutdown_polling(dispatcher: Dispatcher, bot: Bot) -> None:
+    from bot.http_pool import http_pool
+
     logger.debug("Stopping polling")
     await bot.session.close()
+    await http_pool.close()
     await dispatcher.storage.close()
     logger.info("Stopped polling")
 
@@ -50,53 +53,36 @@ async def aiogram_on_startup_webhook(dispatcher: Dispatcher, bot: Bot) -> None:
         allowed_updates.append("message_reaction")
     if "channel_post" not in allowed_updates:
         allowed_updates.append("channel_post")
-    logger.info(f"Used update types for webhook: {allowed_updates}")
+    logger.info(f"Used update types for main bot webhook: {allowed_updates}")
 
-    # Устанавливаем команды для бота
-    from config.bot_config import set_commands
+    from bot.provisioning import format_summary, provision_bots, sync_bot, with_retries
 
-    await set_commands(bot)
-
-    await bot.delete_webhook(drop_pending_updates=False)
-    await bot.set_webhook(
-        url=f"{bot_config.BASE_URL}/{bot_config.SECRET_URL}/{bot_config.MAIN_BOT_PATH}",
-        allowed_updates=allowed_updates,
+    await with_retries(
+        lambda: sync_bot(
+            bot,
+            f"{bot_config.BASE_URL}/{bot_config.SECRET_URL}/{bot_config.MAIN_BOT_PATH}",
+            allowed_updates,
+        )
     )
-
-    for bot_setting in bot_config.get_bot_settings():
-        if not bot_setting.can_work:
-            logger.info(
-                f"skip webhook setup for disabled bot {bot_setting.username} {bot_setting.id}"
-            )
-            continue
-
-        try:
-            async with make_bot(bot_setting.token) as tmp_bot:
-                # Устанавливаем команды для дополнительного бота
-                from config.bot_config import set_commands
-
-                await set_commands(tmp_bot)
-
-                await tmp_bot.set_webhook(
-                    url=bot_config.other_bots_url.format(bot_token=bot_setting.token),
-                    allowed_updates=allowed_updates,
-                )
-        except TelegramUnauthorizedError:
-            logger.error(
-                f"TelegramUnauthorizedError {bot_setting.username} {bot_setting.id} - disabling bot"
-            )
-            if bot_setting.can_work:
-                bot_setting.can_work = False
-                await bot_config.save_settings_to_db(bot_setting)
-        except Exception as e:
-            logger.error(f"set_webhook_error {bot_setting.username} {bot_setting.id}")
-            logger.error(e)
+    # Support bots get per-bot subscriptions (bot/provisioning.py).
+    results = await provision_bots(bot_config, bot_factory=make_bot)
 
     with suppress(TelegramBadRequest):
-        await bot.send_message(chat_id=bot_config.ADMIN_ID, text="Bot started")
+        await bot.send_message(
+            chat_id=bot_config.ADMIN_ID,
+            text=f"Bot started\n{format_summary(results)}",
+        )
     logger.info("Started webhook")
 
 
+async def notify_bot_disabled(bot: Bot, settings: SupportBotSettings) -> None:
+    await bot.send_message(
+        chat_id=settings.owner,
+        text=f"Бот @{settings.username} отключён: Telegram отклоняет его токен. "
+        f"Обновите токен и включите бота снова.",
+    )
+
+
 async def close_connections(app):
     for obj in [app, *app.values()]:
         if isinstance(obj, Bot):
@@ -115,11 +101,26 @@ def main():
 
     from database.models import update_db
 
-    asyncio.run(update_db())
+    # Workers started by the supervisor find the schema already migrated.
+    if "SHARD_INDEX" not in os.environ:
+        asyncio.run(update_db())
 
     # Load bot settings from database (synchronously)
     bot_config.load_from_db()
 
+    from bot.sharding import PROCESSES, current_shard
+
+    if (
+        os.environ.get("ENVIRONMENT") == "production"
+        and PROCESSES > 1
+        and "SHARD_INDEX" not in os.environ
+    ):
+        from bot.supervisor import run_supervisor
+
+        # Migrations ran above, once, before any worker starts.
+        run_supervisor(PROCESSES, bot_config)
+        return
+
     bot = make_bot(bot_config.main_bot_token)
 
     storage = RedisStorage.from_url(
@@ -135,49 +136,142 @@ def main():
 
     from bot.middlewares.db import DbSessionMiddleware
     from bot.middlewares.config import ConfigMiddleware
+    from bot.middlewares.prefilter import PrefilterMiddleware
 
     config_middleware = ConfigMiddleware(bot_config)
 
     # Register middleware on main dispatcher (admin bot)
     main_dispatcher.update.middleware(config_middleware)
 
+    from bot import metrics
+    from bot.bot_health import bot_health
+    from bot.broadcast import broadcasts, resume_broadcasts
+    from bot.http_pool import http_pool
+    from bot.identity import bot_identities
+    from bot.media_groups import RedisAlbumStore, media_groups
+    from bot.send_scheduler import send_scheduler
+    from database.mapping_cache import message_cache
+    from database.replied_users import replied_users
+    from database.write_behind import message_writer
+
+    prefilter = PrefilterMiddleware(bot_config)
+    # Support bots with a revoked token are disabled at runtime; their owners
+    # hear about it from the admin bot.
+    bot_health.attach(partial(notify_bot_disabled, bot))
+    bot_config.add_listener(bot_health.reset)
+    metrics.register("send_scheduler", send_scheduler.stats)
+    metrics.register("bot_health", bot_health.stats)
+    metrics.register("http_pool", http_pool.stats)
+    metrics.register("bot_identities", bot_identities.stats)
+    metrics.register("media_groups", media_groups.stats)
+    metrics.register("prefilter", prefilter.stats)
+    metrics.register("message_writer", message_writer.stats)
+    metrics.register("message_cache", message_cache.stats)
+    metrics.register("replied_users", replied_users.stats)
+
     multibot_dispatcher = Dispatcher(storage=storage)
+    if current_shard.count > 1:
+        # Other workers' bots fall back to the DB (database/replied_users.py).
+        owned = [
+            item.id
+            for item in bot_config.get_bot_settings()
+            if current_shard.owns(item.id)
+        ]
+        multibot_dispatcher.startup.register(partial(replied_users.load, bot_ids=owned))
+    else:
+        multibot_dispatcher.startup.register(replied_users.load)
+    multibot_dispatcher.startup.register(resume_broadcasts)
+    multibot_dispatcher.startup.register(bot_identities.start)
+    multibot_dispatcher.shutdown.register(bot_identities.close)
+    multibot_dispatcher.shutdown.register(media_groups.close)
+    # Broadcasts save mappings, so stop them before draining the writer.
+    multibot_dispatcher.shutdown.register(broadcasts.close)
+    multibot_dispatcher.shutdown.register(message_writer.close)
+    multibot_dispatcher.shutdown.register(http_pool.close)
+    # Drop unknown bots, other bots and ignored users before any DB work.
+    multibot_dispatcher.update.outer_middleware(prefilter)
     multibot_dispatcher.update.middleware(DbSessionMiddleware())
     multibot_dispatcher.update.middleware(config_middleware)
     multibot_dispatcher.include_router(support_router)
 
     if os.environ.get("ENVIRONMENT") == "production":
         from aiohttp import web
-        from aiogram.webhook.aiohttp_server import (
-            SimpleRequestHandler,
-            TokenBasedRequestHandler,
-            setup_application,
+        from bot.metrics import metrics_handler
+        from aiogram.webhook.aiohttp_server import setup_application
+        from bot.bot_pool import BotPool
+        from bot.token_index import TokenIndex, token_filter
+        from bot.update_dedup import update_dedup
+        from bot.update_queue import (
+            QueuedSimpleRequestHandler,
+            QueuedTokenBasedRequestHandler,
+            UpdateQueue,
         )
 
-        main_dispatcher.startup.register(aiogram_on_startup_webhook)
-        main_dispatcher.shutdown.register(aiogram_on_shutdown_webhook)
-
-        app = web.Application()
-        SimpleRequestHandler(dispatcher=main_dispatcher, bot=bot).register(
-            app, path=f"/{bot_config.SECRET_URL}/{bot_config.MAIN_BOT_PATH}"
-        )
-        bot_settings = {"default": DefaultBotProperties(parse_mode="HTML")}
-        TokenBasedRequestHandler(
+        # Workers other than 0 serve support bots only (bot/sharding.py).
+        if current_shard.is_primary:
+            main_dispatcher.startup.register(aiogram_on_startup_webhook)
+            main_dispatcher.shutdown.register(aiogram_on_shutdown_webhook)
+        # Album parts may reach any webhook worker; assemble them in the
+        # Redis the FSM storage uses.
+        redis = getattr(storage, "redis", None)
+        if redis is not None:
+            media_groups.attach(RedisAlbumStore(redis))
+            # Redeliveries can reach another worker while a bot's owner restarts.
+            update_dedup.attach(redis)
+            if current_shard.count > 1:
+                from bot.sharding import SettingsBus
+
+                settings_bus = SettingsBus(redis, bot_config)
+                metrics.register("settings_bus", settings_bus.stats)
+                multibot_dispatcher.startup.register(settings_bus.start)
+                multibot_dispatcher.shutdown.register(settings_bus.close)
+
+        # Updates are acked at once and processed by a bounded worker pool;
+        # the admin bot gets its own, so the fleet cannot starve it.
+        main_queue = UpdateQueue("main_bot", workers=4)
+        bots_queue = UpdateQueue("support_bots")
+        metrics.register("webhook_main_bot", main_queue.stats)
+        metrics.register("webhook_support_bots", bots_queue.stats)
+        metrics.register("update_dedup", update_dedup.stats)
+
+        # Support bots are built on their first update and dropped when idle;
+        # unknown and disabled tokens get a 404 before any handler runs.
+        token_index = TokenIndex(bot_config)
+        bot_config.add_listener(token_index.rebuild)
+        bot_pool = BotPool(token_index)
+        bot_config.add_listener(bot_pool.forget)
+        metrics.register("token_index", token_index.stats)
+        metrics.register("bot_pool", bot_pool.stats)
+
+        app = web.Application(middlewares=[token_filter(token_index)])
+        if current_shard.is_primary:
+            QueuedSimpleRequestHandler(
+                dispatcher=main_dispatcher,
+                bot=bot,
+                queue=main_queue,
+                dedup=update_dedup,
+            ).register(app, path=f"/{bot_config.SECRET_URL}/{bot_config.MAIN_BOT_PATH}")
+        bots_handler = QueuedTokenBasedRequestHandler(
             dispatcher=multibot_dispatcher,
-            bots={
-                bot_setting.token: make_bot(bot_setting.token)
-                for bot_setting in bot_config.get_bot_settings()
-                if bot_setting.can_work
-            },
-            bot_settings=bot_settings,
-        ).register(app, path=f"/{bot_config.SECRET_URL}/{bot_config.OTHER_BOTS_PATH}")
-
-        setup_application(app, main_dispatcher, bot=bot)
+            queue=bots_queue,
+            pool=bot_pool,
+            dedup=update_dedup,
+        )
+        bots_handler.register(
+            app, path=f"/{bot_config.SECRET_URL}/{bot_config.OTHER_BOTS_PATH}"
+        )
+        app.router.add_get(f"/{bot_config.SECRET_URL}/metrics", metrics_handler)
+
+        if current_shard.is_primary:
+            setup_application(app, main_dispatcher, bot=bot)
         setup_application(app, multibot_dispatcher)
 
-        web.run_app(
-            app, host=bot_config.WEB_SERVER_HOST, port=bot_config.WEB_SERVER_PORT
-        )
+        host, port = bot_config.WEB_SERVER_HOST, bot_config.WEB_SERVER_PORT
+        if current_shard.count > 1:
+            from bot.supervisor import WORKER_HOST, worker_port
+
+            host, port = WORKER_HOST, worker_port(current_shard.index)
+        web.run_app(app, host=host, port=port)
     else:
         main_dispatcher.startup.register(aiogram_on_startup_polling)
         main_dispatcher.shutdown.register(aiogram_on_shutdown_polling)
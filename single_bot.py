@@ -11,6 +11,7 @@ from aiogram.fsm.storage.base import DefaultKeyBuilder
 from aiogram.fsm.storage.redis import RedisStorage
 from loguru import logger
 
+from bot.http_pool import http_pool
 from bot.routers.supports import router as support_router
 from config.bot_config import bot_config, make_bot
 
@@ -73,6 +74,7 @@ def main():
 
     # Устанавливаем конфигурацию в bot_config
     bot_config.json_config = single_bot_config
+    bot_config.reload_settings()
 
     # Настраиваем хранилище состояний
     storage = RedisStorage.from_url(
@@ -83,8 +85,15 @@ def main():
     # Создаем диспетчер
     dispatcher = Dispatcher(storage=storage)
 
+    from bot.broadcast import broadcasts, resume_broadcasts
+    from bot.identity import bot_identities
+    from bot.media_groups import media_groups
     from bot.middlewares.db import DbSessionMiddleware
+    from bot.middlewares.prefilter import PrefilterMiddleware
+    from database.replied_users import replied_users
+    from database.write_behind import message_writer
 
+    dispatcher.update.outer_middleware(PrefilterMiddleware(bot_config))
     dispatcher.update.middleware(DbSessionMiddleware())
 
     # Регистрируем маршрутизатор поддержки
@@ -92,7 +101,15 @@ def main():
 
     # Регистрируем обработчики запуска и остановки
     dispatcher.startup.register(aiogram_on_startup_polling)
+    dispatcher.startup.register(replied_users.load)
+    dispatcher.startup.register(resume_broadcasts)
+    dispatcher.startup.register(bot_identities.start)
     dispatcher.shutdown.register(aiogram_on_shutdown_polling)
+    dispatcher.shutdown.register(bot_identities.close)
+    dispatcher.shutdown.register(media_groups.close)
+    dispatcher.shutdown.register(broadcasts.close)
+    dispatcher.shutdown.register(message_writer.close)
+    dispatcher.shutdown.register(http_pool.close)
 
     # Запускаем бота на поллинге
     asyncio.run(dispatcher.start_polling(bot))
@@ -1,12 +1,16 @@
+from typing import Any
 from unittest.mock import MagicMock
 import pytest
 from aiohttp import web
 from aiogram import Dispatcher
 from aiogram_dialog import setup_dialogs
+from sqlalchemy.ext.asyncio import async_sessionmaker, create_async_engine
 
+import database.models
 from bot.routers.supports import router as support_router
-from database.models import Messages
-from database.repositories import Repo
+from config.bot_config import SupportBotSettings, bot_config
+from database.models import Base, Messages
+from database.repositories import MessageCounterpart, Repo
 
 # Constants for Mock Server
 MOCK_SERVER_PORT = 8081
@@ -15,6 +19,44 @@ MOCK_SERVER_URL = f"http://{MOCK_SERVER_HOST}:{MOCK_SERVER_PORT}"
 TEST_BOT_TOKEN = "123456:ABC-DEF1234ghIkl-zyx57W2v1u123ew11"
 
 
+def make_settings(**overrides) -> SupportBotSettings:
+    """A working support bot's settings; ``overrides`` replace any field."""
+    bot_id = overrides.get("id", 12345)
+    values: dict[str, Any] = dict(
+        id=bot_id,
+        username=f"bot{bot_id}",
+        token=f"{bot_id}:token",
+        start_message="Hi",
+        security_policy="default",
+        no_start_message=False,
+        special_commands=0,
+        mark_bad=False,
+        owner=1,
+        can_work=True,
+    )
+    values.update(overrides)
+    return SupportBotSettings(**values)
+
+
+@pytest.fixture
+async def config(tmp_path, monkeypatch):
+    """``bot_config`` with bots 1 and 2 over a fresh SQLite database."""
+    engine = create_async_engine(f"sqlite+aiosqlite:///{tmp_path / 'support.db'}")
+    async with engine.begin() as conn:
+        await conn.run_sync(Base.metadata.create_all)
+    monkeypatch.setattr(database.models, "session_maker", async_sessionmaker(engine))
+    saved = bot_config.json_config
+    bot_config.json_config = {
+        str(bot_id): make_settings(id=bot_id, master_chat=-100).model_dump()
+        for bot_id in (1, 2)
+    }
+    bot_config.reload_settings()
+    yield bot_config
+    bot_config.json_config = saved
+    bot_config.reload_settings()
+    await engine.dispose()
+
+
 class MockRepo(Repo):
     def __init__(self):
         self.users = {}
@@ -85,6 +127,22 @@ class MockRepo(Repo):
             return SimpleNamespace(**msg)  # type: ignore[return-value]
         return None
 
+    async def get_message_counterpart(
+        self, bot_id: int, chat_id: int, message_id: int
+    ) -> MessageCounterpart | None:
+        for msg in self.messages:
+            if msg["bot_id"] != bot_id:
+                continue
+            if msg["resend_id"] == message_id and msg["chat_for_id"] == chat_id:
+                return MessageCounterpart(
+                    msg["chat_from_id"], msg["message_id"], is_copy=True
+                )
+            if msg["message_id"] == message_id and msg["chat_from_id"] == chat_id:
+                return MessageCounterpart(
+                    msg["chat_for_id"], msg["resend_id"], is_copy=False
+                )
+        return None
+
     async def has_user_received_reply(self, bot_id: int, user_id: int) -> bool:
         for msg in self.messages:
             if msg["bot_id"] == bot_id and msg["chat_for_id"] == user_id:
@@ -140,6 +198,13 @@ async def mock_server():
         )
         return web.json_response({"ok": True, "result": True})
 
+    @routes.post("/bot{token}/setWebhook")
+    async def set_webhook(request):
+        received_requests.append(
+            {"method": "setWebhook", "token": request.match_info["token"]}
+        )
+        return web.json_response({"ok": True, "result": True})
+
     @routes.post("/bot{token}/setMyCommands")
     async def set_my_commands(request):
         if request.content_type == "application/json":
@@ -272,6 +337,21 @@ def _reset_reactions_cache():
     clear_cache()
 
 
+@pytest.fixture(autouse=True)
+def _reset_message_cache():
+    from bot.send_scheduler import send_scheduler
+    from database.mapping_cache import message_cache
+    from database.replied_users import replied_users
+
+    message_cache.clear()
+    replied_users.clear()
+    send_scheduler.clear()
+    yield
+    message_cache.clear()
+    replied_users.clear()
+    send_scheduler.clear()
+
+
 @pytest.fixture(autouse=True)
 def cleanup_router():
     yield
@@ -0,0 +1,91 @@
+import threading
+
+import pytest
+from pydantic import ValidationError
+
+
+@pytest.mark.asyncio
+async def test_settings_are_shared_frozen_snapshots(config):
+    settings = config.get_bot_setting(1)
+
+    assert settings is not None
+    assert config.get_bot_setting(1) is settings
+    assert config.get_bot_settings() is config.get_bot_settings()
+    assert config.get_bot_setting(3) is None
+    with pytest.raises(ValidationError):
+        settings.can_work = False  # type: ignore[misc]
+
+
+@pytest.mark.asyncio
+async def test_invalid_entry_is_skipped(config):
+    config.json_config["3"] = {"id": 3}
+    config.reload_settings()
+
+    assert config.get_bot_setting(3) is None
+    assert [item.id for item in config.get_bot_settings()] == [1, 2]
+
+
+@pytest.mark.asyncio
+async def test_save_replaces_snapshot(config):
+    old = config.get_bot_setting(1)
+    old_list = config.get_bot_settings()
+    assert old is not None
+
+    await config.update_bot_setting(old.model_copy(update={"can_work": False}))
+
+    new = config.get_bot_setting(1)
+    assert new is not None and new is not old
+    assert new.can_work is False
+    assert old.can_work is True
+    assert old_list[0] is old
+    assert config.json_config["1"]["can_work"] is False
+
+    await config.delete_bot_setting(1)
+    assert config.get_bot_setting(1) is None
+    assert [item.id for item in config.get_bot_settings()] == [2]
+
+
+@pytest.mark.asyncio
+async def test_listeners_hear_saves_deletes_and_reloads(config, monkeypatch):
+    changes = []
+    monkeypatch.setattr(config, "_listeners", [changes.append])
+    settings = config.get_bot_setting(2)
+    assert settings is not None
+
+    await config.save_settings_to_db(settings.model_copy(update={"can_work": False}))
+    await config.delete_bot_setting(2)
+    config.reload_settings()
+
+    assert changes == [2, 2, None]
+
+
+@pytest.mark.asyncio
+async def test_reload_reads_db_in_a_thread_and_notifies_on_the_loop(
+    config, tmp_path, monkeypatch
+):
+    settings = config.get_bot_setting(1)
+    assert settings is not None
+    await config.save_settings_to_db(settings.model_copy(update={"can_work": False}))
+    monkeypatch.setattr(config, "SQLITE_FILE_NAME", str(tmp_path / "support.db"))
+    threads = {}
+    read = config._read_settings
+
+    def read_in_thread():
+        threads["read"] = threading.get_ident()
+        return read()
+
+    monkeypatch.setattr(config, "_read_settings", read_in_thread)
+    monkeypatch.setattr(
+        config,
+        "_listeners",
+        [lambda bot_id: threads.setdefault("listener", threading.get_ident())],
+    )
+
+    await config.reload_from_db()
+
+    assert threads["read"] != threading.get_ident()
+    assert threads["listener"] == threading.get_ident()
+    # Bot 2 was never saved to this database.
+    assert [(item.id, item.can_work) for item in config.get_bot_settings()] == [
+        (1, False)
+    ]
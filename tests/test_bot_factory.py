@@ -28,3 +28,41 @@ async def test_make_bot_uses_factory_session(monkeypatch: pytest.MonkeyPatch):
         assert "bot-api.internal:8081" in bot.session.api.base
     finally:
         await bot.session.close()
+
+
+def test_make_session_installs_send_scheduler(monkeypatch: pytest.MonkeyPatch):
+    from bot.send_scheduler import send_scheduler
+
+    monkeypatch.delenv("TELEGRAM_API_URL", raising=False)
+    session = make_session()
+    assert send_scheduler in session.middleware._middlewares
+
+
+async def test_bots_share_one_client_session(monkeypatch: pytest.MonkeyPatch):
+    from bot.http_pool import ConnectionPool, PooledAiohttpSession
+
+    monkeypatch.delenv("TELEGRAM_API_URL", raising=False)
+    pool = ConnectionPool(limit=5)
+    first, second = PooledAiohttpSession(pool), PooledAiohttpSession(pool)
+    try:
+        client = await first.create_session()
+        assert await second.create_session() is client
+        assert client.connector is not None and client.connector.limit == 5
+
+        # Closing a bot's session leaves the shared pool open.
+        await first.close()
+        assert not client.closed
+        assert pool.stats()["sessions_opened"] == 1
+    finally:
+        await pool.close()
+    assert client.closed
+    assert pool.stats()["in_use"] == 0
+
+
+def test_make_session_uses_shared_pool(monkeypatch: pytest.MonkeyPatch):
+    from bot.http_pool import PooledAiohttpSession, http_pool
+
+    monkeypatch.delenv("TELEGRAM_API_URL", raising=False)
+    session = make_session()
+    assert isinstance(session, PooledAiohttpSession)
+    assert session._pool is http_pool
@@ -0,0 +1,131 @@
+from typing import Any
+from unittest.mock import AsyncMock, Mock
+
+import pytest
+from aiogram import Bot
+from aiogram.client.session.middlewares.base import NextRequestMiddlewareType
+from aiogram.exceptions import TelegramForbiddenError, TelegramUnauthorizedError
+from aiogram.fsm.context import FSMContext
+from aiogram.methods import SendMessage, TelegramMethod
+from aiogram.types import CallbackQuery
+from aiogram_dialog import DialogManager
+from aiogram_dialog.widgets.kbd import Button
+
+from bot.bot_health import THRESHOLD, BotDisabledError, BotHealth, bot_health
+from bot.http_pool import http_pool
+from bot.routers.admin_dialog import button_clicked
+from config.bot_config import make_bot
+from tests.conftest import MOCK_SERVER_URL
+
+
+def _api(outcomes, calls) -> NextRequestMiddlewareType[Any]:
+    async def make_request(bot: Bot, method: TelegramMethod[Any]) -> Any:
+        calls.append(getattr(method, "chat_id", None))
+        outcome = outcomes.pop(0) if outcomes else None
+        if outcome is not None:
+            raise outcome(method, "error")
+        return True
+
+    return make_request
+
+
+@pytest.mark.asyncio
+async def test_revoked_token_trips_once_and_disables_bot(config):
+    health = BotHealth(config, threshold=2)
+    notified = []
+
+    async def notify(settings):
+        notified.append(settings.owner)
+
+    health.attach(notify)
+    calls = []
+    unauthorized = TelegramUnauthorizedError
+    make_request = _api([unauthorized, None, unauthorized, unauthorized], calls)
+    bot = Bot("1:token")
+
+    for expected in (TelegramUnauthorizedError, None, TelegramUnauthorizedError):
+        if expected is None:
+            await health(make_request, bot, SendMessage(chat_id=5, text="hi"))
+        else:
+            with pytest.raises(expected):
+                await health(make_request, bot, SendMessage(chat_id=5, text="hi"))
+    # A success in between reset the count, so the bot still works.
+    assert config.get_bot_setting(1).can_work is True
+
+    with pytest.raises(TelegramUnauthorizedError):
+        await health(make_request, bot, SendMessage(chat_id=5, text="hi"))
+    for _ in range(3):
+        with pytest.raises(BotDisabledError):
+            await health(make_request, bot, SendMessage(chat_id=5, text="hi"))
+
+    assert len(calls) == 4
+    assert config.get_bot_setting(1).can_work is False
+    assert notified == [1]
+    stats = health.stats()
+    assert (stats["tripped"], stats["trips"], stats["short_circuited"]) == (1, 1, 3)
+
+    # Saving the disabled state keeps the breaker open; enabling closes it.
+    health.reset(1)
+    with pytest.raises(BotDisabledError):
+        await health(make_request, bot, SendMessage(chat_id=5, text="hi"))
+    await config.save_settings_to_db(
+        config.get_bot_setting(1).model_copy(update={"can_work": True})
+    )
+    health.reset(1)
+    assert await health(make_request, bot, SendMessage(chat_id=5, text="hi"))
+
+
+@pytest.mark.asyncio
+async def test_forbidden_and_bots_without_settings_do_not_trip(config):
+    health = BotHealth(config, threshold=1)
+    calls = []
+    make_request = _api(
+        [TelegramForbiddenError, TelegramForbiddenError, TelegramUnauthorizedError],
+        calls,
+    )
+
+    for _ in range(2):
+        with pytest.raises(TelegramForbiddenError):
+            await health(make_request, Bot("1:token"), SendMessage(chat_id=5, text="x"))
+    # The admin bot has no support bot settings.
+    with pytest.raises(TelegramUnauthorizedError):
+        await health(make_request, Bot("99:token"), SendMessage(chat_id=5, text="x"))
+
+    assert health.stats()["forbidden"] == 2
+    assert health.stats()["tripped"] == 0
+    assert config.get_bot_setting(1).can_work is True
+
+
+@pytest.mark.asyncio
+async def test_admin_can_enable_a_tripped_bot(config, mock_server, monkeypatch):
+    monkeypatch.setenv("TELEGRAM_API_URL", MOCK_SERVER_URL)
+    make_request = _api([TelegramUnauthorizedError] * THRESHOLD, [])
+    for _ in range(THRESHOLD):
+        with pytest.raises(TelegramUnauthorizedError):
+            await bot_health(
+                make_request, Bot("1:token"), SendMessage(chat_id=5, text="x")
+            )
+    assert config.get_bot_setting(1).can_work is False
+    async with make_bot("1:token") as bot:
+        with pytest.raises(BotDisabledError):
+            await bot.send_message(chat_id=5, text="x")
+
+    callback = Mock(spec=CallbackQuery, answer=AsyncMock())
+    button = Mock(spec=Button, widget_id="can_work")
+    state = Mock(spec=FSMContext)
+    state.get_data.return_value = {"bot_id": 1}
+    manager = Mock(spec=DialogManager)
+    manager.middleware_data = {"state": state, "config": config}
+    try:
+        await button_clicked(callback, button, manager)
+    finally:
+        bot_health.reset_force(1)
+        await http_pool.close()
+
+    callback.answer.assert_awaited_once_with("Бот успешно активирован!")
+    assert config.get_bot_setting(1).can_work is True
+    assert [r["method"] for r in mock_server] == [
+        "sendMessage",
+        "setMyCommands",
+        "setWebhook",
+    ]
@@ -0,0 +1,92 @@
+import asyncio
+from unittest.mock import AsyncMock, MagicMock
+
+import pytest
+from aiogram.types import User
+
+from bot.identity import BotIdentities
+from bot.sharding import Shard
+from tests.conftest import make_settings
+
+
+@pytest.fixture
+def config():
+    settings = [
+        make_settings(id=1, username="first_bot"),
+        make_settings(id=2, username="second_bot"),
+        make_settings(id=3, username="stopped_bot", can_work=False),
+    ]
+    config = MagicMock()
+    config.get_bot_settings.return_value = settings
+    config.get_bot_setting.side_effect = lambda bot_id: next(
+        (item for item in settings if item.id == bot_id), None
+    )
+    return config
+
+
+def _factory(calls: list[str]):
+    def make_bot(token: str):
+        calls.append(token)
+        bot_id = int(token.split(":")[0])
+        bot = MagicMock()
+        bot.__aenter__ = AsyncMock(return_value=bot)
+        bot.__aexit__ = AsyncMock(return_value=None)
+        if bot_id == 2:
+            bot.get_me = AsyncMock(side_effect=RuntimeError("Unauthorized"))
+        else:
+            bot.get_me = AsyncMock(
+                return_value=User(
+                    id=bot_id, is_bot=True, first_name="Bot", username="renamed_bot"
+                )
+            )
+        return bot
+
+    return make_bot
+
+
+@pytest.mark.asyncio
+async def test_refresh_caches_working_bots_and_falls_back_to_settings(config):
+    calls = []
+    identities = BotIdentities(config, bot_factory=_factory(calls))
+
+    assert identities.username(1) == "first_bot"
+    assert await identities.refresh() == 1
+
+    assert sorted(calls) == ["1:token", "2:token"]
+    assert identities.username(1) == "renamed_bot"
+    assert identities.username(2) == "second_bot"
+    assert identities.username(99) is None
+    assert identities.stats() == {"bots": 1, "refreshes": 1, "errors": 1}
+
+
+@pytest.mark.asyncio
+async def test_start_refreshes_in_background_until_closed(config):
+    calls = []
+    sleeps = []
+
+    async def sleep(delay):
+        sleeps.append(delay)
+        await asyncio.sleep(0)
+
+    identities = BotIdentities(
+        config, bot_factory=_factory(calls), interval=60, sleep=sleep
+    )
+    await identities.start()
+    while identities.refreshes < 2:
+        await asyncio.sleep(0)
+    await identities.close()
+
+    assert sleeps[:2] == [60, 60]
+    assert identities.username(1) == "renamed_bot"
+
+
+@pytest.mark.asyncio
+async def test_refresh_fetches_only_the_workers_bots(config):
+    shard = Shard(0, 2)
+    owned = [bot_id for bot_id in (1, 2) if shard.owns(bot_id)]
+    calls = []
+    identities = BotIdentities(config, bot_factory=_factory(calls), shard=shard)
+
+    await identities.refresh()
+
+    assert calls == [f"{bot_id}:token" for bot_id in owned]
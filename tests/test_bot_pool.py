@@ -0,0 +1,71 @@
+from types import SimpleNamespace
+from unittest.mock import MagicMock
+
+from bot.bot_pool import BotPool, token_bot_id
+from bot.token_index import TokenIndex
+from config.bot_config import SupportBotSettings
+from tests.conftest import make_settings
+
+
+def _pool(*settings: SupportBotSettings, **kwargs) -> tuple[BotPool, MagicMock]:
+    config = SimpleNamespace(get_bot_settings=lambda: list(settings))
+    tokens = TokenIndex(config)  # type: ignore[arg-type]
+    factory = MagicMock(side_effect=lambda token: SimpleNamespace(token=token))
+    return BotPool(tokens, bot_factory=factory, **kwargs), factory
+
+
+def test_bots_are_built_on_first_use_for_enabled_tokens_only():
+    pool, factory = _pool(make_settings(id=1), make_settings(id=2, can_work=False))
+
+    assert len(pool) == 0
+    bot = pool.get("1:token")
+    assert bot is not None and pool.get("1:token") is bot
+    factory.assert_called_once_with("1:token")
+
+    assert pool.get("1:stale") is None
+    assert pool.get("2:token") is None
+    assert pool.get("3:token") is None
+    assert pool.get("garbage") is None
+    assert factory.call_count == 1
+    assert pool.stats() == {
+        "bots": 1,
+        "created": 1,
+        "hits": 1,
+        "refused": 4,
+        "evicted": 0,
+    }
+
+
+def test_least_recently_used_and_idle_bots_are_dropped():
+    now = [0.0]
+    pool, _ = _pool(
+        *(make_settings(id=bot_id) for bot_id in (1, 2, 3)),
+        max_bots=2,
+        idle=100,
+        clock=lambda: now[0],
+    )
+    pool.get("1:token")
+    pool.get("2:token")
+    pool.get("1:token")
+    pool.get("3:token")  # over the cap: 2 is the least recently used
+
+    assert [token_bot_id(token) for token in pool._bots] == [1, 3]
+
+    now[0] = 150
+    pool.get("3:token")  # 1 has been idle for 150 s
+
+    assert [token_bot_id(token) for token in pool._bots] == [3]
+    assert pool.stats()["evicted"] == 2
+
+
+def test_settings_change_drops_the_bot():
+    pool, factory = _pool(make_settings(id=1), make_settings(id=2))
+    pool.get("1:token")
+    pool.get("2:token")
+
+    pool.forget(1)
+    assert [token_bot_id(token) for token in pool._bots] == [2]
+    pool.forget(None)
+    assert len(pool) == 0
+    pool.get("1:token")
+    assert factory.call_count == 3
@@ -0,0 +1,165 @@
+from types import SimpleNamespace
+from unittest.mock import AsyncMock, MagicMock
+
+import pytest
+from aiogram.exceptions import (
+    TelegramForbiddenError,
+    TelegramNetworkError,
+    TelegramRetryAfter,
+)
+from aiogram.methods import SendMessage
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import async_sessionmaker, create_async_engine
+
+from bot.broadcast import BroadcastEngine, parse_recipient_ids
+from database.models import Base, BroadcastRecipients, Broadcasts, Messages
+from database.write_behind import MessageWriteBehind
+
+MASTER_CHAT = -100
+_METHOD = SendMessage(chat_id=1, text="x")
+
+
+@pytest.fixture
+async def session_maker(tmp_path):
+    engine = create_async_engine(f"sqlite+aiosqlite:///{tmp_path / 'support.db'}")
+    async with engine.begin() as conn:
+        await conn.run_sync(Base.metadata.create_all)
+    yield async_sessionmaker(engine, expire_on_commit=False)
+    await engine.dispose()
+
+
+@pytest.fixture
+async def writer(session_maker):
+    writer = MessageWriteBehind(session_maker)
+    yield writer
+    await writer.close()
+
+
+@pytest.fixture
+async def engine(session_maker, writer):
+    sleeps = []
+
+    async def sleep(delay):
+        sleeps.append(delay)
+
+    broadcasts = BroadcastEngine(session_maker, writer, concurrency=3, sleep=sleep)
+    broadcasts.sleeps = sleeps  # type: ignore[attr-defined]
+    yield broadcasts
+    await broadcasts.close()
+
+
+def _bot(failures=None):
+    """Fake bot: ``failures`` maps chat id to exceptions raised before success."""
+    failures = failures or {}
+    bot = MagicMock()
+    bot.id = 42
+    bot.session.close = AsyncMock()
+    bot.edit_message_text = AsyncMock()
+    sent = []
+    next_id = iter(range(1000, 100000))
+
+    async def send_message(chat_id, text, **kwargs):
+        pending = failures.get(chat_id)
+        if pending:
+            raise pending.pop(0)
+        sent.append((chat_id, text))
+        return SimpleNamespace(
+            message_id=next(next_id), chat=SimpleNamespace(id=chat_id)
+        )
+
+    bot.send_message = AsyncMock(side_effect=send_message)
+    bot.sent = sent
+    return bot
+
+
+async def _create(engine, recipients):
+    return await engine.create(
+        bot_id=42,
+        chat_id=MASTER_CHAT,
+        thread_id=None,
+        command_message_id=77,
+        text="Hello\n\nВам ответил Agent",
+        support_user_id=5,
+        recipients=recipients,
+    )
+
+
+async def _statuses(session_maker, broadcast_id):
+    async with session_maker() as session:
+        rows = await session.execute(
+            select(BroadcastRecipients.chat_id, BroadcastRecipients.status).filter(
+                BroadcastRecipients.broadcast_id == broadcast_id
+            )
+        )
+        return dict(rows.all())
+
+
+def test_parse_recipient_ids():
+    text = "/send ID123456 #id654321, 1234567;ID123456 (#ID7654321) 12 abcdefg"
+
+    assert parse_recipient_ids(text) == [123456, 654321, 1234567, 7654321]
+
+
+@pytest.mark.asyncio
+async def test_broadcast_retries_and_records_every_recipient(
+    engine, session_maker, writer
+):
+    bot = _bot(
+        {
+            200002: [TelegramNetworkError(_METHOD, "timeout")],
+            200003: [TelegramRetryAfter(_METHOD, "Flood", retry_after=7)],
+            200004: [TelegramForbiddenError(_METHOD, "bot was blocked")],
+        }
+    )
+    recipients = [200001, 200002, 200003, 200004, 200005]
+    broadcast_id = await _create(engine, recipients)
+
+    engine.start(bot, broadcast_id)
+    await engine.wait(broadcast_id)
+
+    assert await _statuses(session_maker, broadcast_id) == {
+        200001: "sent",
+        200002: "sent",
+        200003: "sent",
+        200004: "failed",
+        200005: "sent",
+    }
+    assert sorted(engine.sleeps) == [2.0, 7.0]  # type: ignore[attr-defined]
+    await writer.flush()
+    async with session_maker() as session:
+        job = await session.get(Broadcasts, broadcast_id)
+        assert job is not None and job.status == "done"
+        mappings = (await session.scalars(select(Messages))).all()
+    assert {row.chat_for_id for row in mappings} == {200001, 200002, 200003, 200005}
+    assert {(row.message_id, row.chat_from_id) for row in mappings} == {
+        (77, MASTER_CHAT)
+    }
+    # One progress message, turned into the final report.
+    progress = [call for call in bot.sent if call[0] == MASTER_CHAT]
+    assert len(progress) == 1
+    report = bot.edit_message_text.await_args.kwargs["text"]
+    assert "завершена: отправлено 4 из 5, ошибок 1" in report
+    assert "200004" in report
+
+
+@pytest.mark.asyncio
+async def test_resume_sends_only_pending_recipients(engine, session_maker):
+    broadcast_id = await _create(engine, [300001, 300002, 300003])
+    async with session_maker() as session:
+        recipient = await session.get(BroadcastRecipients, (broadcast_id, 300001))
+        assert recipient is not None
+        recipient.status = "sent"
+        job = await session.get(Broadcasts, broadcast_id)
+        assert job is not None
+        job.progress_message_id = 555
+        await session.commit()
+    bot = _bot()
+
+    assert await engine.resume(lambda bot_id: bot if bot_id == 42 else None) == 1
+    await engine.wait(broadcast_id)
+
+    assert [chat_id for chat_id, _ in bot.sent] == [300002, 300003]
+    assert set((await _statuses(session_maker, broadcast_id)).values()) == {"sent"}
+    assert bot.edit_message_text.await_args.kwargs["message_id"] == 555
+    bot.session.close.assert_awaited_once()
+    assert await engine.resume(lambda bot_id: bot) == 0
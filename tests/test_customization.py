@@ -26,6 +26,20 @@ def test_registry_default():
     assert isinstance(customization, DefaultBotCustomization)
 
 
+def test_registry_reuses_instances():
+    helper = get_customization(5173438724)
+    assert get_customization(5173438724) is helper
+    assert get_customization(999999) is get_customization(888888)
+
+
+def test_helper_router_belongs_to_shared_instance():
+    from bot.routers.supports import router as support_router
+
+    helper = get_customization(5173438724)
+    assert helper.router.parent_router is not None
+    assert helper.router.parent_router.parent_router is support_router
+
+
 def test_registry_test_customization():
     # Test ID 123 returns DemoCustomization
     customization = get_customization(123)
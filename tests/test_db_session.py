@@ -0,0 +1,64 @@
+import pytest
+from aiogram.types import Update
+from sqlalchemy.ext.asyncio import async_sessionmaker, create_async_engine
+
+import bot.middlewares.db
+from bot.middlewares.db import DbSessionMiddleware
+from database.models import Base
+from database.repositories import Repo
+
+
+@pytest.fixture
+async def opened(tmp_path, monkeypatch):
+    engine = create_async_engine(f"sqlite+aiosqlite:///{tmp_path / 'support.db'}")
+    async with engine.begin() as conn:
+        await conn.run_sync(Base.metadata.create_all)
+    factory = async_sessionmaker(engine, expire_on_commit=False)
+    sessions = []
+
+    def counting_factory():
+        session = factory()
+        sessions.append(session)
+        return session
+
+    monkeypatch.setattr(bot.middlewares.db, "session_maker", counting_factory)
+    yield sessions
+    await engine.dispose()
+
+
+@pytest.mark.asyncio
+async def test_update_without_queries_opens_no_session(opened):
+    async def handler(event, data):
+        assert isinstance(data["repo"], Repo)
+
+    await DbSessionMiddleware()(handler, Update(update_id=1), {})
+
+    assert opened == []
+
+
+@pytest.mark.asyncio
+async def test_session_opened_on_first_query_and_closed_after(opened):
+    async def handler(event, data):
+        repo = data["repo"]
+        assert await repo.get_user_info(1) is None
+        assert await repo.get_all_users() == []
+
+    await DbSessionMiddleware()(handler, Update(update_id=1), {})
+
+    assert len(opened) == 1
+    assert opened[0].in_transaction() is False
+
+
+@pytest.mark.asyncio
+async def test_passed_session_is_left_open(tmp_path):
+    engine = create_async_engine(f"sqlite+aiosqlite:///{tmp_path / 'support.db'}")
+    async with engine.begin() as conn:
+        await conn.run_sync(Base.metadata.create_all)
+    async with async_sessionmaker(engine)() as session:
+        repo = Repo(session)
+        await repo.get_user_info(1)
+        await repo.close()
+
+        assert repo.session is session
+        assert session.in_transaction() is True
+    await engine.dispose()
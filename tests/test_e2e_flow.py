@@ -5,6 +5,7 @@ from aiogram.client.telegram import TelegramAPIServer
 import datetime
 
 from bot.routers.supports import router as support_router
+from config.bot_config import SupportBotSettings
 from tests.conftest import MOCK_SERVER_URL, TEST_BOT_TOKEN
 
 
@@ -45,25 +46,37 @@ async def test_ticket_flow(mock_server, repo):
     from unittest.mock import AsyncMock, MagicMock
 
     mock_config = MagicMock()
-    mock_settings = MagicMock()
-    mock_settings.master_chat = MASTER_CHAT_ID
-    mock_settings.ignore_commands = False
-    mock_settings.master_thread = None
-    mock_settings.block_links = False
-    mock_settings.ignore_users = []
-    mock_settings.special_commands = 0
-    mock_settings.use_auto_reply = True
-    mock_settings.auto_reply = "We received your message"
-    mock_settings.mark_bad = False  # Prevent reaction calls
+    mock_settings = SupportBotSettings(
+        id=123456,
+        username="test_bot",
+        token=TEST_BOT_TOKEN,
+        start_message="Hi",
+        security_policy="default",
+        master_chat=MASTER_CHAT_ID,
+        master_thread=None,
+        no_start_message=False,
+        special_commands=0,
+        mark_bad=False,  # Prevent reaction calls
+        owner=1,
+        ignore_commands=False,
+        block_links=False,
+        ignore_users=[],
+        use_auto_reply=True,
+        auto_reply="We received your message",
+        use_local_names=True,
+        local_names={},
+    )
+    middleware = MockMiddleware(repo, mock_config, mock_settings)
+
+    async def _update_bot_setting(settings):
+        # Settings are immutable snapshots; the next update sees the saved copy.
+        middleware.settings = settings
 
     mock_config.get_bot_setting.return_value = mock_settings
-    mock_config.update_bot_setting = AsyncMock()
+    mock_config.update_bot_setting = AsyncMock(side_effect=_update_bot_setting)
     mock_config.media_groups = {}  # Add media_groups
 
-    mock_settings.use_local_names = True
-    mock_settings.local_names = {}
-
-    dp.update.middleware(MockMiddleware(repo, mock_config, mock_settings))
+    dp.update.middleware(middleware)
 
     # 2. Simulate User Ticket
     USER_ID = 111222
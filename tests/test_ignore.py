@@ -1,6 +1,7 @@
 import pytest
 from unittest.mock import AsyncMock, MagicMock
 from bot.routers.supports import cmd_add_ignore
+from tests.conftest import make_settings
 
 
 @pytest.fixture
@@ -30,15 +31,12 @@ def config():
 
 @pytest.fixture
 def settings():
-    s = MagicMock()
-    s.master_chat = 222
-    s.ignore_users = [101, 102, 103]
-    return s
+    return make_settings(master_chat=222, owner=888, ignore_users=[101, 102, 103])
 
 
 @pytest.mark.asyncio
 async def test_ignore_wrong_chat(message, bot, settings, config):
-    settings.master_chat = 999
+    settings = settings.model_copy(update={"master_chat": 999})
     message.chat.id = 222  # Different from master_chat
 
     await cmd_add_ignore(message, bot, settings, config)
@@ -51,7 +49,7 @@ async def test_ignore_wrong_chat(message, bot, settings, config):
 @pytest.mark.asyncio
 async def test_ignore_list_short(message, bot, settings, config):
     # Setup: ignore_users has 3 items
-    settings.ignore_users = [101, 102, 103]
+    settings = settings.model_copy(update={"ignore_users": [101, 102, 103]})
     message.text = "/ignore"
 
     await cmd_add_ignore(message, bot, settings, config)
@@ -66,7 +64,7 @@ async def test_ignore_list_short(message, bot, settings, config):
 @pytest.mark.asyncio
 async def test_ignore_list_long(message, bot, settings, config):
     # Setup: ignore_users has 6 items
-    settings.ignore_users = [1, 2, 3, 4, 5, 6]
+    settings = settings.model_copy(update={"ignore_users": [1, 2, 3, 4, 5, 6]})
     message.text = "/ignore"
 
     await cmd_add_ignore(message, bot, settings, config)
@@ -81,13 +79,15 @@ async def test_ignore_list_long(message, bot, settings, config):
 
 @pytest.mark.asyncio
 async def test_ignore_add_user(message, bot, settings, config):
-    settings.ignore_users = [100]
+    settings = settings.model_copy(update={"ignore_users": [100]})
     message.text = "/ignore 200"
 
     await cmd_add_ignore(message, bot, settings, config)
 
-    assert 200 in settings.ignore_users
-    config.update_bot_setting.assert_called_once_with(settings)
+    config.update_bot_setting.assert_called_once()
+    saved = config.update_bot_setting.call_args.args[0]
+    assert saved.ignore_users == [100, 200]
+    assert settings.ignore_users == [100]
     message.answer.assert_called()
     assert "добавлен" in (
         message.answer.call_args.kwargs.get("text") or message.answer.call_args[0][0]
@@ -96,13 +96,15 @@ async def test_ignore_add_user(message, bot, settings, config):
 
 @pytest.mark.asyncio
 async def test_ignore_remove_user(message, bot, settings, config):
-    settings.ignore_users = [100, 200]
+    settings = settings.model_copy(update={"ignore_users": [100, 200]})
     message.text = "/ignore 200"
 
     await cmd_add_ignore(message, bot, settings, config)
 
-    assert 200 not in settings.ignore_users
-    config.update_bot_setting.assert_called_once_with(settings)
+    config.update_bot_setting.assert_called_once()
+    saved = config.update_bot_setting.call_args.args[0]
+    assert saved.ignore_users == [100]
+    assert settings.ignore_users == [100, 200]
     message.answer.assert_called()
     assert "удален" in (
         message.answer.call_args.kwargs.get("text") or message.answer.call_args[0][0]
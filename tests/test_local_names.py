@@ -1,5 +1,5 @@
 import pytest
-from unittest.mock import MagicMock, AsyncMock
+from unittest.mock import MagicMock, AsyncMock, patch
 
 from bot.routers.supports import _resolve_agent_name, _no_name_error_text
 from bot.routers.supports import (
@@ -10,7 +10,8 @@ from bot.routers.supports import (
     cmd_edit_msg,
     cmd_stats,
 )
-from config.bot_config import BotConfig
+from config.bot_config import BotConfig, SupportBotSettings
+from tests.conftest import make_settings
 
 
 @pytest.fixture
@@ -89,6 +90,10 @@ def config():
     return c
 
 
+def _local_names_settings(local_names: dict) -> SupportBotSettings:
+    return make_settings(master_chat=222, use_local_names=True, local_names=local_names)
+
+
 def _make_message(text, chat_id, user_id=111):
     msg = AsyncMock()
     msg.text = text
@@ -101,17 +106,15 @@ def _make_message(text, chat_id, user_id=111):
 
 @pytest.mark.asyncio
 async def test_myname_local_saves_to_settings(bot, repo, config):
-    settings = MagicMock()
-    settings.master_chat = 222
-    settings.ignore_commands = False
-    settings.use_local_names = True
-    settings.local_names = {}
+    settings = _local_names_settings({})
 
     msg = _make_message("/myname Локальный", 222)
     await cmd_myname(msg, bot, repo, settings, config)
 
-    assert settings.local_names[str(msg.from_user.id)] == "Локальный"
-    config.update_bot_setting.assert_awaited_once_with(settings)
+    config.update_bot_setting.assert_awaited_once()
+    saved = config.update_bot_setting.await_args.args[0]
+    assert saved.local_names[str(msg.from_user.id)] == "Локальный"
+    assert settings.local_names == {}
     assert "локально" in msg.answer.call_args[1]["text"].lower()
 
 
@@ -149,16 +152,13 @@ async def test_myname_global_shows_label(bot, repo, config):
 async def test_myname_local_allows_globally_existing_name(bot, repo, config):
     """Name exists globally but not locally → allowed in local mode."""
     repo.users[999] = "Занято"  # global name exists
-    settings = MagicMock()
-    settings.master_chat = 222
-    settings.ignore_commands = False
-    settings.use_local_names = True
-    settings.local_names = {}
+    settings = _local_names_settings({})
 
     msg = _make_message("/myname Занято", 222)
     await cmd_myname(msg, bot, repo, settings, config)
 
-    assert settings.local_names[str(msg.from_user.id)] == "Занято"
+    saved = config.update_bot_setting.await_args.args[0]
+    assert saved.local_names[str(msg.from_user.id)] == "Занято"
     assert "локально" in msg.answer.call_args[1]["text"].lower()
 
 
@@ -396,12 +396,19 @@ async def test_send_local_name_resolves(bot, repo, config):
     msg.venue = None
     msg.media_group_id = None
 
-    await cmd_send(msg, bot, repo, settings, config)
+    with patch("bot.routers.supports.broadcasts") as broadcasts:
+        broadcasts.create = AsyncMock(return_value=1)
+        await cmd_send(msg, bot, repo, settings, config)
 
     # Should not get the "no name" error
     if msg.reply.called:
         reply_text = msg.reply.call_args[0][0]
         assert "псевдоним" not in reply_text.lower()
+    created = broadcasts.create.await_args
+    assert created is not None
+    assert created.kwargs["recipients"] == [999999]
+    assert "Вам ответил Локал" in created.kwargs["text"]
+    broadcasts.start.assert_called_once_with(bot, 1)
 
 
 # --- cmd_edit_msg local names tests (master chat side) ---
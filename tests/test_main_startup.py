@@ -70,3 +70,33 @@ def test_main_webhook_setup(
     assert mock_run_app.called
     mock_update_db.assert_called_once_with()
     assert mock_asyncio_run.call_args_list[0].args[0] is mock_update_db.return_value
+
+
+@patch("database.models.update_db", new_callable=MagicMock)
+@patch("main.asyncio.run")
+@patch("aiohttp.web.run_app")
+@patch("main.bot_config")
+@patch("main.RedisStorage")
+def test_worker_leaves_migrations_to_the_supervisor(
+    mock_redis_storage,
+    mock_config,
+    mock_run_app,
+    mock_asyncio_run,
+    mock_update_db,
+):
+    from aiogram.fsm.storage.memory import MemoryStorage
+
+    mock_redis_storage.from_url.return_value = MemoryStorage()
+    mock_config.main_bot_token = "123:main_token"
+    mock_config.REDIS_URL = "redis://localhost:6379/0"
+    mock_config.get_bot_settings.return_value = []
+    mock_config.OTHER_BOTS_PATH = "bot/{bot_token}"
+    mock_config.SECRET_URL = "secret_path"
+    mock_config.MAIN_BOT_PATH = "main"
+
+    env = {"ENVIRONMENT": "production", "SHARD_INDEX": "1", "SHARD_COUNT": "2"}
+    with patch.dict(os.environ, env):
+        main()
+
+    assert mock_run_app.called
+    mock_update_db.assert_not_called()
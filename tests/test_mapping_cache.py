@@ -0,0 +1,119 @@
+import pytest
+from sqlalchemy.ext.asyncio import async_sessionmaker, create_async_engine
+
+from database.mapping_cache import MessageMappingCache
+from database.models import Base
+from database.replied_users import RepliedUsers
+from database.repositories import MessageCounterpart, Repo
+from database.write_behind import MessageMapping, MessageWriteBehind
+
+
+class _Clock:
+    def __init__(self):
+        self.now = 1000.0
+
+    def __call__(self) -> float:
+        return self.now
+
+
+class _NoDbSession:
+    """Fails the test if a lookup reaches the database."""
+
+    async def execute(self, *args, **kwargs):
+        raise AssertionError("lookup was not answered from the cache")
+
+
+def _row(message_id: int, *, chat_for_id: int = -100) -> MessageMapping:
+    return MessageMapping(
+        bot_id=1,
+        user_id=None,
+        message_id=message_id,
+        resend_id=message_id + 1000,
+        chat_from_id=555,
+        chat_for_id=chat_for_id,
+    )
+
+
+def test_mapping_is_found_both_ways():
+    cache = MessageMappingCache()
+    row = _row(10)
+    cache.put(row)
+
+    assert cache.get_by_copy(1, -100, 1010) is row
+    assert cache.get_by_original(1, 555, 10) is row
+    assert cache.find_either_side(1, -100, 1010) is row
+    assert cache.get_by_copy(1, 555, 10) is None
+    assert cache.stats()["hits"] == 3
+    assert cache.stats()["misses"] == 1
+
+
+def test_least_recently_used_mapping_is_evicted():
+    cache = MessageMappingCache(max_mappings=2)
+    cache.put(_row(1))
+    cache.put(_row(2))
+    cache.get_by_copy(1, -100, 1001)
+    cache.put(_row(3))
+
+    assert cache.get_by_copy(1, -100, 1001) is not None
+    assert cache.get_by_copy(1, -100, 1002) is None
+    assert cache.stats()["evictions"] >= 1
+
+
+def test_mappings_expire():
+    clock = _Clock()
+    cache = MessageMappingCache(ttl=60, clock=clock)
+    cache.put(_row(1, chat_for_id=777))
+    assert cache.get_by_copy(1, 777, 1001) is not None
+
+    clock.now += 61
+
+    assert cache.get_by_copy(1, 777, 1001) is None
+    assert cache.get_by_original(1, 555, 1) is None
+    assert cache.stats()["expirations"] == 2
+
+
+def test_oldest_broadcast_mapping_wins_for_original():
+    cache = MessageMappingCache()
+    cache.put(_row(10, chat_for_id=111))
+    cache.put(_row(10, chat_for_id=222))
+
+    found = cache.get_by_original(1, 555, 10)
+    assert found is not None
+    assert found.chat_for_id == 111
+
+
+def test_find_only_answers_key_lookups():
+    cache = MessageMappingCache()
+    row = _row(10)
+    cache.put(row)
+
+    assert cache.find(1, resend_id=1010, chat_for_id=-100) is row
+    assert cache.find(1, message_id=10, chat_from_id=555) is row
+    assert cache.find(1, message_id=10) is None
+    assert cache.stats()["misses"] == 0
+
+
+@pytest.mark.asyncio
+async def test_repo_answers_recent_lookups_from_memory(tmp_path):
+    engine = create_async_engine(f"sqlite+aiosqlite:///{tmp_path / 'support.db'}")
+    async with engine.begin() as conn:
+        await conn.run_sync(Base.metadata.create_all)
+    writer = MessageWriteBehind(async_sessionmaker(engine), flush_interval=60)
+    repo = Repo(
+        _NoDbSession(),  # type: ignore[arg-type]
+        writer,
+        MessageMappingCache(),
+        RepliedUsers(),
+    )
+
+    await repo.save_message_ids(1, None, 10, 20, 555, -100)
+
+    info = await repo.get_message_resend_info(1, resend_id=20, chat_for_id=-100)
+    assert info is not None
+    assert info.message_id == 10
+    assert await repo.get_message_counterpart(1, -100, 20) == MessageCounterpart(
+        555, 10, is_copy=True
+    )
+    assert await repo.has_user_received_reply(1, -100) is True
+    await writer.close()
+    await engine.dispose()
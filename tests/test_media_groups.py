@@ -0,0 +1,236 @@
+import asyncio
+import datetime
+from types import SimpleNamespace
+from typing import cast
+from unittest.mock import AsyncMock, MagicMock
+
+import pytest
+from aiogram.types import (
+    Audio,
+    Chat,
+    Document,
+    InputMediaDocument,
+    InputMediaPhoto,
+    InputMediaVideo,
+    Message,
+    PhotoSize,
+    Video,
+)
+from redis.asyncio import Redis
+
+from bot.media_groups import MediaGroupAggregator, RedisAlbumStore, media_groups
+from bot.routers.supports import resend_message_plus
+from tests.conftest import MockRepo
+
+USER_CHAT = 555
+MASTER_CHAT = -100
+
+
+def _part(message_id: int, caption: str | None = None, **media) -> Message:
+    return Message(
+        message_id=message_id,
+        date=datetime.datetime.now(),
+        chat=Chat(id=USER_CHAT, type="private"),
+        media_group_id="album-1",
+        caption=caption,
+        **media,
+    )
+
+
+def _photo(message_id: int, caption: str | None = None) -> Message:
+    size = PhotoSize(
+        file_id=f"photo{message_id}", file_unique_id="u", width=1, height=1
+    )
+    return _part(message_id, caption, photo=[size])
+
+
+def _video(message_id: int, caption: str | None = None) -> Message:
+    video = Video(
+        file_id=f"video{message_id}", file_unique_id="u", width=1, height=1, duration=1
+    )
+    return _part(message_id, caption, video=video)
+
+
+@pytest.mark.asyncio
+async def test_parts_flush_once_after_idle_gap():
+    aggregator = MediaGroupAggregator(idle=0.1, max_wait=1.0)
+    flushed = []
+
+    async def flush(parts):
+        flushed.append([part.message_id for part in parts])
+
+    key = (1, USER_CHAT, "album-1")
+    assert await aggregator.add(key, _photo(12), flush) is True
+    assert await aggregator.add(key, _photo(11), flush) is False
+    await asyncio.sleep(0.02)
+    await aggregator.add(key, _photo(13), flush)
+    assert flushed == []
+
+    await asyncio.sleep(0.3)
+
+    assert flushed == [[11, 12, 13]]
+    assert aggregator.stats()["albums"] == 1
+    assert aggregator.stats()["buffered"] == 0
+
+
+@pytest.mark.asyncio
+async def test_close_flushes_buffered_albums():
+    aggregator = MediaGroupAggregator(idle=60, max_wait=60)
+    flush = AsyncMock()
+    await aggregator.add((1, USER_CHAT, "album-1"), _photo(1), flush)
+
+    await aggregator.close()
+
+    flush.assert_awaited_once()
+
+
+class FakeRedis:
+    """The list/string commands RedisAlbumStore uses, in memory."""
+
+    def __init__(self):
+        self.data = {}
+
+    async def set(self, name, value, nx=False, px=None):
+        if nx and name in self.data:
+            return None
+        self.data[name] = value
+        return True
+
+    async def llen(self, name):
+        return len(self.data.get(name, []))
+
+    async def delete(self, name):
+        return int(self.data.pop(name, None) is not None)
+
+    def pipeline(self, transaction=True):
+        return FakePipeline(self)
+
+
+class FakePipeline:
+    def __init__(self, redis):
+        self.redis = redis
+        self.commands = []
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, *exc):
+        return False
+
+    def rpush(self, name, value):
+        def push(data):
+            data.setdefault(name, []).append(value)
+            return len(data[name])
+
+        self.commands.append(push)
+
+    def pexpire(self, name, ms):
+        self.commands.append(lambda data: name in data)
+
+    def lrange(self, name, start, end):
+        self.commands.append(lambda data: list(data.get(name, [])))
+
+    def delete(self, name):
+        self.commands.append(lambda data: int(data.pop(name, None) is not None))
+
+    async def execute(self):
+        return [command(self.redis.data) for command in self.commands]
+
+
+@pytest.mark.asyncio
+async def test_album_split_between_workers_is_flushed_once():
+    redis = FakeRedis()
+    workers = [
+        MediaGroupAggregator(
+            idle=0.05, max_wait=1.0, store=RedisAlbumStore(cast(Redis, redis))
+        )
+        for _ in range(2)
+    ]
+    flushed = []
+
+    def flush_on(worker):
+        async def flush(parts):
+            flushed.append((worker, [part.message_id for part in parts]))
+
+        return flush
+
+    key = (1, USER_CHAT, "album-1")
+    assert await workers[0].add(key, _photo(11), flush_on(0)) is True
+    assert await workers[1].add(key, _video(12), flush_on(1)) is False
+    await workers[0].add(key, _photo(13), flush_on(0))
+    await asyncio.sleep(0.3)
+
+    # The worker with the last part drains the album; the other finds it gone.
+    assert flushed == [(0, [11, 12, 13])]
+    assert redis.data == {}
+    assert workers[1].stats()["claims_skipped"] == 1
+    for worker in workers:
+        await worker.close()
+    assert len(flushed) == 1
+
+
+@pytest.mark.asyncio
+async def test_mixed_album_is_sent_as_one_media_group(monkeypatch):
+    monkeypatch.setattr(media_groups, "_idle", 0.05)
+    bot = MagicMock()
+    bot.id = 42
+    next_id = iter(range(900, 1000))
+
+    async def send_media_group(media, chat_id, **kwargs):
+        return [
+            SimpleNamespace(message_id=next(next_id), chat=SimpleNamespace(id=chat_id))
+            for _ in media
+        ]
+
+    bot.send_media_group = AsyncMock(side_effect=send_media_group)
+    bot.send_message = AsyncMock(
+        return_value=SimpleNamespace(
+            message_id=999, chat=SimpleNamespace(id=MASTER_CHAT)
+        )
+    )
+    repo = MockRepo()
+    first = _photo(21, caption="first")
+    parts = [first, _video(22, caption="<b>second</b>"), _photo(20)]
+
+    for part in parts:
+        await resend_message_plus(
+            message=part,
+            bot=bot,
+            repo=repo,
+            chat_id=MASTER_CHAT,
+            text=f"Header\n{part.html_text}",
+            reply_to_message_id=None,
+            support_user_id=None,
+            message_thread_id=None,
+            config=MagicMock(),
+        )
+    bot.send_media_group.assert_not_called()
+    await asyncio.sleep(0.3)
+
+    media = bot.send_media_group.await_args.kwargs["media"]
+    assert [type(item) for item in media] == [
+        InputMediaPhoto,
+        InputMediaPhoto,
+        InputMediaVideo,
+    ]
+    # "first" is already in the text message, so only the video keeps its caption.
+    assert [item.caption for item in media] == [None, None, "&lt;b&gt;second&lt;/b&gt;"]
+    bot.send_message.assert_awaited_once()
+    assert bot.send_message.await_args.kwargs["text"] == "Header\nfirst"
+    assert [(row["message_id"], row["resend_id"]) for row in repo.messages] == [
+        (20, 900),
+        (21, 901),
+        (22, 902),
+        (21, 999),
+    ]
+
+
+def test_document_and_audio_parts_are_album_media():
+    from bot.media_groups import album_media
+
+    document = _part(1, document=Document(file_id="doc", file_unique_id="u"))
+    audio = _part(2, audio=Audio(file_id="audio", file_unique_id="u", duration=1))
+
+    assert isinstance(album_media(document), InputMediaDocument)
+    assert album_media(audio) is not None
+    assert album_media(_part(3)) is None
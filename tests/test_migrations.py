@@ -0,0 +1,178 @@
+import pytest
+from sqlalchemy.ext.asyncio import async_sessionmaker, create_async_engine
+
+from database.migrations import (
+    MIGRATIONS,
+    Migration,
+    apply_migrations,
+    get_schema_version,
+)
+from database.models import Base
+from database.repositories import MessageCounterpart, Repo
+from database.write_behind import MessageWriteBehind
+
+LEGACY_SCHEMA = (
+    "CREATE TABLE t_messages ("
+    " record_id INTEGER PRIMARY KEY, record_add_date DATETIME, bot_id BIGINT,"
+    " user_id BIGINT, message_id BIGINT, resend_id BIGINT,"
+    " chat_from_id BIGINT, chat_for_id BIGINT)",
+    "CREATE TABLE bot_settings (id BIGINT PRIMARY KEY, username VARCHAR, token VARCHAR)",
+)
+
+
+@pytest.fixture
+async def engine(tmp_path):
+    engine = create_async_engine(f"sqlite+aiosqlite:///{tmp_path / 'support.db'}")
+    yield engine
+    await engine.dispose()
+
+
+async def _index_names(conn) -> set[str]:
+    result = await conn.exec_driver_sql(
+        "SELECT name FROM sqlite_master WHERE type='index' AND tbl_name='t_messages'"
+    )
+    return {row[0] for row in result}
+
+
+async def _columns(conn, table: str) -> set[str]:
+    result = await conn.exec_driver_sql(f"PRAGMA table_info({table})")
+    return {row[1] for row in result}
+
+
+@pytest.mark.asyncio
+async def test_legacy_db_is_migrated_to_latest_version(engine):
+    async with engine.begin() as conn:
+        for statement in LEGACY_SCHEMA:
+            await conn.exec_driver_sql(statement)
+
+    async with engine.begin() as conn:
+        version = await apply_migrations(conn)
+
+    async with engine.connect() as conn:
+        assert version == MIGRATIONS[-1].version
+        assert await get_schema_version(conn) == version
+        assert "spam_block_words" in await _columns(conn, "bot_settings")
+        assert {
+            "ix_t_messages_bot_resend_for",
+            "ix_t_messages_bot_message_from",
+            "ix_t_messages_bot_for",
+        } <= await _index_names(conn)
+
+
+@pytest.mark.asyncio
+async def test_migrations_are_idempotent_on_fresh_schema(engine):
+    async with engine.begin() as conn:
+        await conn.run_sync(Base.metadata.create_all)
+        first = await apply_migrations(conn)
+    async with engine.begin() as conn:
+        second = await apply_migrations(conn)
+
+    assert first == second == MIGRATIONS[-1].version
+
+
+@pytest.mark.asyncio
+async def test_only_pending_migrations_run(engine):
+    calls: list[int] = []
+
+    async def _record(conn):
+        calls.append(len(calls))
+
+    steps = (Migration(1, "one", _record), Migration(2, "two", _record))
+    async with engine.begin() as conn:
+        await conn.exec_driver_sql("PRAGMA user_version = 1")
+        assert await apply_migrations(conn, steps) == 2
+
+    assert calls == [0]
+
+
+@pytest.mark.asyncio
+async def test_hot_lookups_use_covering_indexes(engine):
+    async with engine.begin() as conn:
+        await conn.run_sync(Base.metadata.create_all)
+        await apply_migrations(conn)
+
+    plans = {
+        "resend": "SELECT record_id, message_id, chat_from_id FROM t_messages "
+        "WHERE bot_id = 1 AND resend_id = 2 AND chat_for_id = 3",
+        "message": "SELECT record_id, resend_id, chat_for_id FROM t_messages "
+        "WHERE bot_id = 1 AND message_id = 2 AND chat_from_id = 3",
+        "reply": "SELECT record_id FROM t_messages "
+        "WHERE bot_id = 1 AND chat_for_id = 3 LIMIT 1",
+    }
+    async with engine.connect() as conn:
+        for name, sql in plans.items():
+            result = await conn.exec_driver_sql(f"EXPLAIN QUERY PLAN {sql}")
+            detail = " ".join(str(row[-1]) for row in result)
+            assert "COVERING INDEX" in detail, (name, detail)
+
+
+@pytest.mark.asyncio
+async def test_repo_lookups_on_indexed_table(engine):
+    async with engine.begin() as conn:
+        await conn.run_sync(Base.metadata.create_all)
+        await apply_migrations(conn)
+
+    session_maker = async_sessionmaker(engine, expire_on_commit=False)
+    writer = MessageWriteBehind(session_maker)
+    async with session_maker() as session:
+        repo = Repo(session, writer)
+        await repo.save_message_ids(
+            bot_id=1,
+            user_id=None,
+            message_id=10,
+            resend_id=20,
+            chat_from_id=555,
+            chat_for_id=-100,
+        )
+        await writer.close()
+        by_copy = await repo.get_message_resend_info(
+            bot_id=1, resend_id=20, chat_for_id=-100
+        )
+        by_original = await repo.get_message_resend_info(
+            bot_id=1, message_id=10, chat_from_id=555
+        )
+
+        assert by_copy is not None and by_copy.message_id == 10
+        assert by_original is not None and by_original.resend_id == 20
+        assert await repo.has_user_received_reply(bot_id=1, user_id=-100) is True
+        assert await repo.has_user_received_reply(bot_id=1, user_id=555) is False
+
+
+@pytest.mark.asyncio
+async def test_counterpart_lookup_resolves_both_sides(engine):
+    async with engine.begin() as conn:
+        await conn.run_sync(Base.metadata.create_all)
+        await apply_migrations(conn)
+        plan = await conn.exec_driver_sql(
+            "EXPLAIN QUERY PLAN SELECT * FROM (SELECT message_id, resend_id, "
+            "chat_from_id, chat_for_id FROM t_messages WHERE bot_id = 1 AND "
+            "resend_id = 20 AND chat_for_id = -100 LIMIT 1) UNION ALL "
+            "SELECT * FROM (SELECT message_id, resend_id, chat_from_id, "
+            "chat_for_id FROM t_messages WHERE bot_id = 1 AND message_id = 20 "
+            "AND chat_from_id = -100 LIMIT 1) LIMIT 1"
+        )
+        detail = [str(row[-1]) for row in plan]
+        searches = [line for line in detail if "USING COVERING INDEX" in line]
+        assert len(searches) == 2
+        assert all("chat_" in line for line in searches)
+
+    session_maker = async_sessionmaker(engine, expire_on_commit=False)
+    writer = MessageWriteBehind(session_maker, flush_interval=60)
+    async with session_maker() as session:
+        repo = Repo(session, writer)
+        # User 555 message 10 forwarded to master chat as 20.
+        await repo.save_message_ids(1, None, 10, 20, 555, -100)
+        # Operator reply 30 in master chat delivered to the user as 11.
+        await repo.save_message_ids(1, 7, 30, 11, -100, 555)
+
+        queued = await repo.get_message_counterpart(1, chat_id=-100, message_id=20)
+        await writer.flush()
+        ticket = await repo.get_message_counterpart(1, chat_id=-100, message_id=20)
+        reply = await repo.get_message_counterpart(1, chat_id=-100, message_id=30)
+        user_side = await repo.get_message_counterpart(1, chat_id=555, message_id=11)
+        missing = await repo.get_message_counterpart(1, chat_id=555, message_id=99)
+
+    assert queued == ticket == MessageCounterpart(555, 10, is_copy=True)
+    assert reply == MessageCounterpart(555, 11, is_copy=False)
+    assert user_side == MessageCounterpart(-100, 30, is_copy=True)
+    assert missing is None
@@ -0,0 +1,107 @@
+import datetime
+from unittest.mock import MagicMock
+
+import pytest
+from aiogram import Bot, Dispatcher, Router
+from aiogram.types import Chat, Message, Update, User
+
+from bot.middlewares.prefilter import PrefilterMiddleware, ignored_user_ids
+from tests.conftest import make_settings
+
+BOT_ID = 42
+MASTER_CHAT = -100
+SETTINGS = make_settings(id=BOT_ID, master_chat=MASTER_CHAT, ignore_users=[101])
+
+
+def _update(user_id: int, chat_id: int | None = None, is_bot: bool = False) -> Update:
+    chat_id = user_id if chat_id is None else chat_id
+    return Update(
+        update_id=1,
+        message=Message(
+            message_id=1,
+            date=datetime.datetime.now(),
+            chat=Chat(id=chat_id, type="private" if chat_id > 0 else "supergroup"),
+            from_user=User(id=user_id, is_bot=is_bot, first_name="U"),
+            text="hello",
+        ),
+    )
+
+
+@pytest.fixture
+def setup():
+    config = MagicMock()
+    config.get_bot_setting.side_effect = lambda bot_id: (
+        SETTINGS if bot_id == BOT_ID else None
+    )
+    prefilter = PrefilterMiddleware(config)
+    sessions = []
+    handled = []
+
+    async def db_session(handler, event, data):
+        sessions.append(event)
+        return await handler(event, data)
+
+    router = Router()
+
+    @router.message()
+    async def on_message(message: Message):
+        handled.append(message.from_user.id if message.from_user else None)
+
+    dp = Dispatcher()
+    dp.update.outer_middleware(prefilter)
+    dp.update.middleware(db_session)
+    dp.include_router(router)
+    return dp, prefilter, sessions, handled
+
+
+@pytest.mark.asyncio
+async def test_regular_user_passes(setup):
+    dp, prefilter, sessions, handled = setup
+
+    await dp.feed_update(Bot(f"{BOT_ID}:token"), _update(7))
+
+    assert handled == [7]
+    assert len(sessions) == 1
+    assert prefilter.stats()["passed"] == 1
+
+
+@pytest.mark.asyncio
+async def test_rejected_updates_never_open_a_session(setup):
+    dp, prefilter, sessions, handled = setup
+    bot = Bot(f"{BOT_ID}:token")
+
+    await dp.feed_update(bot, _update(101))
+    await dp.feed_update(bot, _update(55, chat_id=-5, is_bot=True))
+    await dp.feed_update(Bot("43:token"), _update(7))
+
+    assert handled == []
+    assert sessions == []
+    assert prefilter.stats() == {
+        "passed": 0,
+        "unknown_bot": 1,
+        "bot_sender": 1,
+        "ignored_user": 1,
+    }
+
+
+@pytest.mark.asyncio
+async def test_master_chat_is_not_filtered(setup):
+    dp, prefilter, sessions, handled = setup
+    bot = Bot(f"{BOT_ID}:token")
+
+    await dp.feed_update(bot, _update(101, chat_id=MASTER_CHAT))
+    await dp.feed_update(bot, _update(55, chat_id=MASTER_CHAT, is_bot=True))
+
+    assert handled == [101, 55]
+    assert prefilter.stats()["passed"] == 2
+
+
+def test_ignored_user_ids_follow_settings_snapshot():
+    settings = SETTINGS
+    ignored = ignored_user_ids(settings)
+
+    assert ignored == {101}
+    assert ignored_user_ids(settings.model_copy()) is ignored
+    assert ignored_user_ids(
+        SETTINGS.model_copy(update={"ignore_users": [101, 102]})
+    ) == {101, 102}
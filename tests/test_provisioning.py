@@ -0,0 +1,116 @@
+from unittest.mock import AsyncMock, MagicMock
+
+import pytest
+from aiogram.exceptions import TelegramNetworkError, TelegramUnauthorizedError
+from aiogram.methods import GetWebhookInfo
+from aiogram.types import WebhookInfo
+
+from bot.provisioning import (
+    FAILED,
+    UNAUTHORIZED,
+    UNCHANGED,
+    UPDATED,
+    ProvisionResult,
+    allowed_updates_for,
+    format_summary,
+    provision_bots,
+)
+from config.bot_config import PRIVATE_COMMANDS
+from tests.conftest import make_settings
+
+URL = "https://example.com/secret/bot/{bot_token}"
+ALLOWED = ["message", "callback_query"]
+# The helper customization is the only one that handles channel posts.
+HELPER_BOT_ID = 5173438724
+
+
+def _bot(token: str, *, url: str | None = None, errors=()):
+    bot = MagicMock()
+    bot.__aenter__ = AsyncMock(return_value=bot)
+    bot.__aexit__ = AsyncMock(return_value=None)
+    info = WebhookInfo(
+        url=url if url is not None else URL.format(bot_token=token),
+        has_custom_certificate=False,
+        pending_update_count=0,
+        allowed_updates=list(reversed(ALLOWED)),
+    )
+    bot.get_webhook_info = AsyncMock(side_effect=[*errors, info])
+    bot.get_my_commands = AsyncMock(return_value=PRIVATE_COMMANDS)
+    bot.set_webhook = AsyncMock()
+    bot.set_my_commands = AsyncMock()
+    return bot
+
+
+@pytest.fixture
+def config():
+    config = MagicMock()
+    config.other_bots_url = URL
+    config.get_bot_settings.return_value = [make_settings(id=i) for i in (1, 2, 3, 4)]
+    config.save_settings_to_db = AsyncMock()
+    return config
+
+
+@pytest.mark.asyncio
+async def test_only_differing_bots_are_written(config):
+    network = TelegramNetworkError(GetWebhookInfo(), "timeout")
+    bots = {
+        "1:token": _bot("1:token"),
+        "2:token": _bot("2:token", url="https://old.example.com/hook"),
+        "3:token": _bot("3:token", errors=[network]),
+    }
+
+    def factory(token: str):
+        if token == "4:token":
+            raise TelegramUnauthorizedError(GetWebhookInfo(), "Unauthorized")
+        return bots[token]
+
+    sleeps = []
+
+    async def sleep(delay):
+        sleeps.append(delay)
+
+    results = await provision_bots(
+        config, bot_factory=factory, allowed_updates=lambda _: ALLOWED, sleep=sleep
+    )
+
+    assert [result.status for result in results] == [
+        UNCHANGED,
+        UPDATED,
+        UNCHANGED,
+        UNAUTHORIZED,
+    ]
+    bots["1:token"].set_webhook.assert_not_awaited()
+    bots["1:token"].set_my_commands.assert_not_awaited()
+    bots["2:token"].set_webhook.assert_awaited_once_with(
+        url=URL.format(bot_token="2:token"), allowed_updates=ALLOWED
+    )
+    assert sleeps == [1.0]
+    saved = config.save_settings_to_db.await_args.args[0]
+    assert saved.id == 4 and saved.can_work is False
+
+
+def test_summary_lists_problem_bots():
+    summary = format_summary(
+        [
+            ProvisionResult(1, "ok_bot", UNCHANGED),
+            ProvisionResult(2, "new_bot", UPDATED),
+            ProvisionResult(3, "bad_bot", FAILED, "Bad <gateway>"),
+        ]
+    )
+
+    assert "3 ботов" in summary
+    assert "без изменений 1, обновлено 1, ошибок 1" in summary
+    assert "@bad_bot (3) failed: Bad &lt;gateway&gt;" in summary
+    assert "ok_bot" not in summary
+
+
+def test_allowed_updates_follow_bot_routers_and_settings():
+    plain = allowed_updates_for(make_settings(id=1, master_chat=-100))
+    helper = allowed_updates_for(make_settings(id=HELPER_BOT_ID, master_chat=-100))
+    unlinked = allowed_updates_for(make_settings(id=1))
+
+    assert "message_reaction" in plain and "edited_message" in plain
+    assert "channel_post" not in plain
+    assert set(helper) - set(plain) == {"channel_post"}
+    assert set(plain) - set(unlinked) == {"edited_message", "message_reaction"}
+    assert {"message", "callback_query", "my_chat_member"} <= set(unlinked)
@@ -0,0 +1,111 @@
+import pytest
+from sqlalchemy.ext.asyncio import async_sessionmaker, create_async_engine
+
+from database.mapping_cache import MessageMappingCache
+from database.models import Base
+from database.replied_users import RepliedUsers
+from database.repositories import Repo
+from database.write_behind import MessageWriteBehind
+
+
+class _NoDbSession:
+    async def execute(self, *args, **kwargs):
+        raise AssertionError("has_user_received_reply queried the database")
+
+
+@pytest.fixture
+async def session_maker(tmp_path):
+    engine = create_async_engine(f"sqlite+aiosqlite:///{tmp_path / 'support.db'}")
+    async with engine.begin() as conn:
+        await conn.run_sync(Base.metadata.create_all)
+    yield async_sessionmaker(engine, expire_on_commit=False)
+    await engine.dispose()
+
+
+@pytest.mark.asyncio
+async def test_index_is_built_from_stored_replies(session_maker):
+    writer = MessageWriteBehind(session_maker, flush_interval=60)
+    async with session_maker() as session:
+        repo = Repo(session, writer, MessageMappingCache(), RepliedUsers())
+        # Operator reply delivered to user 555 of bot 1; user 777 only wrote in.
+        await repo.save_message_ids(1, 7, 30, 11, -100, 555)
+        await repo.save_message_ids(1, None, 12, 40, 777, -100)
+    await writer.close()
+
+    replied = RepliedUsers()
+    await replied.load(session_maker)
+
+    assert replied.loaded is True
+    assert replied.contains(1, 555) is True
+    assert replied.contains(1, 777) is False
+    assert replied.contains(2, 555) is False
+    # Master chat (negative id) is not a user.
+    assert replied.stats()["users"] == 1
+
+
+@pytest.mark.asyncio
+async def test_loaded_index_answers_without_query():
+    replied = RepliedUsers()
+    replied.loaded = True
+    writer = MessageWriteBehind(flush_interval=60)
+    repo = Repo(_NoDbSession(), writer, MessageMappingCache(), replied)  # type: ignore[arg-type]
+
+    assert await repo.has_user_received_reply(1, 555) is False
+
+    replied.add(1, 555)
+    assert await repo.has_user_received_reply(1, 555) is True
+
+
+@pytest.mark.asyncio
+async def test_db_fallback_until_loaded(session_maker):
+    writer = MessageWriteBehind(session_maker, flush_interval=60)
+    async with session_maker() as session:
+        await Repo(
+            session, writer, MessageMappingCache(), RepliedUsers()
+        ).save_message_ids(1, 7, 30, 11, -100, 555)
+        await writer.close()
+
+        replied = RepliedUsers()
+        repo = Repo(session, writer, MessageMappingCache(), replied)
+        assert await repo.has_user_received_reply(1, 555) is True
+        assert await repo.has_user_received_reply(1, 777) is False
+
+    assert replied.loaded is False
+    assert replied.contains(1, 555) is True
+
+
+@pytest.mark.asyncio
+async def test_failed_load_keeps_fallback():
+    class _BrokenSession:
+        async def __aenter__(self):
+            raise RuntimeError("database is locked")
+
+        async def __aexit__(self, *exc):
+            return False
+
+    replied = RepliedUsers()
+    await replied.load(lambda: _BrokenSession())  # type: ignore[arg-type]
+
+    assert replied.loaded is False
+
+
+@pytest.mark.asyncio
+async def test_only_owned_bots_are_answered_from_memory(session_maker):
+    writer = MessageWriteBehind(session_maker, flush_interval=60)
+    async with session_maker() as session:
+        repo = Repo(session, writer, MessageMappingCache(), RepliedUsers())
+        await repo.save_message_ids(1, 7, 30, 11, -100, 555)
+        # Bot 2 is owned by another worker, which replied to user 666.
+        await repo.save_message_ids(2, 7, 31, 12, -100, 666)
+    await writer.close()
+
+    replied = RepliedUsers()
+    await replied.load(session_maker, bot_ids=[1])
+
+    assert replied.contains(1, 555) is True
+    assert replied.contains(2, 666) is False
+    assert (replied.covers(1), replied.covers(2)) == (True, False)
+    # When the ring moves bot 2 here, a miss is checked in the DB.
+    async with session_maker() as session:
+        repo = Repo(session, writer, MessageMappingCache(), replied)
+        assert await repo.has_user_received_reply(2, 666) is True
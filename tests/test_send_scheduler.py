@@ -0,0 +1,117 @@
+import asyncio
+
+import pytest
+from aiogram import Bot
+from aiogram.exceptions import TelegramRetryAfter
+from aiogram.methods import GetMe, SendMessage
+
+from bot.send_scheduler import GROUP_BURST, PRIVATE_BURST, SendScheduler
+
+
+class _Clock:
+    def __init__(self):
+        self.now = 1000.0
+
+    def __call__(self) -> float:
+        return self.now
+
+    async def sleep(self, delay: float) -> None:
+        self.now += delay
+        await asyncio.sleep(0)
+
+
+@pytest.fixture
+def clock():
+    return _Clock()
+
+
+@pytest.fixture
+def scheduler(clock):
+    return SendScheduler(clock=clock, sleep=clock.sleep)
+
+
+@pytest.fixture
+def bot():
+    return Bot("42:token")
+
+
+def _sender(clock, sent, fail_with=None):
+    async def make_request(bot, method):
+        if fail_with:
+            raise fail_with.pop(0)
+        sent.append((method.chat_id, clock.now))
+        return True
+
+    return make_request
+
+
+@pytest.mark.asyncio
+async def test_private_chat_burst_then_one_per_second(scheduler, clock, bot):
+    sent = []
+    make_request = _sender(clock, sent)
+
+    for _ in range(PRIVATE_BURST + 2):
+        await scheduler(make_request, bot, SendMessage(chat_id=7, text="hi"))
+
+    times = [at - 1000.0 for _, at in sent]
+    assert times == [0.0] * PRIVATE_BURST + [1.0, 2.0]
+    assert scheduler.stats()["delayed"] == 2
+
+
+@pytest.mark.asyncio
+async def test_group_chat_is_limited_per_minute(scheduler, clock, bot):
+    sent = []
+    make_request = _sender(clock, sent)
+
+    await asyncio.gather(
+        *(
+            scheduler(make_request, bot, SendMessage(chat_id=-100, text="hi"))
+            for _ in range(GROUP_BURST + 1)
+        )
+    )
+
+    assert sent[-1][1] - 1000.0 == pytest.approx(3.0)
+    assert scheduler.stats()["peak_waiting"] == 1
+    assert scheduler.stats()["waiting"] == 0
+
+
+@pytest.mark.asyncio
+async def test_other_chats_and_methods_are_not_delayed(scheduler, clock, bot):
+    sent = []
+    make_request = _sender(clock, sent)
+
+    for chat_id in range(1, 11):
+        await scheduler(make_request, bot, SendMessage(chat_id=chat_id, text="hi"))
+
+    async def get_me(bot, method):
+        return "me"
+
+    assert await scheduler(get_me, bot, GetMe()) == "me"
+    assert clock.now == 1000.0
+    assert scheduler.stats()["requests"] == 10
+
+
+@pytest.mark.asyncio
+async def test_retry_after_pauses_chat_and_retries(scheduler, clock, bot):
+    sent = []
+    method = SendMessage(chat_id=-100, text="hi")
+    flood = TelegramRetryAfter(method=method, message="Flood", retry_after=12)
+    make_request = _sender(clock, sent, fail_with=[flood])
+
+    await scheduler(make_request, bot, method)
+    # The paused chat keeps later sends back too; other chats are unaffected.
+    await scheduler(make_request, bot, SendMessage(chat_id=5, text="hi"))
+    await scheduler(make_request, bot, SendMessage(chat_id=-100, text="hi"))
+
+    assert sent == [(-100, 1012.0), (5, 1012.0), (-100, 1012.0)]
+    assert scheduler.stats()["retry_after"] == 1
+
+
+@pytest.mark.asyncio
+async def test_long_retry_after_is_raised(scheduler, clock, bot):
+    method = SendMessage(chat_id=7, text="hi")
+    flood = TelegramRetryAfter(method=method, message="Flood", retry_after=600)
+
+    with pytest.raises(TelegramRetryAfter):
+        await scheduler(_sender(clock, [], fail_with=[flood]), bot, method)
+    assert clock.now == 1000.0
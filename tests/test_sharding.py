@@ -0,0 +1,116 @@
+import asyncio
+import socket
+from types import SimpleNamespace
+from typing import cast
+
+import pytest
+from aiohttp import ClientSession, web
+from aiohttp.test_utils import TestClient, TestServer
+
+import bot.supervisor
+from bot.sharding import HashRing, Shard
+from bot.supervisor import Supervisor
+
+
+def test_ring_moves_only_the_removed_workers_bots():
+    ring = HashRing(range(4))
+    bots = range(1, 20_001)
+    owners = {bot_id: ring.owner(bot_id) for bot_id in bots}
+
+    shares = [list(owners.values()).count(node) for node in range(4)]
+    assert min(shares) > 20_000 / 4 * 0.7
+
+    smaller = ring.without(2)
+    for bot_id, owner in owners.items():
+        if owner != 2:
+            assert smaller.owner(bot_id) == owner
+        else:
+            assert smaller.owner(bot_id) != 2
+    assert smaller.with_node(2).owner(12345) == ring.owner(12345)
+
+
+def test_shard_owns_its_part_of_the_ring():
+    shards = [Shard(index, 3) for index in range(3)]
+
+    for bot_id in range(100):
+        assert sum(shard.owns(bot_id) for shard in shards) == 1
+    assert Shard().owns(42)
+    assert shards[0].is_primary and not shards[1].is_primary
+
+
+@pytest.mark.asyncio
+async def test_supervisor_forwards_by_bot_id(monkeypatch):
+    hits = []
+
+    def worker(index):
+        async def handle(request):
+            hits.append((index, request.path, await request.json()))
+            return web.json_response({})
+
+        app = web.Application()
+        app.router.add_post("/s/bot/{bot_token}", handle)
+        return TestServer(app)
+
+    workers = [worker(0), worker(1)]
+    for server in workers:
+        await server.start_server()
+    monkeypatch.setattr(
+        bot.supervisor, "worker_port", lambda index: workers[index].port
+    )
+
+    supervisor = Supervisor(2)
+    front = web.Application()
+    front.router.add_post("/s/bot/{bot_token}", supervisor.handle_support_bot)
+    try:
+        async with TestClient(TestServer(front)) as client:
+            assert (await client.post("/s/bot/1:x", json={})).status == 503
+
+            supervisor.ring = HashRing([0, 1])
+            supervisor._session = ClientSession()
+            bot_ids = list(range(1, 50))
+            for bot_id in bot_ids:
+                reply = await client.post(f"/s/bot/{bot_id}:x", json={"id": bot_id})
+                assert reply.status == 200
+            assert (await client.post("/s/bot/nope", json={})).status == 404
+
+            # A worker goes down: its bots move, the others stay put.
+            supervisor.ring = supervisor.ring.without(1)
+            await client.post("/s/bot/1:x", json={"id": 1})
+            await supervisor._session.close()
+    finally:
+        for server in workers:
+            await server.close()
+
+    expected = HashRing([0, 1])
+    assert [(index, body["id"]) for index, _, body in hits[: len(bot_ids)]] == [
+        (expected.owner(bot_id), bot_id) for bot_id in bot_ids
+    ]
+    assert hits[-1][0] == 0
+    assert supervisor.stats()["forwarded"] == len(bot_ids) + 1
+    assert supervisor.stats()["unavailable"] == 1
+
+
+@pytest.mark.asyncio
+async def test_supervisor_waits_for_a_slow_worker(monkeypatch):
+    with socket.socket() as probe:
+        probe.bind(("127.0.0.1", 0))
+        port = probe.getsockname()[1]
+    monkeypatch.setattr(bot.supervisor, "worker_port", lambda index: port)
+    monkeypatch.setattr(bot.supervisor, "READY_WARN_SECONDS", 0.1)
+    supervisor = Supervisor(1)
+    fake = SimpleNamespace(returncode=None)
+    process = cast(asyncio.subprocess.Process, fake)
+
+    runner = web.AppRunner(web.Application())
+    await runner.setup()
+    ready = asyncio.create_task(supervisor._wait_ready(0, process))
+    await asyncio.sleep(1.0)  # past the warning, the port still closed
+    assert not ready.done()
+    await web.TCPSite(runner, "127.0.0.1", port).start()
+    try:
+        assert await asyncio.wait_for(ready, 2) is True
+    finally:
+        await runner.cleanup()
+
+    fake.returncode = 1
+    assert await supervisor._wait_ready(0, process) is False
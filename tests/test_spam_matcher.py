@@ -0,0 +1,87 @@
+import pytest
+
+import bot.spam_matcher
+from bot.spam_matcher import SpamMatcher, clear_cache, get_matcher, normalize
+
+
+@pytest.fixture(params=["scan", "automaton"])
+def mode(request, monkeypatch):
+    if request.param == "automaton":
+        monkeypatch.setattr(bot.spam_matcher, "SCAN_MAX_PATTERNS", 0)
+    return request.param
+
+
+def test_matches_any_word_as_substring(mode):
+    matcher = SpamMatcher(["USDT", "  casino ", "", "he", "she", "hers"])
+
+    assert matcher.search("Sell TUSDT fast") == "USDT"
+    assert matcher.search("best CASINOS here") == "casino"
+    assert matcher.search("ushers") == "she"
+    assert matcher.search("nothing to see") is None
+
+
+def test_failure_links_find_overlapping_words(mode):
+    matcher = SpamMatcher(["abcd", "bce"])
+
+    assert matcher.search("xabce") == "bce"
+    assert matcher.search("abcabcd") == "abcd"
+
+
+def test_folds_obfuscated_text(mode):
+    matcher = SpamMatcher(["usdt", "крипта"])
+
+    assert matcher.search("buy ＵＳＤＴ now") == "usdt"  # fullwidth
+    assert matcher.search("buy 𝐔𝐒𝐃𝐓 now") == "usdt"  # mathematical bold
+    assert matcher.search("buy US\u200bDT now") == "usdt"  # zero-width space
+    assert matcher.search("buy U\u0301SDT now") == "usdt"  # combining acute
+    assert matcher.search("buy USD\u0422 now") == "usdt"  # Cyrillic Т
+    assert matcher.search("КРИПТА") == "крипта"
+    assert matcher.search("kpиптa") == "крипта"  # Latin look-alikes
+
+
+def test_plain_cyrillic_text_does_not_match_latin_words(mode):
+    matcher = SpamMatcher(["bet", "cam", "usdt"])
+
+    assert matcher.search("Привет, помогите") is None
+    assert matcher.search("Я сам не знаю") is None
+    assert matcher.search("ВЕРНИТЕ ДЕНЬГИ, СРОЧНО") is None
+    # A Latin word next to Russian ones is still checked as written.
+    assert matcher.search("Привет, bet365") == "bet"
+    assert matcher.search("куплю usdт") == "usdt"
+
+
+def test_long_lists_fold_words_only_for_mixed_script_text():
+    # Above SCAN_MAX_PATTERNS, so the real automaton is used.
+    matcher = SpamMatcher(["сам"] + [f"word{i:03}" for i in range(700)])
+
+    assert matcher.search("nice camera") is None
+    assert matcher.search("Я сам не знаю") == "сам"
+    assert matcher.search("nice сamera") == "сам"  # Cyrillic с
+    assert matcher.search("see word699") == "word699"
+
+
+def test_normalize_is_idempotent():
+    text = "Ｓｐａｍ с 𝐔𝐒𝐃𝐓"
+    assert normalize(normalize(text)) == normalize(text)
+
+
+def test_normalize_folds_only_mixed_script_words():
+    assert normalize("Привет, сам") == "привет, сам"
+    assert normalize("Привет USDТ") == "привет usdt"
+
+
+def test_empty_matcher(mode):
+    matcher = SpamMatcher([" ", ""])
+
+    assert not matcher
+    assert matcher.search("anything") is None
+
+
+def test_matcher_is_recompiled_only_for_new_word_list():
+    clear_cache()
+    words = ["usdt"]
+    matcher = get_matcher(1, words)
+
+    assert get_matcher(1, words) is matcher
+    assert get_matcher(1, ["usdt"]) is not matcher
+    clear_cache()
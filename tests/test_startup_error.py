@@ -52,11 +52,13 @@ async def test_startup_unauthorized_error():
                 await aiogram_on_startup_webhook(mock_dispatcher, mock_main_bot)
 
         # Assertions
-        # 1. Check if can_work was set to False
-        assert bot_setting.can_work is False, "Bot should be disabled (can_work=False)"
+        # 1. Check if save_settings_to_db was called
+        mock_config.save_settings_to_db.assert_called_once()
 
-        # 2. Check if save_settings_to_db was called
-        mock_config.save_settings_to_db.assert_called_once_with(bot_setting)
+        # 2. Check that the saved copy has can_work=False
+        saved = mock_config.save_settings_to_db.call_args.args[0]
+        assert saved.id == bot_setting.id
+        assert saved.can_work is False, "Bot should be disabled (can_work=False)"
 
         # 3. Check failure didn't propagate (function finished)
         assert True
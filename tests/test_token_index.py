@@ -0,0 +1,43 @@
+import pytest
+from aiohttp import web
+from aiohttp.test_utils import TestClient, TestServer
+
+from bot.token_index import TokenIndex, token_filter
+
+
+@pytest.mark.asyncio
+async def test_unknown_and_disabled_tokens_get_404_before_the_handler(
+    config, monkeypatch
+):
+    index = TokenIndex(config)
+    monkeypatch.setattr(config, "_listeners", [index.rebuild])
+    reached = []
+
+    async def handler(request):
+        reached.append(request.match_info.get("bot_token", request.path))
+        return web.json_response({})
+
+    app = web.Application(middlewares=[token_filter(index)])
+    app.router.add_post("/s/bot/{bot_token}", handler)
+    app.router.add_post("/s/main", handler)
+    settings = config.get_bot_setting(2)
+    async with TestClient(TestServer(app)) as client:
+        assert (await client.post("/s/bot/1:token", json={})).status == 200
+        assert (await client.post("/s/bot/1:stale", json={})).status == 404
+        assert (await client.post("/s/bot/junk", data=b"x" * 10_000)).status == 404
+        assert (await client.post("/s/main", json={})).status == 200
+
+        await config.save_settings_to_db(
+            settings.model_copy(update={"can_work": False})
+        )
+        assert (await client.post("/s/bot/2:token", json={})).status == 404
+
+    assert reached == ["1:token", "/s/main"]
+    assert index.stats() == {
+        "enabled": 1,
+        "disabled": 1,
+        "accepted": 1,
+        "rejected_unknown": 2,
+        "rejected_disabled": 1,
+        "rebuilds": 2,
+    }
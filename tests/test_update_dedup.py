@@ -0,0 +1,121 @@
+import asyncio
+from typing import cast
+
+import pytest
+from aiogram import Bot, Dispatcher, Router
+from aiohttp import web
+from aiohttp.test_utils import TestClient, TestServer
+from redis.asyncio import Redis
+
+from bot.update_dedup import UpdateDeduplicator
+from bot.update_queue import QueuedSimpleRequestHandler, UpdateQueue
+from tests.conftest import TEST_BOT_TOKEN
+
+
+class FakeRedis:
+    def __init__(self):
+        self.values = {}
+
+    async def set(self, key, value, nx=False, ex=None):
+        if nx and key in self.values:
+            return None
+        self.values[key] = value
+        return True
+
+    async def delete(self, key):
+        self.values.pop(key, None)
+
+
+@pytest.mark.asyncio
+async def test_window_remembers_the_last_updates():
+    dedup = UpdateDeduplicator(window=2)
+
+    assert await dedup.claim(1, 10) is True
+    assert await dedup.claim(1, 10) is False
+    assert await dedup.claim(2, 10) is True  # another bot
+    assert await dedup.claim(1, 11) is True  # (1, 10) leaves the window
+    assert await dedup.claim(1, 10) is True
+
+    await dedup.release(1, 10)
+    assert await dedup.claim(1, 10) is True
+    assert dedup.stats() == {
+        "window": 2,
+        "checked": 6,
+        "duplicates": 1,
+        "duplicates_shared": 0,
+        "redis_errors": 0,
+    }
+
+
+@pytest.mark.asyncio
+async def test_released_update_keeps_one_place_in_the_window():
+    dedup = UpdateDeduplicator(window=2)
+
+    assert await dedup.claim(1, 10) is True
+    await dedup.release(1, 10)  # answered 429
+    assert await dedup.claim(1, 10) is True  # redelivered and queued
+    assert await dedup.claim(1, 11) is True
+    # (1, 10) is still one of the last two updates.
+    assert await dedup.claim(1, 10) is False
+    assert dedup.stats()["window"] == 2
+
+
+@pytest.mark.asyncio
+async def test_workers_sharing_redis_claim_an_update_once():
+    redis = cast(Redis, FakeRedis())
+    first = UpdateDeduplicator(redis=redis)
+    second = UpdateDeduplicator(redis=redis)
+
+    assert await first.claim(1, 10) is True
+    assert await second.claim(1, 10) is False
+    assert second.stats()["duplicates_shared"] == 1
+
+    await first.release(1, 10)
+    assert await first.claim(1, 10) is True
+
+
+@pytest.mark.asyncio
+async def test_redelivered_update_is_processed_once():
+    release = asyncio.Event()
+    seen = []
+    router = Router()
+
+    @router.message()
+    async def on_message(message):
+        await release.wait()
+        seen.append(message.text)
+
+    dispatcher = Dispatcher()
+    dispatcher.include_router(router)
+    queue = UpdateQueue("test", size=1, workers=1)
+    dedup = UpdateDeduplicator()
+    app = web.Application()
+    QueuedSimpleRequestHandler(
+        dispatcher=dispatcher, bot=Bot(TEST_BOT_TOKEN), queue=queue, dedup=dedup
+    ).register(app, path="/hook")
+
+    def update(update_id):
+        return {
+            "update_id": update_id,
+            "message": {
+                "message_id": update_id,
+                "date": 0,
+                "chat": {"id": update_id, "type": "private"},
+                "text": f"m{update_id}",
+            },
+        }
+
+    async with TestClient(TestServer(app)) as client:
+        statuses = [(await client.post("/hook", json=update(1))).status]
+        await asyncio.sleep(0.01)
+        for update_id in (1, 2, 1, 3):
+            statuses.append((await client.post("/hook", json=update(update_id))).status)
+        # 3 was answered 429, so its redelivery is taken once there is room.
+        release.set()
+        await asyncio.sleep(0.01)
+        statuses.append((await client.post("/hook", json=update(3))).status)
+        await queue.close()
+
+    assert statuses == [200, 200, 200, 200, 429, 200]
+    assert seen == ["m1", "m2", "m3"]
+    assert dedup.stats()["duplicates"] == 2
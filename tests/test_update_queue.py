@@ -0,0 +1,158 @@
+import asyncio
+
+import pytest
+from aiogram import Bot, Dispatcher, Router
+from aiohttp import web
+from aiohttp.test_utils import TestClient, TestServer
+
+from bot.update_queue import QueuedSimpleRequestHandler, UpdateQueue, update_chat_id
+from tests.conftest import TEST_BOT_TOKEN
+
+
+@pytest.mark.asyncio
+async def test_queue_is_bounded_and_drained_on_close():
+    queue = UpdateQueue("test", size=1, workers=1, overflow="drop")
+    release = asyncio.Event()
+    done = []
+
+    async def job(name):
+        await release.wait()
+        done.append(name)
+
+    assert queue.put(lambda: job("a")) is True
+    await asyncio.sleep(0)  # the worker takes "a"
+    assert queue.put(lambda: job("b")) is True
+    assert queue.put(lambda: job("c")) is False
+    assert queue.stats()["depth"] == 1
+    assert queue.stats()["busy"] == 1
+
+    release.set()
+    await queue.close()
+
+    assert done == ["a", "b"]
+    stats = queue.stats()
+    assert (stats["processed"], stats["dropped"], stats["workers"]) == (2, 1, 0)
+
+
+@pytest.mark.asyncio
+async def test_one_chat_runs_in_order_while_other_chats_run_in_parallel():
+    queue = UpdateQueue("test", size=100, workers=4)
+    gates = {name: asyncio.Event() for name in ("a1", "a2", "a3", "b1")}
+    started, finished = [], []
+
+    def job(name):
+        async def run():
+            started.append(name)
+            await gates[name].wait()
+            finished.append(name)
+
+        return run
+
+    for name in ("a1", "a2", "b1", "a3"):
+        queue.put(job(name), (7, 100 if name.startswith("a") else 200))
+    await asyncio.sleep(0.01)
+
+    # a2 waits behind a1 although workers are free; b1 does not.
+    assert started == ["a1", "b1"]
+    assert queue.stats()["chats"] == 2
+
+    gates["b1"].set()
+    gates["a2"].set()
+    gates["a3"].set()
+    await asyncio.sleep(0.01)
+    assert started == ["a1", "b1"]
+
+    gates["a1"].set()
+    await queue.close()
+
+    assert finished == ["b1", "a1", "a2", "a3"]
+    assert queue.stats()["chats"] == 0
+
+
+@pytest.mark.asyncio
+async def test_one_bot_cannot_take_every_worker():
+    queue = UpdateQueue("test", size=100, workers=4, bot_workers=2)
+    gate = asyncio.Event()
+    started, finished = [], []
+
+    def job(name):
+        async def run():
+            started.append(name)
+            await gate.wait()
+            finished.append(name)
+
+        return run
+
+    # A slow bot with updates from five chats, then another bot.
+    for chat_id in range(5):
+        queue.put(job(f"slow{chat_id}"), (1, chat_id))
+    queue.put(job("other"), None, bot_id=2)
+    await asyncio.sleep(0.01)
+
+    assert started == ["slow0", "slow1", "other"]
+    assert (queue.stats()["held"], queue.stats()["busy"]) == (3, 3)
+
+    gate.set()
+    await queue.close()
+
+    assert sorted(finished) == ["other"] + [f"slow{i}" for i in range(5)]
+    stats = queue.stats()
+    assert (stats["held"], stats["peak_held"], stats["bots"]) == (0, 3, 0)
+
+
+def test_update_chat_id():
+    chat = {"id": -5, "type": "supergroup"}
+    sender = {"id": 3, "is_bot": False, "first_name": "u"}
+
+    assert update_chat_id({"update_id": 1, "message_reaction": {"chat": chat}}) == -5
+    callback = {"id": "q", "from": sender, "message": {"chat": chat}}
+    assert update_chat_id({"update_id": 1, "callback_query": callback}) == -5
+    assert update_chat_id({"update_id": 1, "inline_query": {"from": sender}}) == 3
+    assert update_chat_id({"update_id": 1}) is None
+
+
+@pytest.mark.asyncio
+async def test_full_queue_answers_429_and_queued_updates_are_processed():
+    release = asyncio.Event()
+    seen = []
+    router = Router()
+
+    @router.message()
+    async def on_message(message):
+        await release.wait()
+        seen.append(message.text)
+
+    dispatcher = Dispatcher()
+    dispatcher.include_router(router)
+    queue = UpdateQueue("test", size=1, workers=1)
+    app = web.Application()
+    QueuedSimpleRequestHandler(
+        dispatcher=dispatcher, bot=Bot(TEST_BOT_TOKEN), queue=queue
+    ).register(app, path="/hook")
+
+    def update(update_id):
+        return {
+            "update_id": update_id,
+            "message": {
+                "message_id": update_id,
+                "date": 0,
+                "chat": {"id": 1, "type": "private"},
+                "text": f"m{update_id}",
+            },
+        }
+
+    async with TestClient(TestServer(app)) as client:
+        first = await client.post("/hook", json=update(1))
+        await asyncio.sleep(0.01)
+        second = await client.post("/hook", json=update(2))
+        third = await client.post("/hook", json=update(3))
+
+        assert (first.status, second.status, third.status) == (200, 200, 429)
+        assert third.headers["Retry-After"] == "1"
+        assert seen == []
+
+        release.set()
+        await queue.close()
+
+    assert seen == ["m1", "m2"]
+    assert queue.stats()["rejected"] == 1
@@ -0,0 +1,118 @@
+import asyncio
+
+import pytest
+from sqlalchemy import func, select
+from sqlalchemy.ext.asyncio import async_sessionmaker, create_async_engine
+
+from database.models import Base, Messages
+from database.repositories import Repo
+from database.write_behind import MessageMapping, MessageWriteBehind
+
+
+@pytest.fixture
+async def session_maker(tmp_path):
+    engine = create_async_engine(f"sqlite+aiosqlite:///{tmp_path / 'support.db'}")
+    async with engine.begin() as conn:
+        await conn.run_sync(Base.metadata.create_all)
+    yield async_sessionmaker(engine, expire_on_commit=False)
+    await engine.dispose()
+
+
+def _row(message_id: int, *, chat_for_id: int = -100) -> MessageMapping:
+    return MessageMapping(
+        bot_id=1,
+        user_id=None,
+        message_id=message_id,
+        resend_id=message_id + 1000,
+        chat_from_id=555,
+        chat_for_id=chat_for_id,
+    )
+
+
+async def _count(session_maker) -> int:
+    async with session_maker() as session:
+        result = await session.execute(select(func.count(Messages.record_id)))
+        return result.scalar() or 0
+
+
+@pytest.mark.asyncio
+async def test_rows_are_group_committed(session_maker):
+    writer = MessageWriteBehind(session_maker, flush_interval=0.05)
+    for message_id in range(50):
+        writer.add(_row(message_id))
+
+    await asyncio.sleep(0.2)
+
+    assert await _count(session_maker) == 50
+    assert writer.flushes == 1
+    assert writer.rows_written == 50
+
+
+@pytest.mark.asyncio
+async def test_full_batch_flushes_without_waiting_for_interval(session_maker):
+    writer = MessageWriteBehind(session_maker, flush_interval=60, max_batch=10)
+    for message_id in range(10):
+        writer.add(_row(message_id))
+
+    await asyncio.sleep(0.2)
+
+    assert await _count(session_maker) == 10
+    await writer.close()
+
+
+@pytest.mark.asyncio
+async def test_queued_rows_are_visible_to_lookups(session_maker):
+    writer = MessageWriteBehind(session_maker, flush_interval=60)
+    async with session_maker() as session:
+        repo = Repo(session, writer)
+        await repo.save_message_ids(
+            bot_id=1,
+            user_id=None,
+            message_id=10,
+            resend_id=20,
+            chat_from_id=555,
+            chat_for_id=-100,
+        )
+
+        assert await _count(session_maker) == 0
+        found = await repo.get_message_resend_info(
+            bot_id=1, resend_id=20, chat_for_id=-100
+        )
+        assert found is not None
+        assert found.message_id == 10
+        assert await repo.has_user_received_reply(bot_id=1, user_id=-100) is True
+        assert await repo.has_user_received_reply(bot_id=1, user_id=555) is False
+    await writer.close()
+
+
+@pytest.mark.asyncio
+async def test_close_drains_queue(session_maker):
+    writer = MessageWriteBehind(session_maker, flush_interval=60)
+    writer.add(_row(1))
+    writer.add(_row(2))
+
+    await writer.close()
+
+    assert await _count(session_maker) == 2
+    assert writer.stats()["pending"] == 0
+
+
+@pytest.mark.asyncio
+async def test_failed_flush_keeps_rows_for_retry(session_maker):
+    class _BrokenSession:
+        async def __aenter__(self):
+            raise RuntimeError("database is locked")
+
+        async def __aexit__(self, *exc):
+            return False
+
+    writer = MessageWriteBehind(lambda: _BrokenSession(), flush_interval=60)  # type: ignore[arg-type]
+    writer.add(_row(1))
+
+    assert await writer.flush() is False
+    assert writer.failures == 1
+    assert writer.find(bot_id=1, message_id=1) is not None
+
+    writer._session_factory = session_maker
+    assert await writer.flush() is True
+    assert await _count(session_maker) == 1